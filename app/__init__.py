@@ -24,6 +24,9 @@ def create_app():
     # Importar los modelos para que estén registrados
     from . import models
 
+    # Contadores de versión de datos (eventos de sesión para invalidar cachés)
+    from .utils import data_version  # noqa: F401
+
     # Registra blueprints
     from .routes import bp as main_bp
     app.register_blueprint(main_bp)
@@ -65,6 +68,17 @@ def create_app():
 
         start_backup_scheduler(app)
 
+    @app.before_request
+    def start_import_worker():
+        if app.extensions.get('import_worker_started'):
+            return None
+
+        app.extensions['import_worker_started'] = True
+
+        from .utils.importacion import start_import_worker
+
+        start_import_worker(app)
+
     @app.cli.command('backup-database')
     def backup_database_command():
         from .utils.database_backup import backup_database
@@ -72,4 +86,11 @@ def create_app():
         backup_path = backup_database(app)
         print(f'Respaldo creado en {backup_path}')
 
+    @app.cli.command('rebuild-monthly-summary')
+    def rebuild_monthly_summary_command():
+        from .utils.resumen_mensual import reconstruir_resumen
+
+        reconstruir_resumen()
+        print('Resumen mensual recalculado.')
+
     return app
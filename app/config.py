@@ -2,7 +2,7 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev")
-    SQLALCHEMY_DATABASE_URI = "sqlite:///movimientos.db"
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///movimientos.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
     DATABASE_BACKUP_PATH = os.environ.get("DATABASE_BACKUP_PATH", "").strip()
@@ -16,3 +16,9 @@ class Config:
     MAX_FORM_MEMORY_SIZE = int(os.environ.get("MAX_FORM_MEMORY_SIZE", str(20 * 1024 * 1024)))
     # Numero maximo de partes multipart (campos + archivos). Default: 5000.
     MAX_FORM_PARTS = int(os.environ.get("MAX_FORM_PARTS", "5000"))
+    # Procesos para leer en paralelo los archivos de una carga múltiple. Default: 0 (todos los núcleos).
+    UPLOAD_PARSE_WORKERS = int(os.environ.get("UPLOAD_PARSE_WORKERS", "0"))
+    # Tamaño máximo descomprimido de cada archivo dentro de un ZIP subido. Default: 100 MB.
+    ZIP_MAX_MIEMBRO_BYTES = int(os.environ.get("ZIP_MAX_MIEMBRO_BYTES", str(100 * 1024 * 1024)))
+    # Tamaño máximo descomprimido de todo el contenido de un ZIP subido. Default: 1 GB.
+    ZIP_MAX_TOTAL_BYTES = int(os.environ.get("ZIP_MAX_TOTAL_BYTES", str(1024 * 1024 * 1024)))
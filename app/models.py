@@ -2,6 +2,13 @@ from datetime import datetime
 import re
 from . import db
 from flask_login import UserMixin
+from sqlalchemy import case, select, union_all
+from sqlalchemy.orm import validates
+
+
+def normalizar_numero_cuenta(numero):
+    """Número de cuenta sin guiones, espacios ni otros separadores."""
+    return re.sub(r"[^A-Za-z0-9]", "", (numero or '').strip())
 
 
 class Categoria(db.Model):
@@ -73,13 +80,29 @@ class Movimiento(db.Model):
     numero_documento = db.Column(db.String(100), nullable=True)
     monto = db.Column(db.Float)
     moneda = db.Column(db.String(10))
+    # Monto convertido con el tipo de cambio vigente a la fecha (lo mantienen
+    # triggers, ver utils/tipos_cambio.py)
+    monto_gtq = db.Column(db.Float, nullable=True)
     tipo = db.Column(db.String(10))  # 'debito' o 'credito'
     excluir_clasificacion = db.Column(db.Boolean, nullable=False, default=False)
     excluir_dashboard = db.Column(db.Boolean, nullable=False, default=False)
-    archivo_id = db.Column(db.Integer, db.ForeignKey('archivos.id'), nullable=False)
+    archivo_id = db.Column(db.Integer, db.ForeignKey('archivos.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     comercio_id = db.Column(db.Integer, db.ForeignKey('comercios.id'), nullable=True)
     pais_id = db.Column(db.Integer, db.ForeignKey('paises.id'), nullable=True, index=True)
+    # Huella del contenido al importar (ver parser/movimiento_utils.huella_movimiento);
+    # NULL en movimientos creados a mano
+    huella = db.Column(db.String(64), nullable=True, unique=True, index=True)
+
+    # Listados, dashboard y reportes filtran por usuario/comercio/cuenta y
+    # ordenan o acotan por fecha
+    __table_args__ = (
+        db.Index('ix_movimientos_user_id_fecha', 'user_id', 'fecha'),
+        db.Index('ix_movimientos_comercio_id_fecha', 'comercio_id', 'fecha'),
+        db.Index('ix_movimientos_cuenta_id_fecha', 'cuenta_id', 'fecha'),
+        db.Index('ix_movimientos_fecha', 'fecha'),
+    )
+
     # Relaciones
     comercio = db.relationship(
         'Comercio',
@@ -104,6 +127,8 @@ class Cuenta(db.Model):
     banco = db.Column(db.String(50), nullable=False)
     tipo_cuenta = db.Column(db.String(50), nullable=False)
     numero_cuenta = db.Column(db.String(100), nullable=False, unique=True)
+    # `numero_cuenta` normalizado (ver `normalizar_numero_cuenta`)
+    numero_normalizado = db.Column(db.String(100), nullable=True, index=True)
     alias = db.Column(db.String(100), nullable=True)
     titular = db.Column(db.String(200), nullable=False)
     moneda = db.Column(db.String(10), nullable=False)
@@ -131,37 +156,52 @@ class Cuenta(db.Model):
             except Exception:
                 db.session.rollback()
 
+    @validates('numero_cuenta')
+    def _validar_numero_cuenta(self, key, numero):
+        self.numero_normalizado = normalizar_numero_cuenta(numero)
+        return numero
+
     @staticmethod
-    def find_by_numero(numero):
+    def find_by_numero(numero, banco=None, tipo=None):
         """Buscar una cuenta por su número o por números alternativos.
 
+        Se prefiere, en este orden: número principal exacto, número alternativo
+        exacto, número principal normalizado y número alternativo normalizado.
+        Con `banco` y/o `tipo` solo se consideran cuentas de ese banco y cuyo
+        tipo empiece por `tipo`. Es una sola consulta sobre los índices de
+        `numero_normalizado`.
+
         Retorna la instancia Cuenta o None.
         """
         if not numero:
             return None
         num_raw = numero.strip()
-        # intentar buscar por numero_cuenta exacto
-        c = Cuenta.query.filter_by(numero_cuenta=num_raw).first()
-        if c:
-            return c
-        # buscar en la tabla de numeros alternativos
-        cn = CuentaNumero.query.filter_by(numero=num_raw).first()
-        if cn:
-            return Cuenta.query.get(cn.cuenta_id)
-        # intentar buscar por versión "limpia"
-        clean = re.sub(r"[^A-Za-z0-9]", "", num_raw)
+        clean = normalizar_numero_cuenta(num_raw)
         if clean:
-            # buscar en cuentas
-            posibles = Cuenta.query.all()
-            for pc in posibles:
-                if re.sub(r"[^A-Za-z0-9]", "", (pc.numero_cuenta or '')) == clean:
-                    return pc
-            # buscar en numeros alternativos
-            posibles_cn = CuentaNumero.query.all()
-            for pcn in posibles_cn:
-                if re.sub(r"[^A-Za-z0-9]", "", (pcn.numero or '')) == clean:
-                    return Cuenta.query.get(pcn.cuenta_id)
-        return None
+            primarios = Cuenta.numero_normalizado == clean
+            alternativos = CuentaNumero.numero_normalizado == clean
+        else:
+            primarios = Cuenta.numero_cuenta == num_raw
+            alternativos = CuentaNumero.numero == num_raw
+        coincidencias = union_all(
+            select(
+                Cuenta.id.label('cuenta_id'),
+                case((Cuenta.numero_cuenta == num_raw, 0), else_=2).label('prioridad'),
+            ).where(primarios),
+            select(
+                CuentaNumero.cuenta_id,
+                case((CuentaNumero.numero == num_raw, 1), else_=3),
+            ).where(alternativos),
+        ).subquery()
+        q = (
+            Cuenta.query.join(coincidencias, coincidencias.c.cuenta_id == Cuenta.id)
+            .order_by(coincidencias.c.prioridad, Cuenta.id)
+        )
+        if banco:
+            q = q.filter(Cuenta.banco == banco)
+        if tipo:
+            q = q.filter(Cuenta.tipo_cuenta.like(f"{tipo}%"))
+        return q.first()
 
 
 class CuentaNumero(db.Model):
@@ -169,9 +209,15 @@ class CuentaNumero(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     cuenta_id = db.Column(db.Integer, db.ForeignKey('cuentas.id'), nullable=False, index=True)
     numero = db.Column(db.String(100), nullable=False, index=True)
+    numero_normalizado = db.Column(db.String(100), nullable=True, index=True)
 
     cuenta = db.relationship('Cuenta', backref=db.backref('numeros_alternativos', lazy=True), foreign_keys=[cuenta_id])
 
+    @validates('numero')
+    def _validar_numero(self, key, numero):
+        self.numero_normalizado = normalizar_numero_cuenta(numero)
+        return numero
+
 class Archivo(db.Model):
     __tablename__ = 'archivos'
     id = db.Column(db.Integer, primary_key=True)
@@ -232,6 +278,10 @@ class Factura(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_facturas_user_id_fecha_emision', 'user_id', 'fecha_emision'),
+    )
+
     archivo = db.relationship(
         'Archivo',
         backref=db.backref('facturas', lazy=True),
@@ -269,6 +319,23 @@ class TipoCambio(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class TipoCambioHistorico(db.Model):
+    """
+    Tipo de cambio vigente desde `fecha` (hasta el siguiente registro de la
+    misma moneda). Cada alta o cambio de `TipoCambio` registra el valor con la
+    fecha del día; también se pueden cargar fechas anteriores.
+    """
+    __tablename__ = 'tipos_cambio_historicos'
+    id     = db.Column(db.Integer, primary_key=True)
+    moneda = db.Column(db.String(10), nullable=False)
+    fecha  = db.Column(db.Date, nullable=False)
+    valor  = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('moneda', 'fecha', name='uq_tipo_cambio_historico_moneda_fecha'),
+    )
+
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -279,3 +346,110 @@ class User(UserMixin, db.Model):
     def is_admin(self):
         return self.role == 'admin'
 
+
+class VersionDatos(db.Model):
+    """Contadores de versión para invalidar cachés (p.e. 'reglas')."""
+    __tablename__ = 'versiones_datos'
+    clave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ResumenMensual(db.Model):
+    """
+    Totales mensuales de movimientos para el dashboard, mantenidos por triggers
+    sobre `movimientos` (ver utils/resumen_mensual.py). Las claves usan 0 / ''
+    en lugar de NULL (sin usuario, sin comercio, etc.) para poder agrupar.
+    """
+    __tablename__ = 'resumen_mensual'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    mes = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    comercio_id = db.Column(db.Integer, nullable=False, default=0)
+    pais_id = db.Column(db.Integer, nullable=False, default=0)
+    cuenta_id = db.Column(db.Integer, nullable=False, default=0)
+    moneda = db.Column(db.String(10), nullable=False, default='')
+    # Sumas en la moneda original: débitos (montos < 0) y créditos (montos > 0)
+    debitos = db.Column(db.Float, nullable=False, default=0)
+    creditos = db.Column(db.Float, nullable=False, default=0)
+    # Las mismas sumas en GTQ (con `Movimiento.monto_gtq`)
+    debitos_gtq = db.Column(db.Float, nullable=False, default=0)
+    creditos_gtq = db.Column(db.Float, nullable=False, default=0)
+    n_debitos = db.Column(db.Integer, nullable=False, default=0)
+    n_creditos = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user_id', 'mes', 'comercio_id', 'pais_id', 'cuenta_id', 'moneda',
+            name='uq_resumen_mensual_clave',
+        ),
+    )
+
+
+class ToleranciaCoincidencia(db.Model):
+    """
+    Tolerancias (una sola fila, id = 1) con las que se calculan las
+    coincidencias guardadas en `coincidencias_facturas`.
+    """
+    __tablename__ = 'tolerancias_coincidencia'
+    id = db.Column(db.Integer, primary_key=True)
+    dias = db.Column(db.Integer, nullable=False, default=7)
+    porcentaje = db.Column(db.Float, nullable=False, default=0.01)  # en %, como en el formulario
+    absoluto = db.Column(db.Float, nullable=False, default=0.01)
+
+
+class CoincidenciaFactura(db.Model):
+    """
+    Factura con monto y fecha similares a un movimiento, mantenida por triggers
+    sobre `movimientos`, `facturas` y `tolerancias_coincidencia` (ver
+    utils/coincidencias_facturas.py).
+    """
+    __tablename__ = 'coincidencias_facturas'
+    movimiento_id = db.Column(db.Integer, db.ForeignKey('movimientos.id'), primary_key=True)
+    factura_id = db.Column(db.Integer, db.ForeignKey('facturas.id'), primary_key=True, index=True)
+    score = db.Column(db.Float, nullable=False)  # diferencia porcentual (fracción del monto)
+    diff_monto = db.Column(db.Float, nullable=False)
+    diff_dias = db.Column(db.Integer, nullable=False)
+
+    factura = db.relationship('Factura', foreign_keys=[factura_id])
+
+
+class TrabajoImportacion(db.Model):
+    """Carga de archivos procesada en segundo plano (ver utils/importacion.py)."""
+    __tablename__ = 'trabajos_importacion'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo_archivo = db.Column(db.String(50), nullable=False)
+    # 'pendiente', 'procesando', 'completado' o 'error'
+    estado = db.Column(db.String(20), nullable=False, default='pendiente', index=True)
+    mensaje = db.Column(db.Text, nullable=True)
+    # Archivo-lote cuando se cargan varias facturas a la vez
+    archivo_lote_id = db.Column(db.Integer, db.ForeignKey('archivos.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    creado = db.Column(db.DateTime, default=datetime.utcnow)
+    iniciado = db.Column(db.DateTime, nullable=True)
+    finalizado = db.Column(db.DateTime, nullable=True)
+
+    archivos = db.relationship(
+        'TrabajoImportacionArchivo',
+        backref='trabajo',
+        lazy=True,
+        cascade='all, delete-orphan',
+        order_by='TrabajoImportacionArchivo.id',
+    )
+
+
+class TrabajoImportacionArchivo(db.Model):
+    """Progreso de cada archivo de un `TrabajoImportacion`."""
+    __tablename__ = 'trabajos_importacion_archivos'
+    id = db.Column(db.Integer, primary_key=True)
+    trabajo_id = db.Column(db.Integer, db.ForeignKey('trabajos_importacion.id'), nullable=False, index=True)
+    nombre = db.Column(db.String(200), nullable=False)  # nombre original subido
+    ruta = db.Column(db.String(500), nullable=False)
+    miembro = db.Column(db.String(500), nullable=True)              # nombre dentro del ZIP en `ruta`
+    # 'pendiente', 'procesando', 'completado', 'duplicado' o 'error'
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    filas = db.Column(db.Integer, nullable=False, default=0)        # registros leídos por el parser
+    insertados = db.Column(db.Integer, nullable=False, default=0)   # movimientos/facturas nuevos
+    duplicados = db.Column(db.Integer, nullable=False, default=0)
+    detalles = db.Column(db.Integer, nullable=False, default=0)     # detalles de factura (FEL)
+    error = db.Column(db.Text, nullable=True)
+    archivo_id = db.Column(db.Integer, db.ForeignKey('archivos.id'), nullable=True)
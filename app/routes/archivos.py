@@ -4,7 +4,7 @@ from . import bp
 from ..models import Archivo, Movimiento, Factura, FacturaDetalle
 from .. import db
 from flask_login import login_required, current_user
-from ..models import User
+from ..utils.catalogos import catalogos
 
 
 @bp.route('/archivos', methods=['GET'])
@@ -53,7 +53,7 @@ def list_archivos():
 
     users = []
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
 
     # Para el dropdown de tipos
     tipos = [t[0] for t in db.session.query(Archivo.tipo_archivo).distinct().all()]
@@ -8,9 +8,10 @@ from urllib.error import HTTPError
 from flask import current_app, flash, jsonify, redirect, render_template, request, send_from_directory, url_for
 from . import bp
 from .. import db
-from ..models import Comercio, Regla, Categoria, Subcategoria, Movimiento
+from ..models import Comercio, Regla, Subcategoria, Movimiento
 from flask_login import current_user
-from ..utils.classifier import reclasificar_movimientos
+from ..utils.catalogos import catalogos
+from ..utils.classifier import clasificar_movimientos, reclasificar_comercio
 from ..utils.image_search import build_image_search_url, search_image_suggestions
 from sqlalchemy.orm import joinedload
 from flask_login import login_required
@@ -197,11 +198,9 @@ def list_comercios():
         c.movimientos_count = movimiento_counts.get(c.id, 0)
 
     # Pasar listas auxiliares (categorias) y valores de filtro actuales para la plantilla
-    categorias = Categoria.query.order_by(Categoria.nombre).all()
-    subcategorias_query = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre)
-    if categoria_id:
-        subcategorias_query = subcategorias_query.filter(Subcategoria.categoria_id == categoria_id)
-    subcategorias = subcategorias_query.all()
+    cat = catalogos()
+    categorias = cat.categorias
+    subcategorias = cat.subcategorias(categoria_id or None)
     filters = {
         'q_name': nombre_q,
         'categoria_id': categoria_id or '',
@@ -227,8 +226,9 @@ def list_comercios():
 @bp.route('/comercios/add', methods=['GET', 'POST'])
 @login_required
 def add_comercio():
-    categorias = Categoria.query.order_by(Categoria.nombre).all()
-    subcategorias = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre).all()
+    cat = catalogos()
+    categorias = cat.categorias
+    subcategorias = cat.subcategorias()
     
     # Obtener datos pre-llenados de la URL
     pre_nombre = format_sentence_case(request.args.get('nombre', ''))
@@ -290,8 +290,8 @@ def add_comercio():
                 db.session.add(regla)
         db.session.commit()
 
-        # Clasificar movimientos automáticamente
-        reclasificar_movimientos()
+        # Clasificar automáticamente los movimientos que las nuevas reglas pueden afectar
+        reclasificar_comercio(nuevo_comercio.id)
 
         flash('Comercio y reglas agregados correctamente.', 'success')
         return redirect(url_for('main.list_comercios'))
@@ -302,8 +302,9 @@ def add_comercio():
 @login_required
 def edit_comercio(comercio_id):
     comercio = Comercio.query.get_or_404(comercio_id)
-    categorias = Categoria.query.order_by(Categoria.nombre).all()
-    subcategorias = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre).all()
+    cat = catalogos()
+    categorias = cat.categorias
+    subcategorias = cat.subcategorias()
     if request.method == 'POST':
         previous_logo = comercio.logo_filename
         new_logo = None
@@ -357,8 +358,8 @@ def edit_comercio(comercio_id):
         if previous_logo and comercio.logo_filename != previous_logo:
             _delete_logo(previous_logo)
         
-        # Re-clasificar todos los movimientos tras modificar reglas
-        reclasificar_movimientos()
+        # Re-clasificar solo los movimientos afectados por las reglas modificadas
+        reclasificar_comercio(comercio.id)
 
         flash('Comercio actualizado', 'success')
         return redirect(url_for('main.list_comercios'))
@@ -370,9 +371,13 @@ def edit_comercio(comercio_id):
 def delete_comercio(comercio_id):
     comercio = Comercio.query.get_or_404(comercio_id)
     logo_filename = comercio.logo_filename
+    movimiento_ids = [
+        row[0] for row in db.session.query(Movimiento.id).filter(Movimiento.comercio_id == comercio.id).all()
+    ]
     db.session.delete(comercio)
     db.session.commit()
     _delete_logo(logo_filename)
-    reclasificar_movimientos()
+    # Los movimientos que quedaron sin comercio pueden coincidir con reglas de otros comercios
+    clasificar_movimientos(movimiento_ids=movimiento_ids)
     flash('Comercio eliminado', 'warning')
     return redirect(url_for('main.list_comercios'))
@@ -4,8 +4,9 @@ from datetime import datetime
 from . import bp
 from .. import db
 from ..models import Cuenta, Movimiento
-from ..models import User
+from ..utils.catalogos import catalogos
 from ..models import CuentaNumero
+from ..utils.parser.movimiento_utils import mover_movimientos_cuenta
 from flask_login import login_required, current_user
 
 
@@ -28,7 +29,7 @@ def list_cuentas():
     users = []
     cuentas_query = Cuenta.query
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
         if owner_id is not None:
             cuentas_query = cuentas_query.filter(Cuenta.user_id == owner_id)
     else:
@@ -108,9 +109,9 @@ def merge_cuentas(source_id, target_id, keep_alias=True):
         flash('No se puede combinar la misma cuenta.', 'warning')
         return redirect(url_for('main.list_cuentas'))
 
-    # Mover movimientos
+    # Mover movimientos (con su huella recalculada para la cuenta destino)
     try:
-        Movimiento.query.filter_by(cuenta_id=source.id).update({'cuenta_id': target.id})
+        repetidos = mover_movimientos_cuenta(source.id, target.id)
         # Mover numeros alternativos
         # copy list to avoid mutation during iteration
         for cn in list(source.numeros_alternativos):
@@ -141,7 +142,10 @@ def merge_cuentas(source_id, target_id, keep_alias=True):
 
         db.session.delete(source)
         db.session.commit()
-        flash('Cuentas combinadas correctamente.', 'success')
+        if repetidos:
+            flash(f'Cuentas combinadas correctamente. Se eliminaron {repetidos} movimiento(s) que ya estaban en la cuenta destino.', 'success')
+        else:
+            flash('Cuentas combinadas correctamente.', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error combinando cuentas: {e}', 'danger')
@@ -194,7 +198,7 @@ def add_cuenta():
     # Obtener lista de usuarios para administradores
     users = []
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
     
     if request.method == 'POST':
         banco = request.form.get('banco', '').strip()
@@ -267,7 +271,7 @@ def edit_cuenta(cuenta_id):
     # Obtener lista de usuarios para administradores
     users = []
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
     
     if request.method == 'POST':
         banco = request.form.get('banco', '').strip()
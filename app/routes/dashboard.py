@@ -1,10 +1,13 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from flask import render_template, request, flash, url_for
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
-from .. import db
-from ..models import Comercio, Categoria, Subcategoria, Movimiento, TipoCambio, User, Cuenta, Regla, Pais
+from ..models import Comercio, Categoria, Subcategoria
+from ..utils.catalogos import catalogos
+from ..utils.dashboard_datos import (
+    AgregadosDashboard, DIAS_SEMANA, RANGOS_GASTOS, cache_dashboard, leer_gastos, leer_resumen,
+    version_dashboard,
+)
+from ..utils.resumen_mensual import fuente_resumen
 from . import bp
 from flask_login import login_required, current_user
 
@@ -64,768 +67,133 @@ def dashboard():
 
     # ————————————————————————————————————————
     # 2) Lista de categorías para el dropdown
-    categorias = Categoria.query.order_by(Categoria.nombre).all()
-    all_subcategorias = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre).all()
-    subcategorias_query = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre)
+    cat = catalogos()
+    categorias = cat.categorias
+    all_subcategorias = cat.subcategorias()
+    subcategorias = all_subcategorias
     if cat_id:
         try:
-            cat_id_int = int(cat_id)
-            subcategorias_query = subcategorias_query.filter(Subcategoria.categoria_id == cat_id_int)
+            subcategorias = cat.subcategorias(int(cat_id))
         except ValueError:
             pass
-    subcategorias = subcategorias_query.all()
 
     # Lista de usuarios (solo necesaria si es admin)
     users = []
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = cat.usuarios
 
     # ————————————————————————————————————————
-    # 2.5) Rango del mes anterior (independiente de filtros de fecha)
-    today = date.today()
-    current_month_start = today.replace(day=1)
-    prev_month_end = current_month_start - relativedelta(days=1)
-    prev_month_start = prev_month_end.replace(day=1)
-    prev_month_label = prev_month_start.strftime('%Y-%m')
-
-
-    # ————————————————————————————————————————
-    # 3) Gastos por Comercio (GTQ) - Incluye movimientos sin clasificar
-    def apply_dashboard_exclusion(query):
-        return query.filter(Movimiento.excluir_dashboard.is_(False))
-
-    location_query = (
-        db.session.query(
-            func.coalesce(Pais.nombre, db.literal('Sin país')).label('pais_nombre'),
-            func.sum(-(Movimiento.monto * TipoCambio.valor)).label('total_gtq')
-        )
-        .outerjoin(Pais, Movimiento.pais_id == Pais.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.monto < 0)
-    )
-    location_query = apply_dashboard_exclusion(location_query)
+    # 3) Usuario y categoría filtrados
+    filtro_user_id = None
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
         if owner_id:
             try:
-                location_query = location_query.filter(Movimiento.user_id == int(owner_id))
+                filtro_user_id = int(owner_id)
             except ValueError:
                 pass
     else:
-        location_query = location_query.filter(Movimiento.user_id == current_user.id)
-    if d_start:
-        location_query = location_query.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        location_query = location_query.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            location_query = location_query.join(Comercio, Movimiento.comercio_id == Comercio.id).filter(Comercio.categoria_id == int(cat_id))
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        if not cat_id:
-            location_query = location_query.join(Comercio, Movimiento.comercio_id == Comercio.id)
-        location_query = location_query.filter(Comercio.subcategoria_id == subcat_id_int)
-    location_data = location_query.group_by(Pais.id, Pais.nombre).order_by(func.sum(-(Movimiento.monto * TipoCambio.valor)).desc()).all()
-    location_pairs = [(name, float(total or 0)) for name, total in location_data if total and total > 0]
-    location_labels = [name for name, _ in location_pairs]
-    location_values = [value for _, value in location_pairs]
-
-    # ————————————————————————————————————————
-    # 3.b) Resumen del mes anterior (gastos)
-    prev_commerce_q = (
-        db.session.query(
-            Comercio.nombre.label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Movimiento, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
-    )
-    prev_commerce_q = apply_dashboard_exclusion(prev_commerce_q)
-
-    prev_commerce_unclassified_q = (
-        db.session.query(
-            db.literal('No clasificado').label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto < 0)
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
-    )
-    prev_commerce_unclassified_q = apply_dashboard_exclusion(prev_commerce_unclassified_q)
-
-    prev_subcategory_q = (
-        db.session.query(
-            func.coalesce(Subcategoria.nombre, db.literal('Sin subcategoría')).label('subnombre'),
-            Categoria.nombre.label('catnombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .outerjoin(Subcategoria, Comercio.subcategoria_id == Subcategoria.id)
-        .join(Categoria, Comercio.categoria_id == Categoria.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
-    )
-    prev_subcategory_q = apply_dashboard_exclusion(prev_subcategory_q)
+        filtro_user_id = current_user.id
 
-    prev_category_q = (
-        db.session.query(
-            Categoria.nombre.label('catnombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .join(Categoria, Comercio.categoria_id == Categoria.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
-    )
-    prev_category_q = apply_dashboard_exclusion(prev_category_q)
+    try:
+        cat_id_int = int(cat_id) if cat_id else None
+    except ValueError:
+        cat_id_int = None
 
-    prev_category_unclassified_q = (
-        db.session.query(
-            db.literal('No clasificado').label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto < 0)
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
+    # ————————————————————————————————————————
+    # 4) Gráficas y tablas: se reutilizan mientras no cambien los filtros
+    # ni los datos que las alimentan (ver `version_dashboard`)
+    today = date.today()
+    clave = (
+        filtro_user_id, d_start, d_end, cat_id_int, subcat_id_int, today,
+        version_dashboard(filtro_user_id),
     )
-    prev_category_unclassified_q = apply_dashboard_exclusion(prev_category_unclassified_q)
-
-    prev_account_q = (
-        db.session.query(
-            Cuenta.alias.label('alias'),
-            func.concat(Cuenta.banco, ' - ', Cuenta.tipo_cuenta).label('cuenta_nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .join(Cuenta, Movimiento.cuenta_id == Cuenta.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
+    graficas = cache_dashboard.obtener(
+        clave,
+        lambda: _calcular_graficas(filtro_user_id, d_start, d_end, cat_id_int, subcat_id_int, today),
     )
-    prev_account_q = apply_dashboard_exclusion(prev_account_q)
-
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                prev_commerce_q = prev_commerce_q.filter(Movimiento.user_id == oid)
-                prev_commerce_unclassified_q = prev_commerce_unclassified_q.filter(Movimiento.user_id == oid)
-                prev_category_q = prev_category_q.filter(Movimiento.user_id == oid)
-                prev_category_unclassified_q = prev_category_unclassified_q.filter(Movimiento.user_id == oid)
-                prev_account_q = prev_account_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        prev_commerce_q = prev_commerce_q.filter(Movimiento.user_id == current_user.id)
-        prev_commerce_unclassified_q = prev_commerce_unclassified_q.filter(Movimiento.user_id == current_user.id)
-        prev_category_q = prev_category_q.filter(Movimiento.user_id == current_user.id)
-        prev_category_unclassified_q = prev_category_unclassified_q.filter(Movimiento.user_id == current_user.id)
-        prev_account_q = prev_account_q.filter(Movimiento.user_id == current_user.id)
 
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            prev_commerce_q = prev_commerce_q.filter(Comercio.categoria_id == cat_id_int)
-            prev_category_q = prev_category_q.filter(Categoria.id == cat_id_int)
-            prev_account_q = prev_account_q.filter(Comercio.categoria_id == cat_id_int)
-            prev_commerce_unclassified_q = None
-            prev_category_unclassified_q = None
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        prev_commerce_q = prev_commerce_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        prev_category_q = prev_category_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        prev_subcategory_q = prev_subcategory_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        prev_account_q = prev_account_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        prev_commerce_unclassified_q = None
-        prev_category_unclassified_q = None
-
-    prev_commerce_data = list(prev_commerce_q.group_by(Comercio.id).order_by(func.sum(Movimiento.monto * TipoCambio.valor).desc()).all())
-    if prev_commerce_unclassified_q and not cat_id:
-        unclassified = prev_commerce_unclassified_q.all()
-        if unclassified and unclassified[0][1] != 0:
-            prev_commerce_data.extend(unclassified)
-
-    # Execute category query
-    prev_category_data = list(prev_category_q.group_by(Categoria.id).order_by(func.sum(Movimiento.monto * TipoCambio.valor).desc()).all())
-    if prev_category_unclassified_q and not cat_id:
-        unclassified = prev_category_unclassified_q.all()
-        if unclassified and unclassified[0][1] != 0:
-            prev_category_data.extend(unclassified)
-
-    # Redefine and execute subcategory query for the month
-    prev_subcategory_q_month = (
-        db.session.query(
-            func.coalesce(Subcategoria.nombre, db.literal('Sin subcategoría')).label('subnombre'),
-            Categoria.nombre.label('catnombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .outerjoin(Subcategoria, Comercio.subcategoria_id == Subcategoria.id)
-        .join(Categoria, Comercio.categoria_id == Categoria.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.fecha >= prev_month_start)
-        .filter(Movimiento.fecha <= prev_month_end)
-    )
-    prev_subcategory_q_month = apply_dashboard_exclusion(prev_subcategory_q_month)
-
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                prev_subcategory_q_month = prev_subcategory_q_month.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        prev_subcategory_q_month = prev_subcategory_q_month.filter(Movimiento.user_id == current_user.id)
-
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            prev_subcategory_q_month = prev_subcategory_q_month.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        prev_subcategory_q_month = prev_subcategory_q_month.filter(Comercio.subcategoria_id == subcat_id_int)
-
-    prev_subcategory_data = prev_subcategory_q_month.group_by(func.coalesce(Subcategoria.nombre, db.literal('Sin subcategoría')), Categoria.nombre).order_by(func.sum(Movimiento.monto * TipoCambio.valor).asc()).all()
-
-    # NOW process all the data into pairs for charts
-    # Ensure data structure integrity before unpacking
-    prev_month_commerce_pairs = [
-        (lbl, max(0, -(total if total is not None else 0)))
-        for lbl, total in prev_commerce_data
-        if isinstance(lbl, str) and isinstance(total, (int, float))
-    ]
-
-    prev_month_category_pairs = [
-        (lbl, max(0, -(total if total is not None else 0)))
-        for lbl, total in prev_category_data
-        if isinstance(lbl, str) and isinstance(total, (int, float))
-    ]
-
-    prev_month_subcategory_pairs = [
-        (f"{cat} - {sub}", max(0, -(total if total is not None else 0)))
-        for sub, cat, total in prev_subcategory_data
-        if isinstance(sub, str) and isinstance(cat, str) and isinstance(total, (int, float))
-    ]
-
-    prev_month_commerce_pairs = [pair for pair in prev_month_commerce_pairs if pair[1] > 0]
-
-    if prev_month_commerce_pairs:
-        prev_month_commerce_pairs.sort(key=lambda x: x[1], reverse=True)
-        prev_month_commerce_labels = [lbl for lbl, _ in prev_month_commerce_pairs]
-        prev_month_commerce_values = [val for _, val in prev_month_commerce_pairs]
-    else:
-        prev_month_commerce_labels = prev_month_commerce_values = []
-
-    prev_month_category_pairs = [pair for pair in prev_month_category_pairs if pair[1] > 0]
-
-    if prev_month_category_pairs:
-        prev_month_category_pairs.sort(key=lambda x: x[1], reverse=True)
-        prev_month_category_labels = [lbl for lbl, _ in prev_month_category_pairs]
-        prev_month_category_values = [val for _, val in prev_month_category_pairs]
-    else:
-        prev_month_category_labels = prev_month_category_values = []
-
-    if prev_subcategory_data:
-        prev_month_subcategory_pairs = [
-            (f"{cat} - {sub}", max(0, -(total if total is not None else 0)))
-            for sub, cat, total in prev_subcategory_data
-            if isinstance(sub, str) and isinstance(cat, str) and total is not None
-        ]
-        prev_month_subcategory_pairs = [pair for pair in prev_month_subcategory_pairs if pair[1] > 0]
-        if prev_month_subcategory_pairs:
-            prev_month_subcategory_pairs.sort(key=lambda x: x[1], reverse=True)
-            prev_month_subcategory_labels = [lbl for lbl, _ in prev_month_subcategory_pairs]
-            prev_month_subcategory_values = [val for _, val in prev_month_subcategory_pairs]
-        else:
-            prev_month_subcategory_labels = prev_month_subcategory_values = []
-    else:
-        prev_month_subcategory_labels = prev_month_subcategory_values = []
-
-    prev_account_data = prev_account_q.group_by(
-        Cuenta.alias,
-        func.concat(Cuenta.banco, ' - ', Cuenta.tipo_cuenta)
-    ).all()
-    prev_accounts_dict = {}
-    for alias, cuenta_nombre, total in prev_account_data:
-        monto_abs = max(0, -(total if total is not None else 0))
-        if monto_abs <= 0:
-            continue
-        cuenta_key = alias if alias else (cuenta_nombre or 'Sin cuenta')
-        prev_accounts_dict[cuenta_key] = prev_accounts_dict.get(cuenta_key, 0) + monto_abs
-
-    prev_month_account_labels = list(prev_accounts_dict.keys())
-    prev_month_account_values = list(prev_accounts_dict.values())
-
-    if prev_month_account_labels:
-        prev_month_account_pairs = sorted(
-            zip(prev_month_account_labels, prev_month_account_values),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        prev_month_account_labels, prev_month_account_values = zip(*prev_month_account_pairs)
-        prev_month_account_labels = list(prev_month_account_labels)
-        prev_month_account_values = list(prev_month_account_values)
-
-    # Parte 1: Movimientos clasificados como gastos
-    commerce_classified_q = (
-        db.session.query(
-            Comercio.nombre.label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Movimiento, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-    )
-    commerce_classified_q = apply_dashboard_exclusion(commerce_classified_q)
-    
-    # Parte 2: Movimientos sin clasificar (negativos = gastos)
-    commerce_unclassified_q = (
-        db.session.query(
-            db.literal('No clasificado').label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
+    return render_template('dashboard.html',
+        **graficas,
+        # Filtros
+        categorias=categorias,
+        users=users,
+        selected_owner=owner_id,
+        start_date=start,
+        end_date=end,
+        selected_cat=cat_id,
+        selected_subcat=subcat_id,
+        subcategorias=subcategorias,
+        all_subcategorias=all_subcategorias,
+        table_limit=table_limit
+        ,percent_threshold=percent_threshold
     )
-    commerce_unclassified_q = apply_dashboard_exclusion(commerce_unclassified_q)
-    # Aplicar filtros a ambas consultas
-    # Filtrar por owner: si el usuario es admin puede seleccionar owner_id, si no -> su propio id
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                commerce_classified_q = commerce_classified_q.filter(Movimiento.user_id == oid)
-                commerce_unclassified_q = commerce_unclassified_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                # ignore invalid owner_id
-                pass
-    else:
-        commerce_classified_q = commerce_classified_q.filter(Movimiento.user_id == current_user.id)
-        commerce_unclassified_q = commerce_unclassified_q.filter(Movimiento.user_id == current_user.id)
-
-    # Aplicar filtros de fecha
-    if d_start:
-        commerce_classified_q = commerce_classified_q.filter(Movimiento.fecha >= d_start)
-        commerce_unclassified_q = commerce_unclassified_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        commerce_classified_q = commerce_classified_q.filter(Movimiento.fecha <= d_end)
-        commerce_unclassified_q = commerce_unclassified_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            commerce_classified_q = commerce_classified_q.filter(Comercio.categoria_id == cat_id_int)
-            # Para no clasificados, si hay filtro de categoría, no incluirlos
-            commerce_unclassified_q = None
-        except ValueError:
-            pass
 
-    # Ejecutar consultas y combinar resultados
-    commerce_classified_data = commerce_classified_q.group_by(Comercio.id).order_by(func.sum(Movimiento.monto * TipoCambio.valor).asc()).all()
-    
-    commerce_data = list(commerce_classified_data)
-    
-    if commerce_unclassified_q and not cat_id:  # Solo incluir no clasificados si no hay filtro de categoría
-        commerce_unclassified_data = commerce_unclassified_q.all()
-        if commerce_unclassified_data and commerce_unclassified_data[0][1] != 0:
-            commerce_data.extend(commerce_unclassified_data)
-    if commerce_data:
-        commerce_labels, commerce_values = zip(*commerce_data)
-    else:
-        commerce_labels = commerce_values = []
-
-    commerce_table = [
-        (lbl, abs(total) if total is not None else 0) for lbl, total in commerce_data
-    ]
 
+def _calcular_graficas(filtro_user_id, d_start, d_end, cat_id_int, subcat_id_int, today):
+    """Variables del template con las gráficas y tablas (sin los filtros)."""
     # ————————————————————————————————————————
-    # 4) Gastos por Categoría (GTQ) - Incluye movimientos sin clasificar
-    # Parte 1: Movimientos clasificados como gastos
-    cat_classified_q = (
-        db.session.query(
-            Categoria.nombre.label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Comercio.categoria_id == Categoria.id)
-        .join(Movimiento, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-    )
-    cat_classified_q = apply_dashboard_exclusion(cat_classified_q)
-    
-    # Parte 2: Movimientos sin clasificar (negativos = gastos)
-    cat_unclassified_q = (
-        db.session.query(
-            db.literal('No clasificado').label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
-    )
-    cat_unclassified_q = apply_dashboard_exclusion(cat_unclassified_q)
-    # Aplicar filtros a ambas consultas de categorías
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                cat_classified_q = cat_classified_q.filter(Movimiento.user_id == oid)
-                cat_unclassified_q = cat_unclassified_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        cat_classified_q = cat_classified_q.filter(Movimiento.user_id == current_user.id)
-        cat_unclassified_q = cat_unclassified_q.filter(Movimiento.user_id == current_user.id)
-    
-    if d_start:
-        cat_classified_q = cat_classified_q.filter(Movimiento.fecha >= d_start)
-        cat_unclassified_q = cat_unclassified_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        cat_classified_q = cat_classified_q.filter(Movimiento.fecha <= d_end)
-        cat_unclassified_q = cat_unclassified_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            cat_classified_q = cat_classified_q.filter(Categoria.id == cat_id_int)
-            # Para no clasificados, si hay filtro de categoría, no incluirlos
-            cat_unclassified_q = None
-        except ValueError:
-            pass
-
-    # Ejecutar consultas y combinar resultados
-    cat_classified_data = cat_classified_q.group_by(Categoria.id).order_by(func.sum(Movimiento.monto * TipoCambio.valor).asc()).all()
-    
-    cat_data = list(cat_classified_data)
-    
-    if cat_unclassified_q and not cat_id:  # Solo incluir no clasificados si no hay filtro de categoría
-        cat_unclassified_data = cat_unclassified_q.all()
-        if cat_unclassified_data and cat_unclassified_data[0][1] != 0:
-            cat_data.extend(cat_unclassified_data)
-    if cat_data:
-        cat_labels, cat_values = zip(*cat_data)
-    else:
-        cat_labels = cat_values = []
-
-    category_table = [
-        (lbl, abs(total) if total is not None else 0) for lbl, total in cat_data
-    ]
+    # 1) Rango del mes anterior (independiente de filtros de fecha)
+    current_month_start = today.replace(day=1)
+    prev_month_end = current_month_start - relativedelta(days=1)
+    prev_month_start = prev_month_end.replace(day=1)
+    prev_month_label = prev_month_start.strftime('%Y-%m')
 
     # ————————————————————————————————————————
-    # 4.b) Gastos por Subcategoría (GTQ) - Incluye comercio sin subcategoría
-    subcategory_q = (
-        db.session.query(
-            func.coalesce(Subcategoria.nombre, db.literal('Sin subcategoría')).label('subnombre'),
-            Categoria.nombre.label('catnombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .outerjoin(Subcategoria, Comercio.subcategoria_id == Subcategoria.id)
-        .join(Categoria, Comercio.categoria_id == Categoria.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
+    # 2) Lecturas: resumen mensual del rango y del mes anterior, y gastos
+    # individuales. Todas las gráficas se calculan en memoria a partir de ellas.
+
+    # Heatmap: últimos 365 días, independiente del filtro de fechas
+    hace_365_dias = today - timedelta(days=365)
+
+    agregados = AgregadosDashboard(
+        leer_resumen(fuente_resumen(filtro_user_id, d_start, d_end)),
+        leer_resumen(fuente_resumen(filtro_user_id, prev_month_start, prev_month_end)),
+        leer_gastos(filtro_user_id, [(d_start, d_end), (hace_365_dias, today)], cat_id_int, subcat_id_int),
+        cat_id=cat_id_int,
+        subcat_id=subcat_id_int,
     )
-    subcategory_q = apply_dashboard_exclusion(subcategory_q)
-
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                subcategory_q = subcategory_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        subcategory_q = subcategory_q.filter(Movimiento.user_id == current_user.id)
-
-    if d_start:
-        subcategory_q = subcategory_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        subcategory_q = subcategory_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            subcategory_q = subcategory_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-
-    subcategory_data = subcategory_q.group_by(func.coalesce(Subcategoria.nombre, db.literal('Sin subcategoría')), Categoria.nombre).order_by(func.sum(Movimiento.monto * TipoCambio.valor).asc()).all()
-
-    if subcategory_data:
-        subcategory_pairs = [
-            (f"{cat} - {sub}", max(0, -(total if total is not None else 0)))
-            for sub, cat, total in subcategory_data
-            if isinstance(sub, str) and isinstance(cat, str) and total is not None
-        ]
-        subcategory_pairs = [pair for pair in subcategory_pairs if pair[1] > 0]
-        if subcategory_pairs:
-            subcategory_pairs.sort(key=lambda x: x[1], reverse=True)
-            subcategory_labels = [lbl for lbl, _ in subcategory_pairs]
-            subcategory_values = [val for _, val in subcategory_pairs]
-            subcategory_table = subcategory_pairs
-        else:
-            subcategory_labels = subcategory_values = []
-            subcategory_table = []
-    else:
-        subcategory_labels = subcategory_values = []
-        subcategory_table = []
 
     # ————————————————————————————————————————
-    # 5) Evolución Mensual de Gastos (GTQ) - Incluye movimientos sin clasificar
-    # label the month column so we can group/order by the labeled column (not a plain string)
-    mes = func.strftime('%Y-%m', Movimiento.fecha).label('mes')
-    
-    # Parte 1: Movimientos clasificados como gastos
-    month_classified_q = (
-        db.session.query(
-            mes,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-    )
-    month_classified_q = apply_dashboard_exclusion(month_classified_q)
-    
-    # Parte 2: Movimientos sin clasificar (negativos = gastos)
-    month_unclassified_q = (
-        db.session.query(
-            mes,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
-    )
-    month_unclassified_q = apply_dashboard_exclusion(month_unclassified_q)
-    # Aplicar filtros a ambas consultas mensuales de gastos
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                month_classified_q = month_classified_q.filter(Movimiento.user_id == oid)
-                month_unclassified_q = month_unclassified_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        month_classified_q = month_classified_q.filter(Movimiento.user_id == current_user.id)
-        month_unclassified_q = month_unclassified_q.filter(Movimiento.user_id == current_user.id)
-    
-    if d_start:
-        month_classified_q = month_classified_q.filter(Movimiento.fecha >= d_start)
-        month_unclassified_q = month_unclassified_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        month_classified_q = month_classified_q.filter(Movimiento.fecha <= d_end)
-        month_unclassified_q = month_unclassified_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            month_classified_q = month_classified_q.filter(Comercio.categoria_id == cat_id_int)
-            # Para no clasificados, si hay filtro de categoría, no incluirlos
-            month_unclassified_q = None
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        month_classified_q = month_classified_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        month_unclassified_q = None
+    # 3) Gastos por País (GTQ) - Incluye movimientos sin clasificar
+    location_pairs = agregados.paises()
+    location_labels = [name for name, _ in location_pairs]
+    location_values = [value for _, value in location_pairs]
 
-    # Ejecutar consultas y combinar resultados por mes
-    month_classified_data = month_classified_q.group_by(mes).order_by(mes).all()
-    month_data_dict = {m: total if total is not None else 0 for m, total in month_classified_data}
-    
-    if month_unclassified_q and not cat_id:  # Solo incluir no clasificados si no hay filtro de categoría
-        month_unclassified_data = month_unclassified_q.group_by(mes).order_by(mes).all()
-        for m, total in month_unclassified_data:
-            total = total if total is not None else 0
-            if m in month_data_dict:
-                month_data_dict[m] += total
-            else:
-                month_data_dict[m] = total
-    
-    # Convertir de nuevo a lista ordenada
-    month_data = [(m, total) for m, total in sorted(month_data_dict.items())]
-    if month_data:
-        month_labels, raw_vals = zip(*month_data)
-        month_values = [abs(v) if v is not None else 0 for v in raw_vals]
-    else:
-        month_labels = month_values = []
+    # ————————————————————————————————————————
+    # 4) Resumen del mes anterior (gastos)
+    mes_anterior = agregados.mes_anterior()
+    prev_month_commerce_labels = [lbl for lbl, _ in mes_anterior['comercios']]
+    prev_month_commerce_values = [val for _, val in mes_anterior['comercios']]
+    prev_month_category_labels = [lbl for lbl, _ in mes_anterior['categorias']]
+    prev_month_category_values = [val for _, val in mes_anterior['categorias']]
+    prev_month_subcategory_labels = [lbl for lbl, _ in mes_anterior['subcategorias']]
+    prev_month_subcategory_values = [val for _, val in mes_anterior['subcategorias']]
+    prev_month_account_labels = [lbl for lbl, _ in mes_anterior['cuentas']]
+    prev_month_account_values = [val for _, val in mes_anterior['cuentas']]
 
     # ————————————————————————————————————————
-    # 5.b) Evolución Mensual de Ingresos (GTQ) - Incluye movimientos sin clasificar
-    # Parte 1: Movimientos clasificados como ingresos
-    income_month_classified_q = (
-        db.session.query(
-            mes,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'ingresos')
-    )
-    income_month_classified_q = apply_dashboard_exclusion(income_month_classified_q)
-    
-    # Parte 2: Movimientos sin clasificar (positivos = ingresos)
-    income_month_unclassified_q = (
-        db.session.query(
-            mes,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto > 0)  # Solo ingresos (positivos)
-    )
-    income_month_unclassified_q = apply_dashboard_exclusion(income_month_unclassified_q)
-    # Aplicar filtros a ambas consultas mensuales de ingresos
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                income_month_classified_q = income_month_classified_q.filter(Movimiento.user_id == oid)
-                income_month_unclassified_q = income_month_unclassified_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        income_month_classified_q = income_month_classified_q.filter(Movimiento.user_id == current_user.id)
-        income_month_unclassified_q = income_month_unclassified_q.filter(Movimiento.user_id == current_user.id)
-    
-    if d_start:
-        income_month_classified_q = income_month_classified_q.filter(Movimiento.fecha >= d_start)
-        income_month_unclassified_q = income_month_unclassified_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        income_month_classified_q = income_month_classified_q.filter(Movimiento.fecha <= d_end)
-        income_month_unclassified_q = income_month_unclassified_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            # If category is selected, restrict by comercio's category (same as gastos)
-            income_month_classified_q = income_month_classified_q.filter(Comercio.categoria_id == cat_id_int)
-            # Para no clasificados, si hay filtro de categoría, no incluirlos
-            income_month_unclassified_q = None
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        income_month_classified_q = income_month_classified_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        income_month_unclassified_q = None
+    # 5) Gastos por Comercio, Categoría y Subcategoría (GTQ)
+    commerce_data = agregados.comercios_gastos()
+    commerce_labels = [lbl for lbl, _ in commerce_data]
+    commerce_values = [total for _, total in commerce_data]
+    commerce_table = [(lbl, abs(total)) for lbl, total in commerce_data]
 
-    # Ejecutar consultas y combinar resultados por mes
-    income_month_classified_data = income_month_classified_q.group_by(mes).order_by(mes).all()
-    income_month_data_dict = {m: total if total is not None else 0 for m, total in income_month_classified_data}
-    
-    if income_month_unclassified_q and not cat_id:  # Solo incluir no clasificados si no hay filtro de categoría
-        income_month_unclassified_data = income_month_unclassified_q.group_by(mes).order_by(mes).all()
-        for m, total in income_month_unclassified_data:
-            total = total if total is not None else 0
-            if m in income_month_data_dict:
-                income_month_data_dict[m] += total
-            else:
-                income_month_data_dict[m] = total
-    
-    # Convertir de nuevo a lista ordenada
-    income_month_data = [(m, total) for m, total in sorted(income_month_data_dict.items())]
+    cat_data = agregados.categorias_gastos()
+    cat_labels = [lbl for lbl, _ in cat_data]
+    cat_values = [total for _, total in cat_data]
+    category_table = [(lbl, abs(total)) for lbl, total in cat_data]
 
-    # Align income series with months from expenses: create a dict for quick lookup
-    income_by_month = {m: abs(v) if v is not None else 0 for m, v in income_month_data} if income_month_data else {}
+    subcategory_table = agregados.subcategorias_gastos()
+    subcategory_labels = [lbl for lbl, _ in subcategory_table]
+    subcategory_values = [val for _, val in subcategory_table]
 
-    # Build month_income_values aligned with month_labels (expenses). If there are months with incomes
-    # not present in expenses, include them by extending labels and values so both series share same x-axis.
-    if month_labels:
-        # Ensure month_labels is a list
-        month_labels = list(month_labels)
-        month_income_values = [income_by_month.get(m, 0) for m in month_labels]
-        # Also check for income months not in month_labels and append them
-        extra_income_months = [m for m in income_by_month.keys() if m not in month_labels]
-        if extra_income_months:
-            extra_months_sorted = sorted(extra_income_months)
-            for m in extra_months_sorted:
-                month_labels.append(m)
-                month_values.append(0)
-                month_income_values.append(income_by_month.get(m, 0))
-    else:
-        # No expense months, but maybe income months exist
-        if income_month_data:
-            month_labels, income_vals = zip(*income_month_data)
-            month_labels = list(month_labels)
-            month_values = [0 for _ in income_vals]
-            month_income_values = [abs(v) if v is not None else 0 for v in income_vals]
-        else:
-            month_labels = month_values = month_income_values = []
+    # ————————————————————————————————————————
+    # 6) Evolución Mensual de Gastos e Ingresos (GTQ)
+    month_labels, month_values, month_income_values = agregados.meses()
 
     # ————————————————————————————————————————
-    # 6) **Ingresos por Comercio (GTQ)** - Incluye movimientos sin clasificar
-    # Parte 1: Movimientos clasificados como ingresos
-    income_classified_q = (
-        db.session.query(
-            Comercio.nombre.label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(Movimiento, Movimiento.comercio_id == Comercio.id)
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Comercio.tipo_contabilizacion == 'ingresos')
-    )
-    income_classified_q = apply_dashboard_exclusion(income_classified_q)
-    
-    # Parte 2: Movimientos sin clasificar (positivos = ingresos)
-    income_unclassified_q = (
-        db.session.query(
-            db.literal('No clasificado').label('nombre'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .filter(Movimiento.comercio_id.is_(None))
-        .filter(Movimiento.monto > 0)  # Solo ingresos (positivos)
-    )
-    income_unclassified_q = apply_dashboard_exclusion(income_unclassified_q)
-    
-    # Aplicar filtros a ambas consultas de ingresos
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                income_classified_q = income_classified_q.filter(Movimiento.user_id == oid)
-                income_unclassified_q = income_unclassified_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        income_classified_q = income_classified_q.filter(Movimiento.user_id == current_user.id)
-        income_unclassified_q = income_unclassified_q.filter(Movimiento.user_id == current_user.id)
-    
-    if d_start:
-        income_classified_q = income_classified_q.filter(Movimiento.fecha >= d_start)
-        income_unclassified_q = income_unclassified_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        income_classified_q = income_classified_q.filter(Movimiento.fecha <= d_end)
-        income_unclassified_q = income_unclassified_q.filter(Movimiento.fecha <= d_end)
-    if subcat_id_int is not None:
-        income_classified_q = income_classified_q.filter(Comercio.subcategoria_id == subcat_id_int)
-        income_unclassified_q = None
-    
-    # Ejecutar consultas y combinar resultados
-    income_classified_data = income_classified_q.group_by(Comercio.id).all()
-    income_data = list(income_classified_data)
-    
-    # Incluir ingresos sin clasificar
-    income_unclassified_data = income_unclassified_q.all()
-    if income_unclassified_data and income_unclassified_data[0][1] != 0:
-        income_data.extend(income_unclassified_data)
-    
-    income_table = [
-        (lbl, abs(total) if total is not None else 0) for lbl, total in income_data
-    ]
+    # 7) Ingresos por Comercio (GTQ) - Incluye movimientos sin clasificar
+    income_table = [(lbl, abs(total)) for lbl, total in agregados.comercios_ingresos()]
 
     comercio_logo_urls = {
         comercio.nombre: url_for('main.comercio_logo', filename=comercio.logo_filename)
@@ -841,475 +209,85 @@ def dashboard():
     }
 
     # ————————————————————————————————————————
-    # 7) Top 10 Gastos Individuales - Solo movimientos clasificados como gastos
-    top_gastos_q = (
-        db.session.query(
-            Movimiento.descripcion,
-            (Movimiento.monto * TipoCambio.valor).label('monto_gtq'),
-            Movimiento.fecha,
-            Comercio.nombre
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
-    )
-    top_gastos_q = apply_dashboard_exclusion(top_gastos_q)
-    
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                top_gastos_q = top_gastos_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        top_gastos_q = top_gastos_q.filter(Movimiento.user_id == current_user.id)
-    
-    # Aplicar filtros de fecha
-    if d_start:
-        top_gastos_q = top_gastos_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        top_gastos_q = top_gastos_q.filter(Movimiento.fecha <= d_end)
-    
-    # Aplicar filtro de categoría
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            top_gastos_q = top_gastos_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        top_gastos_q = top_gastos_q.filter(Comercio.subcategoria_id == subcat_id_int)
-    
-    # Ejecutar consulta y obtener top 10
-    top_gastos_data = top_gastos_q.order_by((Movimiento.monto * TipoCambio.valor).asc()).limit(10).all()
-    
-    # Preparar datos para la gráfica
-    if top_gastos_data:
-        top_gastos_labels = [f"{row[0][:30]}..." if len(row[0]) > 30 else row[0] for row in top_gastos_data]
-        top_gastos_values = [abs(row[1]) for row in top_gastos_data]
-    else:
-        top_gastos_labels = top_gastos_values = []
-    
-    # ————————————————————————————————————————
-    # 8) Gastos por Día de la Semana - Solo movimientos clasificados como gastos
-    # Usar función SQL para extraer día de semana (0=domingo, 1=lunes, ..., 6=sábado)
-    dia_semana = func.strftime('%w', Movimiento.fecha).label('dia_semana')
-    
-    gastos_dia_q = (
-        db.session.query(
-            dia_semana,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
-    )
-    gastos_dia_q = apply_dashboard_exclusion(gastos_dia_q)
-    
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                gastos_dia_q = gastos_dia_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        gastos_dia_q = gastos_dia_q.filter(Movimiento.user_id == current_user.id)
-    
-    # Aplicar filtros de fecha
-    if d_start:
-        gastos_dia_q = gastos_dia_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        gastos_dia_q = gastos_dia_q.filter(Movimiento.fecha <= d_end)
-    
-    # Aplicar filtro de categoría
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            gastos_dia_q = gastos_dia_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        gastos_dia_q = gastos_dia_q.filter(Comercio.subcategoria_id == subcat_id_int)
-    
-    # Ejecutar consulta
-    gastos_dia_data = gastos_dia_q.group_by(dia_semana).all()
-    
-    # Crear diccionario con días de la semana
-    dias_nombres = ['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
-    gastos_por_dia = {str(i): 0 for i in range(7)}
-    
-    for dia, total in gastos_dia_data:
-        gastos_por_dia[dia] = abs(total) if total else 0
-    
-    # Convertir a listas para la gráfica
-    weekday_labels = dias_nombres
-    weekday_values = [gastos_por_dia[str(i)] for i in range(7)]
-
-    # ————————————————————————————————————————
-    # 9) Distribución de Gastos por Rangos
-    rangos_gastos_q = (
-        db.session.query(
-            (Movimiento.monto * TipoCambio.valor).label('monto_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)  # Solo gastos (negativos)
-    )
-    rangos_gastos_q = apply_dashboard_exclusion(rangos_gastos_q)
-    
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                rangos_gastos_q = rangos_gastos_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        rangos_gastos_q = rangos_gastos_q.filter(Movimiento.user_id == current_user.id)
-    
-    # Aplicar filtros de fecha y categoría
-    if d_start:
-        rangos_gastos_q = rangos_gastos_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        rangos_gastos_q = rangos_gastos_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            rangos_gastos_q = rangos_gastos_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        rangos_gastos_q = rangos_gastos_q.filter(Comercio.subcategoria_id == subcat_id_int)
-    
-    # Obtener todos los gastos
-    rangos_data = rangos_gastos_q.all()
-    
-    # Definir rangos y contar
-    rangos = [
-        ("Q0-100", 0, 100),
-        ("Q100-500", 100, 500), 
-        ("Q500-1000", 500, 1000),
-        ("Q1000-2000", 1000, 2000),
-        ("Q2000+", 2000, float('inf'))
+    # 8) Gastos individuales: top 10, día de la semana, rangos y recurrentes
+    individuales = agregados.gastos_individuales(d_start, d_end)
+    top_gastos_labels = [
+        f"{desc[:30]}..." if len(desc) > 30 else desc
+        for desc, _ in individuales['top']
     ]
-    
-    rangos_count = [0] * len(rangos)
-    
-    for row in rangos_data:
-        monto_abs = abs(row[0]) if row[0] else 0
-        for i, (label, min_val, max_val) in enumerate(rangos):
-            if min_val <= monto_abs < max_val:
-                rangos_count[i] += 1
-                break
-    
-    rangos_labels = [r[0] for r in rangos]
-    rangos_values = rangos_count
-
-    # ————————————————————————————————————————
-    # 10) Heatmap Calendario de Gastos (último año completo)
-    from datetime import timedelta
-    
-    # Calcular rango de fechas para heatmap (últimos 365 días)
-    hoy = date.today()
-    hace_365_dias = hoy - timedelta(days=365)
-    
-    heatmap_gastos_q = (
-        db.session.query(
-            Movimiento.fecha,
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_dia')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)
-        .filter(Movimiento.fecha >= hace_365_dias)
-        .filter(Movimiento.fecha <= hoy)
-    )
-    heatmap_gastos_q = apply_dashboard_exclusion(heatmap_gastos_q)
-    
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                heatmap_gastos_q = heatmap_gastos_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        heatmap_gastos_q = heatmap_gastos_q.filter(Movimiento.user_id == current_user.id)
-    
-    # Aplicar filtro de categoría
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            heatmap_gastos_q = heatmap_gastos_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        heatmap_gastos_q = heatmap_gastos_q.filter(Comercio.subcategoria_id == subcat_id_int)
-    
-    heatmap_data = heatmap_gastos_q.group_by(Movimiento.fecha).all()
-    
-    # Crear diccionario de gastos por día
-    gastos_por_dia_dict = {}
-    for fecha, total in heatmap_data:
-        gastos_por_dia_dict[fecha.strftime('%Y-%m-%d')] = abs(total) if total else 0
-    
-    # Crear lista de todos los días en el rango
-    heatmap_dates = []
-    heatmap_amounts = []
-    current_date = hace_365_dias
-    
-    while current_date <= hoy:
-        date_str = current_date.strftime('%Y-%m-%d')
-        heatmap_dates.append(date_str)
-        heatmap_amounts.append(gastos_por_dia_dict.get(date_str, 0))
-        current_date += timedelta(days=1)
-
-    # ————————————————————————————————————————
-    # 11) Gastos Recurrentes vs Únicos (por descripción similar)
-    from collections import Counter
-    
-    recurrentes_q = (
-        db.session.query(
-            Movimiento.descripcion,
-            func.count(Movimiento.id).label('frecuencia'),
-            func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-        )
-        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-        .join(Comercio, Movimiento.comercio_id == Comercio.id)
-        .filter(Comercio.tipo_contabilizacion == 'gastos')
-        .filter(Movimiento.monto < 0)
-    )
-    recurrentes_q = apply_dashboard_exclusion(recurrentes_q)
-    
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                recurrentes_q = recurrentes_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        recurrentes_q = recurrentes_q.filter(Movimiento.user_id == current_user.id)
-    
-    # Aplicar filtros de fecha y categoría
-    if d_start:
-        recurrentes_q = recurrentes_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        recurrentes_q = recurrentes_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            recurrentes_q = recurrentes_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        recurrentes_q = recurrentes_q.filter(Comercio.subcategoria_id == subcat_id_int)
-    
-    recurrentes_data = recurrentes_q.group_by(Movimiento.descripcion).all()
-    
-    # Clasificar en recurrentes (>= 2 veces) vs únicos (1 vez)
-    total_recurrentes = 0
-    total_unicos = 0
-    
-    for desc, freq, total in recurrentes_data:
-        monto_abs = abs(total) if total else 0
-        if freq >= 2:
-            total_recurrentes += monto_abs
-        else:
-            total_unicos += monto_abs
-    
+    top_gastos_values = [monto for _, monto in individuales['top']]
+    weekday_labels = DIAS_SEMANA
+    weekday_values = individuales['dias']
+    rangos_labels = [r[0] for r in RANGOS_GASTOS]
+    rangos_values = individuales['rangos']
     recurrentes_labels = ['Gastos Recurrentes', 'Gastos Únicos']
-    recurrentes_values = [total_recurrentes, total_unicos]
+    recurrentes_values = individuales['recurrentes']
 
     # ————————————————————————————————————————
-    # 12) Análisis por Cuenta/Moneda
-    cuentas_q = (
-            db.session.query(
-                Cuenta.alias.label('alias'),
-                func.concat(Cuenta.banco, ' - ', Cuenta.tipo_cuenta).label('cuenta_nombre'),
-                Movimiento.moneda,
-                func.sum(Movimiento.monto * TipoCambio.valor).label('total_gtq')
-            )
-            .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
-            .join(Comercio, Movimiento.comercio_id == Comercio.id)
-            .join(Cuenta, Movimiento.cuenta_id == Cuenta.id)
-            .filter(Comercio.tipo_contabilizacion == 'gastos')
-            .filter(Movimiento.monto < 0)
-        )
-    cuentas_q = apply_dashboard_exclusion(cuentas_q)
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                cuentas_q = cuentas_q.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        cuentas_q = cuentas_q.filter(Movimiento.user_id == current_user.id)
-
-    # Aplicar filtros de fecha y categoría
-    if d_start:
-        cuentas_q = cuentas_q.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        cuentas_q = cuentas_q.filter(Movimiento.fecha <= d_end)
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            cuentas_q = cuentas_q.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        cuentas_q = cuentas_q.filter(Comercio.subcategoria_id == subcat_id_int)
+    # 9) Heatmap Calendario de Gastos (último año completo)
+    heatmap_dates, heatmap_amounts = agregados.heatmap(hace_365_dias, today)
 
-    cuentas_data = cuentas_q.group_by(Cuenta.alias, func.concat(Cuenta.banco, ' - ', Cuenta.tipo_cuenta), Movimiento.moneda).all()
-
-    # Preparar datos para gráficas
-    cuentas_labels = []
-    cuentas_values = []
-    monedas_labels = []
-    monedas_values = []
-
-    # Agrupar por cuenta
-    cuentas_dict = {}
-    monedas_dict = {}
-
-    for alias, cuenta_nombre, moneda, total in cuentas_data:
-        monto_abs = abs(total) if total else 0
-        # Preferir alias si está disponible, si no usar la combinación banco - tipo
-        cuenta_key = alias if alias else (cuenta_nombre or 'Sin cuenta')
-        cuentas_dict[cuenta_key] = cuentas_dict.get(cuenta_key, 0) + monto_abs
-        # Por moneda
-        monedas_dict[moneda] = monedas_dict.get(moneda, 0) + monto_abs
-
-    # Convertir a listas
+    # ————————————————————————————————————————
+    # 10) Análisis por Cuenta/Moneda
+    cuentas_dict, monedas_dict = agregados.cuentas_y_monedas()
     cuentas_labels = list(cuentas_dict.keys())
     cuentas_values = list(cuentas_dict.values())
     monedas_labels = list(monedas_dict.keys())
     monedas_values = list(monedas_dict.values())
 
     # ————————————————————————————————————————
-    # COMERCIOS MÁS RECURRENTES
-    # ————————————————————————————————————————
-    comercios_recurrentes_query = db.session.query(
-        Comercio.nombre,
-        func.count(Movimiento.id).label('count')
-    ).join(
-        Movimiento, Movimiento.comercio_id == Comercio.id
-    ).join(
-        Categoria, Comercio.categoria_id == Categoria.id
-    ).filter(
-        Comercio.tipo_contabilizacion == 'gastos'  # Solo gastos
-    )
-    comercios_recurrentes_query = apply_dashboard_exclusion(comercios_recurrentes_query)
+    # 11) Comercios más recurrentes
+    comercios_recurrentes = agregados.comercios_recurrentes()
+    comercios_recurrentes_labels = [nombre for nombre, _ in comercios_recurrentes]
+    comercios_recurrentes_values = [count for _, count in comercios_recurrentes]
 
-    # Aplicar filtros de usuario
-    if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        if owner_id:
-            try:
-                oid = int(owner_id)
-                comercios_recurrentes_query = comercios_recurrentes_query.filter(Movimiento.user_id == oid)
-            except ValueError:
-                pass
-    else:
-        comercios_recurrentes_query = comercios_recurrentes_query.filter(Movimiento.user_id == current_user.id)
-
-    # Aplicar filtros de fecha
-    if d_start:
-        comercios_recurrentes_query = comercios_recurrentes_query.filter(Movimiento.fecha >= d_start)
-    if d_end:
-        comercios_recurrentes_query = comercios_recurrentes_query.filter(Movimiento.fecha <= d_end)
-
-    # Filtro de categoría
-    if cat_id:
-        try:
-            cat_id_int = int(cat_id)
-            comercios_recurrentes_query = comercios_recurrentes_query.filter(Comercio.categoria_id == cat_id_int)
-        except ValueError:
-            pass
-    if subcat_id_int is not None:
-        comercios_recurrentes_query = comercios_recurrentes_query.filter(Comercio.subcategoria_id == subcat_id_int)
-
-    # Agrupar, ordenar y limitar a top 10
-    comercios_recurrentes_result = comercios_recurrentes_query.group_by(
-        Comercio.nombre
-    ).order_by(
-        func.count(Movimiento.id).desc()
-    ).limit(10).all()
-
-    comercios_recurrentes_labels = [c.nombre for c in comercios_recurrentes_result]
-    comercios_recurrentes_values = [c.count for c in comercios_recurrentes_result]
-
-    return render_template('dashboard.html',
+    return {
         # Charts de gastos
-        commerce_labels=list(commerce_labels),
-        commerce_values=list(commerce_values),
-        cat_labels=list(cat_labels),
-        cat_values=list(cat_values),
-        location_labels=location_labels,
-        location_values=location_values,
-        month_labels=list(month_labels),
-        month_values=list(month_values),
-        month_income_values=list(month_income_values),
+        'commerce_labels': list(commerce_labels),
+        'commerce_values': list(commerce_values),
+        'cat_labels': list(cat_labels),
+        'cat_values': list(cat_values),
+        'location_labels': location_labels,
+        'location_values': location_values,
+        'month_labels': list(month_labels),
+        'month_values': list(month_values),
+        'month_income_values': list(month_income_values),
         # Nuevas gráficas
-        top_gastos_labels=top_gastos_labels,
-        top_gastos_values=top_gastos_values,
-        weekday_labels=weekday_labels,
-        weekday_values=weekday_values,
+        'top_gastos_labels': top_gastos_labels,
+        'top_gastos_values': top_gastos_values,
+        'weekday_labels': weekday_labels,
+        'weekday_values': weekday_values,
         # Gráficas adicionales
-        rangos_labels=rangos_labels,
-        rangos_values=rangos_values,
-        heatmap_dates=heatmap_dates,
-        heatmap_amounts=heatmap_amounts,
-        recurrentes_labels=recurrentes_labels,
-        recurrentes_values=recurrentes_values,
-        cuentas_labels=cuentas_labels,
-        cuentas_values=cuentas_values,
-        monedas_labels=monedas_labels,
-        monedas_values=monedas_values,
-        comercios_recurrentes_labels=comercios_recurrentes_labels,
-        comercios_recurrentes_values=comercios_recurrentes_values,
-        prev_month_label=prev_month_label,
-        prev_month_category_labels=prev_month_category_labels,
-        prev_month_category_values=prev_month_category_values,
-        prev_month_subcategory_labels=prev_month_subcategory_labels,
-        prev_month_subcategory_values=prev_month_subcategory_values,
-        prev_month_commerce_labels=prev_month_commerce_labels,
-        prev_month_commerce_values=prev_month_commerce_values,
-        prev_month_account_labels=prev_month_account_labels,
-        prev_month_account_values=prev_month_account_values,
-        subcategory_labels=subcategory_labels,
-        subcategory_values=subcategory_values,
-        subcategory_table=subcategory_table,
+        'rangos_labels': rangos_labels,
+        'rangos_values': rangos_values,
+        'heatmap_dates': heatmap_dates,
+        'heatmap_amounts': heatmap_amounts,
+        'recurrentes_labels': recurrentes_labels,
+        'recurrentes_values': recurrentes_values,
+        'cuentas_labels': cuentas_labels,
+        'cuentas_values': cuentas_values,
+        'monedas_labels': monedas_labels,
+        'monedas_values': monedas_values,
+        'comercios_recurrentes_labels': comercios_recurrentes_labels,
+        'comercios_recurrentes_values': comercios_recurrentes_values,
+        'prev_month_label': prev_month_label,
+        'prev_month_category_labels': prev_month_category_labels,
+        'prev_month_category_values': prev_month_category_values,
+        'prev_month_subcategory_labels': prev_month_subcategory_labels,
+        'prev_month_subcategory_values': prev_month_subcategory_values,
+        'prev_month_commerce_labels': prev_month_commerce_labels,
+        'prev_month_commerce_values': prev_month_commerce_values,
+        'prev_month_account_labels': prev_month_account_labels,
+        'prev_month_account_values': prev_month_account_values,
+        'subcategory_labels': subcategory_labels,
+        'subcategory_values': subcategory_values,
+        'subcategory_table': subcategory_table,
         # Tablas de gastos
-        commerce_table=commerce_table,
-        comercio_logo_urls=comercio_logo_urls,
-        category_table=category_table,
-        categoria_logo_urls=categoria_logo_urls,
+        'commerce_table': commerce_table,
+        'comercio_logo_urls': comercio_logo_urls,
+        'category_table': category_table,
+        'categoria_logo_urls': categoria_logo_urls,
         # **Tabla de ingresos**
-        income_table=income_table,
-        subcategoria_logo_urls=subcategoria_logo_urls,
-        # Filtros
-        categorias=categorias,
-        users=users,
-        selected_owner=owner_id,
-        start_date=start,
-        end_date=end,
-        selected_cat=cat_id,
-        selected_subcat=subcat_id,
-        subcategorias=subcategorias,
-        all_subcategorias=all_subcategorias,
-        table_limit=table_limit
-        ,percent_threshold=percent_threshold
-    )
+        'income_table': income_table,
+        'subcategoria_logo_urls': subcategoria_logo_urls,
+    }
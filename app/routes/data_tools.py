@@ -7,6 +7,7 @@ from flask_login import login_required, current_user
 import json
 
 from ..utils.database_backup import backup_database
+from ..utils.classifier import clasificar_movimientos
 
 
 @bp.route('/export_config')
@@ -256,6 +257,25 @@ def backup_database_now():
 
 
 
+@bp.route('/clasificar_todos', methods=['POST'])
+@login_required
+def clasificar_todos():
+    # Pasada completa sobre toda la tabla de movimientos (solo admin)
+    if not (hasattr(current_user, 'is_admin') and current_user.is_admin()):
+        abort(403)
+
+    try:
+        clasificar_movimientos()
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo clasificar los movimientos: {exc}', 'danger')
+    else:
+        flash('Se aplicaron las reglas a todos los movimientos sin clasificar.', 'success')
+
+    return redirect(url_for('main.data_tools'))
+
+
+
 @bp.route('/datos')
 @login_required
 def data_tools():
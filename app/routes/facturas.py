@@ -5,7 +5,8 @@ from flask_login import login_required, current_user
 from sqlalchemy import or_
 
 from . import bp
-from ..models import Factura, User
+from ..models import Factura
+from ..utils.catalogos import catalogos
 
 
 @bp.route('/facturas', methods=['GET'])
@@ -75,7 +76,7 @@ def list_facturas():
 
     users = []
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
 
     tipos_documento = [t[0] for t in Factura.query.with_entities(Factura.tipo_documento).distinct().all() if t[0]]
 
@@ -1,12 +1,16 @@
 import os
 import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask import render_template, request, flash
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func, or_
+from sqlalchemy import or_
 from .. import db
-from ..models import Movimiento, Cuenta, Comercio, Categoria, Subcategoria, TipoCambio, User, Archivo, Factura, Pais
+from ..models import Movimiento, Comercio, TipoCambio, Archivo
 from ..models import Movimiento as MovimientoModel
+from ..utils.catalogos import catalogos
+from ..utils.coincidencias_facturas import leer_parametros, recomendar_facturas
+from ..utils.listado_movimientos import PaginacionMovimientos, totales_movimientos, version_listado
+from ..utils.text_index import filtro_texto
 from . import bp
 from flask import redirect, url_for
 from flask_login import login_required, current_user
@@ -30,26 +34,27 @@ def index():
     per_page = request.args.get('per_page', default=50, type=int)
     if per_page not in (25, 50, 100):
         per_page = 50
+    cursor = request.args.get('cursor', '')
 
     # Base de la consulta
-    query = Movimiento.query.options(
-        joinedload(Movimiento.comercio)
-                   .joinedload(Comercio.categoria),
-        joinedload(Movimiento.cuenta)
-    )
+    query = Movimiento.query
+    cat = catalogos()
     # Filtrar por owner: admin puede filtrar por owner_id; los usuarios normales ven solo lo suyo
+    filtro_user_id = None
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
         # obtener lista de usuarios para el select
-        users = User.query.order_by(User.username).all()
+        users = cat.usuarios
         if selected_owner:
             try:
                 oid = int(selected_owner)
                 query = query.filter(Movimiento.user_id == oid)
+                filtro_user_id = oid
             except ValueError:
                 pass
     else:
         users = []
         query = query.filter(Movimiento.user_id == current_user.id)
+        filtro_user_id = current_user.id
     
 
     # Filtros
@@ -66,7 +71,7 @@ def index():
         except ValueError:
             flash('Fecha “Hasta” inválida', 'warning')
     if desc:
-        query = query.filter(Movimiento.descripcion.ilike(f'%{desc}%'))
+        query = query.filter(filtro_texto(desc))
     if selected_comercio:
         query = query.filter(Movimiento.comercio_id == int(selected_comercio))
     if selected_categoria:
@@ -106,33 +111,40 @@ def index():
         except ValueError:
             pass
 
-    # Totales sobre el conjunto filtrado completo (antes de paginar)
-    sum_debito = query.filter(Movimiento.tipo == 'debito').with_entities(func.coalesce(func.sum(Movimiento.monto), 0)).scalar() or 0
-    sum_credito = query.filter(Movimiento.tipo == 'credito').with_entities(func.coalesce(func.sum(Movimiento.monto), 0)).scalar() or 0
-
-    # Obtener los movimientos paginados
-    pagination = query.order_by(Movimiento.fecha.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    # Totales sobre el conjunto filtrado completo (antes de paginar), en caché por filtro
+    clave_totales = (
+        filtro_user_id, start, end, desc, selected_comercio, selected_categoria, selected_subcategoria,
+        selected_tipo_cont, selected_cuenta, selected_pais, version_listado(filtro_user_id),
+    )
+    total_movs, sum_debito, sum_credito = totales_movimientos(query, clave_totales)
+
+    # Obtener los movimientos paginados por (fecha, id)
+    pagination = PaginacionMovimientos(
+        page=page, per_page=per_page, error_out=False, total=total_movs, cursor=cursor,
+        query=query.options(
+            joinedload(Movimiento.comercio)
+                       .joinedload(Comercio.categoria),
+            joinedload(Movimiento.cuenta)
+        ),
+    )
     movimientos = pagination.items
 
     # Totales
-    total_movs = pagination.total
     range_start = 0 if total_movs == 0 else ((pagination.page - 1) * pagination.per_page) + 1
     range_end = min(pagination.page * pagination.per_page, total_movs)
 
     # Opciones para los selects
-    cuentas     = Cuenta.query.filter_by(user_id=current_user.id).order_by(Cuenta.numero_cuenta).all()
-    comercios   = Comercio.query.order_by(Comercio.nombre).all()
-    paises      = Pais.query.order_by(Pais.nombre).all()
-    categorias  = Categoria.query.order_by(Categoria.nombre).all()
-    all_subcategorias = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre).all()
-    subcategorias_query = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre)
+    cuentas     = cat.cuentas(user_id=current_user.id)
+    comercios   = cat.comercios
+    paises      = cat.paises
+    categorias  = cat.categorias
+    all_subcategorias = cat.subcategorias()
+    subcategorias = all_subcategorias
     if selected_categoria:
         try:
-            selected_categoria_id = int(selected_categoria)
-            subcategorias_query = subcategorias_query.filter(Subcategoria.categoria_id == selected_categoria_id)
+            subcategorias = cat.subcategorias(int(selected_categoria))
         except ValueError:
             pass
-    subcategorias = subcategorias_query.all()
     tipos       = ['ingresos', 'gastos', 'transferencias']
 
     return render_template(
@@ -169,9 +181,10 @@ def index():
 @bp.route('/movimiento/<int:mov_id>/edit', methods=['GET', 'POST'])
 def edit_movimiento(mov_id):
     mov = Movimiento.query.get_or_404(mov_id)
-    cuentas   = Cuenta.query.order_by(Cuenta.numero_cuenta).all()
-    comercios = Comercio.query.order_by(Comercio.nombre).all()
-    paises = Pais.query.order_by(Pais.nombre).all()
+    cat = catalogos()
+    cuentas   = cat.cuentas()
+    comercios = cat.comercios
+    paises = cat.paises
     
     # Detectar si viene desde sin_clasificar
     from_sin_clasificar = request.args.get('from') == 'sin_clasificar'
@@ -263,9 +276,10 @@ def _get_or_create_archivo_manual(user_id):
 @login_required
 def add_movimiento():
     from datetime import date as _date
-    cuentas   = Cuenta.query.order_by(Cuenta.numero_cuenta).all()
-    comercios = Comercio.query.order_by(Comercio.nombre).all()
-    paises = Pais.query.order_by(Pais.nombre).all()
+    cat = catalogos()
+    cuentas   = cat.cuentas()
+    comercios = cat.comercios
+    paises = cat.paises
     today = _date.today().isoformat()
 
     if request.method == 'POST':
@@ -353,68 +367,16 @@ def movimiento_facturas_relacionadas(mov_id):
             flash('Acceso denegado', 'danger')
             return redirect(url_for('main.index'))
 
-    days_window = request.args.get('fact_days', '7')
-    pct_tolerance = request.args.get('fact_pct', '0.01')
-    abs_tolerance = request.args.get('fact_abs', '0.01')
-
-    try:
-        days_window_int = max(0, int(days_window))
-    except ValueError:
-        days_window_int = 7
-
-    try:
-        pct_tolerance_float = max(0.0, float(pct_tolerance)) / 100.0
-    except ValueError:
-        pct_tolerance_float = 0.0001
-
-    try:
-        abs_tolerance_float = max(0.0, float(abs_tolerance))
-    except ValueError:
-        abs_tolerance_float = 0.01
-
-    matches = []
-    if movimiento.fecha is not None and movimiento.monto is not None:
-        monto_mov = abs(float(movimiento.monto))
-        if monto_mov > 0:
-            facturas = Factura.query.filter(
-                Factura.user_id == movimiento.user_id,
-                Factura.fecha_emision >= (movimiento.fecha - timedelta(days=days_window_int)),
-                Factura.fecha_emision <= (movimiento.fecha + timedelta(days=days_window_int)),
-            ).all()
-
-            for f in facturas:
-                if f.fecha_emision is None or f.gran_total is None:
-                    continue
-
-                diff_dias = abs((f.fecha_emision.date() - movimiento.fecha).days)
-                if diff_dias > days_window_int:
-                    continue
-
-                monto_factura = abs(float(f.gran_total))
-                diff_monto = abs(monto_mov - monto_factura)
-                pct_diff = diff_monto / monto_mov
-
-                if pct_diff > pct_tolerance_float and diff_monto > abs_tolerance_float:
-                    continue
-
-                score = (pct_diff, diff_monto, diff_dias)
-                matches.append({
-                    'factura': f,
-                    'diff_monto': diff_monto,
-                    'pct_diff': pct_diff,
-                    'diff_dias': diff_dias,
-                    'score': score,
-                })
-
-            matches.sort(key=lambda x: x['score'])
-            matches = matches[:3]
+    parametros = leer_parametros(request.args)
+    recomendaciones = recomendar_facturas([movimiento], parametros, user_id=movimiento.user_id)
+    matches = recomendaciones.get(movimiento.id, []) if movimiento.user_id is not None else []
 
     return render_template(
         'movimiento_facturas_relacionadas.html',
         movimiento=movimiento,
         matches=matches,
-        fact_days=days_window_int,
-        fact_pct=(pct_tolerance_float * 100.0),
-        fact_abs=abs_tolerance_float,
+        fact_days=parametros.dias,
+        fact_pct=(parametros.pct * 100.0),
+        fact_abs=parametros.abs,
     )
 
@@ -1,8 +1,10 @@
 from flask import render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from . import bp
-from ..models import Movimiento, Comercio, Regla, User, Factura
-from ..utils.classifier import reclasificar_movimientos
+from ..models import Movimiento, Comercio, Regla
+from ..utils.catalogos import catalogos
+from ..utils.classifier import reclasificar_comercio
+from ..utils.coincidencias_facturas import guardar_tolerancias, leer_parametros, recomendar_facturas
 from .. import db
 
 
@@ -13,139 +15,63 @@ def sin_clasificar():
     selected_owner = request.args.get('owner_id', '')
 
     # Parámetros de recomendación de factura
-    # Defaults: +-7 días, 0.01% y Q0.01 de tolerancia
-    days_window = request.args.get('fact_days', '7')
-    pct_tolerance = request.args.get('fact_pct', '0.01')
-    abs_tolerance = request.args.get('fact_abs', '0.01')
-
-    try:
-        days_window_int = max(0, int(days_window))
-    except ValueError:
-        days_window_int = 7
-
-    try:
-        pct_tolerance_float = max(0.0, float(pct_tolerance)) / 100.0
-    except ValueError:
-        pct_tolerance_float = 0.0001
-
-    try:
-        abs_tolerance_float = max(0.0, float(abs_tolerance))
-    except ValueError:
-        abs_tolerance_float = 0.01
+    parametros = leer_parametros(request.args)
     
     # Base de la consulta - movimientos sin comercio asignado
     query = Movimiento.query.filter_by(comercio_id=None)
     
     # Filtrar por owner: admin puede filtrar por owner_id; los usuarios normales ven solo lo suyo
+    facturas_user_id = None
     if hasattr(current_user, 'is_admin') and current_user.is_admin():
         # obtener lista de usuarios para el select
-        users = User.query.order_by(User.username).all()
+        users = catalogos().usuarios
         if selected_owner:
             try:
                 oid = int(selected_owner)
                 query = query.filter(Movimiento.user_id == oid)
+                facturas_user_id = oid
             except ValueError:
                 pass
     else:
         users = []
         query = query.filter(Movimiento.user_id == current_user.id)
+        facturas_user_id = current_user.id
     
     movimientos = query.order_by(Movimiento.fecha.desc()).all()
-    comercios = Comercio.query.order_by(Comercio.nombre).all()
+    comercios = catalogos().comercios
 
     # Recomendación de factura por movimiento:
     # misma persona dueña del movimiento, fecha dentro de +-N días,
     # y monto similar usando tolerancia combinada absoluta/porcentual.
-    recomendaciones_factura = {}
-    if movimientos:
-        fechas = [m.fecha for m in movimientos if m.fecha is not None]
-        if fechas:
-            min_fecha = min(fechas)
-            max_fecha = max(fechas)
-
-            facturas_query = Factura.query.filter(
-                Factura.fecha_emision >= min_fecha,
-                Factura.fecha_emision <= max_fecha
-            )
-
-            # Extender ventana para poder evaluar +-N días por movimiento.
-            from datetime import timedelta
-            facturas_query = facturas_query.filter(
-                Factura.fecha_emision >= (min_fecha - timedelta(days=days_window_int)),
-                Factura.fecha_emision <= (max_fecha + timedelta(days=days_window_int))
-            )
-
-            # Respetar owner seleccionado cuando aplique.
-            if hasattr(current_user, 'is_admin') and current_user.is_admin():
-                if selected_owner:
-                    try:
-                        oid = int(selected_owner)
-                        facturas_query = facturas_query.filter(Factura.user_id == oid)
-                    except ValueError:
-                        pass
-            else:
-                facturas_query = facturas_query.filter(Factura.user_id == current_user.id)
-
-            facturas = facturas_query.all()
-
-            # Agrupar facturas por usuario para evitar cruces entre usuarios.
-            facturas_por_user = {}
-            for f in facturas:
-                facturas_por_user.setdefault(f.user_id, []).append(f)
-
-            for m in movimientos:
-                if m.fecha is None or m.monto is None:
-                    continue
-
-                monto_mov = abs(float(m.monto))
-                if monto_mov == 0:
-                    continue
-
-                candidatas = facturas_por_user.get(m.user_id, [])
-                matches = []
-
-                for f in candidatas:
-                    if f.fecha_emision is None or f.gran_total is None:
-                        continue
-
-                    diff_dias = abs((f.fecha_emision.date() - m.fecha).days)
-                    if diff_dias > days_window_int:
-                        continue
-
-                    monto_factura = abs(float(f.gran_total))
-                    diff_monto = abs(monto_mov - monto_factura)
-                    pct_diff = diff_monto / monto_mov
-
-                    # Tolerancia flexible para capturar "monto similar".
-                    # Acepta si difiere <= pct_tolerance o <= abs_tolerance.
-                    if pct_diff > pct_tolerance_float and diff_monto > abs_tolerance_float:
-                        continue
-
-                    # Priorizamos menor diferencia porcentual, luego monto y luego cercanía de fecha.
-                    score = (pct_diff, diff_monto, diff_dias)
-                    matches.append({
-                        'factura': f,
-                        'diff_monto': diff_monto,
-                        'pct_diff': pct_diff,
-                        'diff_dias': diff_dias,
-                        'score': score,
-                    })
-
-                if matches:
-                    matches.sort(key=lambda x: x['score'])
-                    recomendaciones_factura[m.id] = matches[:3]
+    recomendaciones_factura = recomendar_facturas(
+        movimientos, parametros, user_id=facturas_user_id, consulta=query,
+    )
     
     return render_template('sin_clasificar.html',
                            movimientos=movimientos,
                            comercios=comercios,
                            recomendaciones_factura=recomendaciones_factura,
-                           fact_days=days_window_int,
-                           fact_pct=(pct_tolerance_float * 100.0),
-                           fact_abs=abs_tolerance_float,
+                           fact_days=parametros.dias,
+                           fact_pct=(parametros.pct * 100.0),
+                           fact_abs=parametros.abs,
                            users=users,
                            selected_owner=selected_owner)
 
 
+@bp.route('/sin_clasificar/tolerancias', methods=['POST'])
+@login_required
+def guardar_tolerancias_facturas():
+    """Guarda las tolerancias del formulario como predeterminadas (solo admin)."""
+    if not (hasattr(current_user, 'is_admin') and current_user.is_admin()):
+        flash('Acceso denegado', 'danger')
+        return redirect(url_for('main.sin_clasificar'))
+
+    parametros = leer_parametros(request.form)
+    guardar_tolerancias(parametros)
+    flash('Tolerancias de facturas guardadas como predeterminadas.', 'success')
+    return redirect(url_for('main.sin_clasificar', owner_id=request.form.get('owner_id') or None))
+
+
 @bp.route('/sin_clasificar/assign', methods=['POST'])
 def assign_movimiento_rule():
     mov_id     = request.form.get('movimiento_id')
@@ -163,8 +89,8 @@ def assign_movimiento_rule():
     db.session.add(nueva_regla)
     db.session.commit()
 
-    # Re-clasificar todos los movimientos
-    reclasificar_movimientos()
+    # Re-clasificar los movimientos afectados por la nueva regla
+    reclasificar_comercio(comercio.id)
 
     flash('Se ha añadido la regla y reclasificado los movimientos.', 'success')
     return redirect(url_for('main.edit_comercio', comercio_id=comercio.id))
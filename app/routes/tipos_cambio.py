@@ -1,7 +1,9 @@
+from datetime import datetime
+
 from flask import render_template, request, redirect, url_for, flash
 from . import bp
 from .. import db
-from ..models import TipoCambio
+from ..models import TipoCambio, TipoCambioHistorico
 
 
 @bp.route('/tipos_cambio')
@@ -45,7 +47,42 @@ def edit_tipo_cambio(tc_id):
         db.session.commit()
         flash('Tipo de cambio actualizado.', 'success')
         return redirect(url_for('main.list_tipos_cambio'))
-    return render_template('tipo_cambio_edit.html', tc=tc)
+    historicos = (
+        TipoCambioHistorico.query.filter_by(moneda=tc.moneda)
+        .order_by(TipoCambioHistorico.fecha.desc())
+        .all()
+    )
+    return render_template('tipo_cambio_edit.html', tc=tc, historicos=historicos)
+
+
+@bp.route('/tipos_cambio/<int:tc_id>/historicos', methods=['POST'])
+def add_tipo_cambio_historico(tc_id):
+    """Registra (o corrige) el tipo de cambio vigente desde una fecha."""
+    tc = TipoCambio.query.get_or_404(tc_id)
+    try:
+        fecha = datetime.strptime(request.form.get('fecha', ''), '%Y-%m-%d').date()
+        valor = float(request.form['valor'])
+    except (KeyError, ValueError):
+        flash('Fecha o valor de tipo de cambio inválido.', 'danger')
+        return redirect(url_for('main.edit_tipo_cambio', tc_id=tc.id))
+    historico = TipoCambioHistorico.query.filter_by(moneda=tc.moneda, fecha=fecha).first()
+    if historico:
+        historico.valor = valor
+    else:
+        db.session.add(TipoCambioHistorico(moneda=tc.moneda, fecha=fecha, valor=valor))
+    db.session.commit()
+    flash(f'Tipo de cambio vigente desde {fecha:%Y-%m-%d} guardado.', 'success')
+    return redirect(url_for('main.edit_tipo_cambio', tc_id=tc.id))
+
+
+@bp.route('/tipos_cambio/<int:tc_id>/historicos/<int:historico_id>/delete', methods=['POST'])
+def delete_tipo_cambio_historico(tc_id, historico_id):
+    tc = TipoCambio.query.get_or_404(tc_id)
+    historico = TipoCambioHistorico.query.filter_by(id=historico_id, moneda=tc.moneda).first_or_404()
+    db.session.delete(historico)
+    db.session.commit()
+    flash('Tipo de cambio histórico eliminado.', 'warning')
+    return redirect(url_for('main.edit_tipo_cambio', tc_id=tc.id))
 
 
 @bp.route('/tipos_cambio/<int:tc_id>/delete', methods=['POST'])
@@ -1,14 +1,46 @@
 import os
 import uuid
+import zipfile
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, current_app
+from flask import render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 from werkzeug.utils import secure_filename
 from . import bp
-from ..utils.file_loader import register_file, register_batch_folder, load_movements, load_facturas
+from ..models import TrabajoImportacion
+from ..utils.file_loader import es_zip, miembros_zip, register_batch_folder, save_and_register
+from ..utils.importacion import (
+    crear_trabajo, encolar_trabajo, progreso_trabajo, ruta_pendiente, start_import_worker,
+)
 from .. import db
 from flask_login import login_required, current_user
 
 
+def _guardar_zip(file_storage, filepath):
+    """
+    Guarda un ZIP tal como se subió, sin extraerlo, y devuelve un item por
+    archivo contenido; el trabajo los lee directamente del ZIP. Se rechaza si
+    su contenido declarado excede los límites configurados.
+    """
+    file_storage.save(filepath)
+    try:
+        miembros = miembros_zip(
+            filepath,
+            max_miembro=current_app.config.get('ZIP_MAX_MIEMBRO_BYTES'),
+            max_total=current_app.config.get('ZIP_MAX_TOTAL_BYTES'),
+        )
+        if not miembros:
+            raise ValueError('El ZIP no contiene archivos.')
+    except zipfile.BadZipFile:
+        os.remove(filepath)
+        raise ValueError('El archivo no es un ZIP válido.')
+    except Exception:
+        os.remove(filepath)
+        raise
+    return [
+        {'nombre': f'{file_storage.filename}/{miembro}', 'ruta': filepath, 'miembro': miembro}
+        for miembro in miembros
+    ]
+
+
 @bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
@@ -28,100 +60,68 @@ def upload():
 
         valid_files = [f for f in files if f and f.filename]
 
-        # Para facturas: crear lote (subcarpeta) cuando se cargan varias a la vez.
-        # Además usamos un solo registro Archivo para todo el lote en administración.
+        # Para facturas: crear lote (subcarpeta) cuando se cargan varias a la vez
+        # (o un ZIP). Además usamos un solo registro Archivo para todo el lote en
+        # administración.
         batch_folder = None
         batch_archivo = None
-        if tipo_archivo == 'factura-fel-xml' and len(valid_files) > 1:
+        hay_zip = any(es_zip(f.filename) for f in valid_files)
+        if tipo_archivo == 'factura-fel-xml' and (len(valid_files) > 1 or hay_zip):
             batch_name = f"lote_facturas_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
             batch_folder = os.path.join(user_folder, batch_name)
             os.makedirs(batch_folder, exist_ok=True)
             batch_archivo = register_batch_folder(batch_folder, tipo_archivo, user_id=current_user.id)
 
-        total_movements = 0
-        total_facturas = 0
-        total_detalles_factura = 0
-        duplicate_facturas = 0
-        processed_files = 0
-        duplicate_files = 0
-        error_files = []
-
-        # Procesar cada archivo
-        for file in files:
-            if not file.filename:
-                continue
-                
+        # Guardar los archivos; el procesamiento corre en segundo plano.
+        # Fuera de un lote, cada archivo se registra al guardarlo (hash calculado
+        # sobre el stream de la carga) y los duplicados no llegan al disco.
+        guardados = []
+        rutas = set()
+        for file in valid_files:
+            filename = secure_filename(file.filename)
+            target_folder = batch_folder if batch_folder else user_folder
+            filepath = os.path.join(target_folder, filename)
+            # Mismo nombre que otro archivo aún sin procesar, o que un ZIP anterior
+            # (se guarda entero y se descarta si no aporta nada): no sobrescribirlo
+            if filepath in rutas or ruta_pendiente(filepath) or (es_zip(filename) and os.path.exists(filepath)):
+                filepath = os.path.join(target_folder, f"{uuid.uuid4().hex[:8]}_{filename}")
+            item = {'nombre': file.filename, 'ruta': filepath}
             try:
-                filename = secure_filename(file.filename)
-                target_folder = batch_folder if batch_folder else user_folder
-                filepath = os.path.join(target_folder, filename)
-                file.save(filepath)
-
-                # Registrar archivo y validar duplicados
-                if tipo_archivo == 'factura-fel-xml':
-                    if batch_archivo is not None:
-                        ruta = filepath
-                        archivo = batch_archivo
-                    else:
-                        ruta, archivo = register_file(filepath, tipo_archivo, user_id=current_user.id)
-                        if ruta is None:
-                            duplicate_files += 1
-                            # Eliminar archivo duplicado del disco
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
-                            continue
-
-                    factura_result = load_facturas(ruta, archivo, tipo_archivo)
-                    total_facturas += factura_result['facturas']
-                    total_detalles_factura += factura_result['detalles']
-                    duplicate_facturas += factura_result['duplicates']
+                if es_zip(filename):
+                    # Cada archivo del ZIP se registra y deduplica por hash en el trabajo
+                    guardados.extend(_guardar_zip(file, filepath))
+                    rutas.add(filepath)
+                    continue
+                if batch_folder:
+                    file.save(filepath)
                 else:
-                    ruta, archivo = register_file(filepath, tipo_archivo, user_id=current_user.id)
+                    ruta, archivo = save_and_register(file, filepath, tipo_archivo, user_id=current_user.id)
                     if ruta is None:
-                        duplicate_files += 1
-                        # Eliminar archivo duplicado del disco
-                        if os.path.exists(filepath):
-                            os.remove(filepath)
-                        continue
-
-                    # Procesar movimientos
-                    count = load_movements(ruta, archivo, tipo_archivo)
-                    total_movements += count
-
-                processed_files += 1
-
+                        item.update(estado='duplicado', duplicados=1)
+                    else:
+                        item['archivo_id'] = archivo.id
+                rutas.add(filepath)
             except Exception as e:
-                error_files.append(f"{file.filename}: {str(e)}")
-                # Limpiar archivo con error si existe
-                if 'filepath' in locals() and os.path.exists(filepath):
-                    os.remove(filepath)
+                db.session.rollback()
+                item.update(estado='error', error=str(e))
+            guardados.append(item)
 
-        # Si el lote no produjo facturas nuevas, quitar registro de archivo-lote para evitar ruido.
-        if batch_archivo is not None and total_facturas == 0:
-            db.session.delete(batch_archivo)
-            db.session.commit()
+        trabajo = crear_trabajo(tipo_archivo, guardados, user_id=current_user.id, archivo_lote=batch_archivo)
+        start_import_worker(current_app._get_current_object())
+        encolar_trabajo(trabajo.id)
 
-        # Mostrar resultados
-        if processed_files > 0:
-            if tipo_archivo == 'factura-fel-xml':
-                flash(
-                    f'Se procesaron {processed_files} archivo(s). '
-                    f'Facturas creadas: {total_facturas}. '
-                    f'Detalles de factura: {total_detalles_factura}.',
-                    'success'
-                )
-            else:
-                flash(f'Se procesaron {processed_files} archivo(s) con {total_movements} movimientos en total.', 'success')
-        
-        if duplicate_files > 0:
-            flash(f'{duplicate_files} archivo(s) ya habían sido cargados previamente.', 'warning')
+        flash(f'Se recibieron {len(guardados)} archivo(s); la importación continúa en segundo plano.', 'info')
+        return redirect(url_for('main.upload', trabajo=trabajo.id))
 
-        if duplicate_facturas > 0:
-            flash(f'{duplicate_facturas} factura(s) ya existían (UUID duplicado).', 'warning')
-            
-        if error_files:
-            flash(f'Error procesando: {"; ".join(error_files)}', 'danger')
+    trabajo_id = request.args.get('trabajo', type=int)
+    return render_template('upload.html', trabajo_id=trabajo_id)
 
-        return redirect(url_for('main.index'))
 
-    return render_template('upload.html')
+@bp.route('/upload/trabajos/<int:trabajo_id>')
+@login_required
+def upload_progreso(trabajo_id):
+    """Progreso de una importación en JSON (por archivo y totales)."""
+    trabajo = db.session.get(TrabajoImportacion, trabajo_id)
+    if trabajo is None or (trabajo.user_id != current_user.id and not current_user.is_admin()):
+        abort(404)
+    return jsonify(progreso_trabajo(trabajo))
@@ -0,0 +1,135 @@
+"""Catálogos para los selects de las vistas, en caché por proceso.
+
+Comercios, categorías, subcategorías, países, cuentas y usuarios se leen una
+vez por versión de datos y se guardan como tuplas inmutables (no instancias
+ORM, que quedarían desligadas de la sesión al terminar la petición). Las
+versiones 'catalogos' y 'usuarios' se incrementan solas con cualquier alta,
+edición o borrado de esos modelos (ver data_version.py), así que las rutas de
+mantenimiento no tienen que invalidar nada a mano.
+
+Uso: `cat = catalogos()` consulta las versiones una vez y cada lista se
+carga (o se toma de la caché) al pedirla.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy.orm import joinedload
+
+from .. import db
+from ..models import Categoria, Comercio, Cuenta, Pais, Subcategoria, User
+from .data_version import CLAVE_CATALOGOS, CLAVE_USUARIOS, versiones_datos
+from .lru import LRU
+
+
+OpcionComercio = namedtuple('OpcionComercio', 'id nombre logo_filename')
+OpcionCategoria = namedtuple('OpcionCategoria', 'id nombre logo_filename')
+OpcionSubcategoria = namedtuple('OpcionSubcategoria', 'id nombre categoria_id categoria logo_filename')
+OpcionPais = namedtuple('OpcionPais', 'id nombre codigo_iso')
+OpcionCuenta = namedtuple('OpcionCuenta', 'id numero_cuenta alias user_id')
+OpcionUsuario = namedtuple('OpcionUsuario', 'id username')
+
+# Listas por (catálogo, base, versión); las de versiones anteriores se desalojan solas
+_CAPACIDAD_CACHE = 32
+
+cache_catalogos = LRU(_CAPACIDAD_CACHE)
+
+
+def _comercios():
+    return tuple(
+        OpcionComercio(c.id, c.nombre, c.logo_filename)
+        for c in Comercio.query.order_by(Comercio.nombre).all()
+    )
+
+
+def _categorias():
+    return tuple(
+        OpcionCategoria(c.id, c.nombre, c.logo_filename)
+        for c in Categoria.query.order_by(Categoria.nombre).all()
+    )
+
+
+def _subcategorias():
+    subcategorias = Subcategoria.query.options(joinedload(Subcategoria.categoria)).order_by(Subcategoria.nombre).all()
+    return tuple(
+        OpcionSubcategoria(
+            s.id,
+            s.nombre,
+            s.categoria_id,
+            OpcionCategoria(s.categoria.id, s.categoria.nombre, s.categoria.logo_filename) if s.categoria else None,
+            s.logo_filename,
+        )
+        for s in subcategorias
+    )
+
+
+def _paises():
+    return tuple(
+        OpcionPais(p.id, p.nombre, p.codigo_iso)
+        for p in Pais.query.order_by(Pais.nombre).all()
+    )
+
+
+def _cuentas():
+    return tuple(
+        OpcionCuenta(c.id, c.numero_cuenta, c.alias, c.user_id)
+        for c in Cuenta.query.order_by(Cuenta.numero_cuenta).all()
+    )
+
+
+def _usuarios():
+    return tuple(
+        OpcionUsuario(u.id, u.username)
+        for u in User.query.order_by(User.username).all()
+    )
+
+
+class Catalogos:
+    """Catálogos vigentes para una petición (ver `catalogos`)."""
+
+    def __init__(self, version_catalogos, version_usuarios, origen):
+        self._version_catalogos = version_catalogos
+        self._version_usuarios = version_usuarios
+        self._origen = origen
+
+    def _obtener(self, nombre, version, cargar):
+        return cache_catalogos.obtener((nombre, self._origen, version), cargar)
+
+    @property
+    def comercios(self):
+        """Comercios ordenados por nombre."""
+        return self._obtener('comercios', self._version_catalogos, _comercios)
+
+    @property
+    def categorias(self):
+        """Categorías ordenadas por nombre."""
+        return self._obtener('categorias', self._version_catalogos, _categorias)
+
+    def subcategorias(self, categoria_id=None):
+        """Subcategorías (con su categoría) ordenadas por nombre, opcionalmente de una categoría."""
+        subcategorias = self._obtener('subcategorias', self._version_catalogos, _subcategorias)
+        if categoria_id is None:
+            return subcategorias
+        return tuple(s for s in subcategorias if s.categoria_id == categoria_id)
+
+    @property
+    def paises(self):
+        """Países ordenados por nombre."""
+        return self._obtener('paises', self._version_catalogos, _paises)
+
+    def cuentas(self, user_id=None):
+        """Cuentas ordenadas por número, opcionalmente solo las de `user_id`."""
+        cuentas = self._obtener('cuentas', self._version_catalogos, _cuentas)
+        if user_id is None:
+            return cuentas
+        return tuple(c for c in cuentas if c.user_id == user_id)
+
+    @property
+    def usuarios(self):
+        """Usuarios ordenados por nombre de usuario."""
+        return self._obtener('usuarios', self._version_usuarios, _usuarios)
+
+
+def catalogos():
+    """Catálogos con las versiones actuales, leídas en una sola consulta."""
+    version_catalogos, version_usuarios = versiones_datos(CLAVE_CATALOGOS, CLAVE_USUARIOS)
+    return Catalogos(version_catalogos, version_usuarios, str(db.engine.url))
@@ -1,47 +1,85 @@
 import re
+from sqlalchemy import case, func
 from .. import db
 from ..models import Regla, Movimiento, Pais, Comercio, CodigoPais
+from .data_version import (
+    CLAVE_MOVIMIENTOS, CLAVE_REGLAS, clave_movimientos_usuario, incrementar_version, version_datos,
+)
+from .lru import LRU
 
+try:
+    from re._casefix import _EXTRA_CASES as _CASOS_EXTRA
+except ImportError:  # Python < 3.11
+    _CASOS_EXTRA = {}
 
-def _pais_por_descripcion(descripcion, codigos):
-    """Resolve a final code only when it is preceded by a space."""
-    match = re.search(r"\s([A-Za-z]{2,3})$", descripcion or '')
-    if not match:
-        return None
 
-    codigo = match.group(1).upper()
-    codigo_pais = next(
-        (item for item in codigos if item.activo and item.codigo == codigo),
-        None,
-    )
-    return codigo_pais.pais if codigo_pais else None
+def _construir_tabla_pliegues():
+    """Equivalencias adicionales que re.IGNORECASE aplica y str.lower() no (p.e. 'ı' ~ 'i')."""
+    tabla = {}
+    for codigo, extras in _CASOS_EXTRA.items():
+        grupo = (codigo,) + tuple(extras)
+        destino = min(grupo)
+        for miembro in grupo:
+            if miembro != destino:
+                tabla[miembro] = destino
+    return tabla
 
 
-def _pais_por_moneda(moneda, paises):
-    codigo_por_moneda = {
-        'GTQ': 'GT',
-        'USD': 'US',
-    }
-    codigo_iso = codigo_por_moneda.get((moneda or '').strip().upper())
-    if not codigo_iso:
-        return None
-    return next((pais for pais in paises if pais.codigo_iso == codigo_iso), None)
-
-
-def _actualizar_pais(mov, paises, codigos=None):
-    """Assign a country only after the movement is classified as an expense."""
-    comercio = mov.comercio
-    if comercio is None and mov.comercio_id is not None:
-        comercio = db.session.get(Comercio, mov.comercio_id)
-    if codigos is None:
-        codigos = CodigoPais.query.all()
-    if comercio and (comercio.tipo_contabilizacion or '').lower() == 'gastos':
-        pais = _pais_por_descripcion(mov.descripcion, codigos)
-        if pais is None:
-            pais = _pais_por_moneda(mov.moneda, paises)
-        mov.pais_id = pais.id if pais else None
-    else:
-        mov.pais_id = None
+_TABLA_PLIEGUES = _construir_tabla_pliegues()
+
+# Máximo de ids por consulta IN (límite clásico de variables de SQLite: 999)
+_TAMANO_LOTE = 900
+
+# Filas por UPDATE ... CASE de países: cada una usa tres variables (WHEN, THEN, IN)
+_TAMANO_LOTE_PAISES = _TAMANO_LOTE // 3
+
+# Entradas máximas de cada memo de clasificación (descripciones distintas)
+_CAPACIDAD_CACHE = 50000
+
+
+def _plegar(texto):
+    """Normaliza mayúsculas/minúsculas de forma compatible con re.IGNORECASE."""
+    return texto.lower().translate(_TABLA_PLIEGUES)
+
+
+_CODIGO_FINAL = re.compile(r"\s([A-Za-z]{2,3})$")
+
+# País asumido según la moneda cuando la descripción no trae código de país
+_ISO_POR_MONEDA = {
+    'GTQ': 'GT',
+    'USD': 'US',
+}
+
+
+def _actualizar_paises(movimientos, estado):
+    """
+    Asigna el país de `movimientos` ya clasificados: solo los gastos llevan
+    país. Se resuelve en memoria con los catálogos de `estado` y se escribe
+    con UPDATE ... CASE por lotes, solo en las filas cuyo país cambia y sin
+    modificar los objetos ORM (quedan con el valor anterior hasta el commit).
+    """
+    cambios = {}
+    user_ids = set()
+    for mov in movimientos:
+        pais_id = estado.pais_movimiento(mov.comercio_id, mov.descripcion, mov.moneda)
+        if pais_id != mov.pais_id:
+            cambios[mov.id] = pais_id
+            user_ids.add(mov.user_id)
+    if not cambios:
+        return
+
+    tabla = Movimiento.__table__
+    ids = sorted(cambios)
+    for inicio in range(0, len(ids), _TAMANO_LOTE_PAISES):
+        lote = ids[inicio:inicio + _TAMANO_LOTE_PAISES]
+        db.session.execute(
+            tabla.update()
+            .where(tabla.c.id.in_(lote))
+            .values(pais_id=case({mov_id: cambios[mov_id] for mov_id in lote}, value=tabla.c.id))
+        )
+    # El UPDATE sobre la tabla no pasa por el flush: versiones de los usuarios afectados
+    incrementar_version(CLAVE_MOVIMIENTOS, *(clave_movimientos_usuario(user_id) for user_id in user_ids))
+
 
 def cargar_reglas():
     """
@@ -84,7 +122,206 @@ def cargar_reglas():
     return reglas_excluir, reglas_incluir
 
 
-def clasificar_movimientos():
+def _literal_requerido(criterio):
+    """
+    Devuelve (es_exacta, literal) para un criterio de regla:
+      - '=texto' → (True, 'texto'): la descripción debe ser exactamente ese texto.
+      - Con comodines → (False, fragmento más largo sin '*'), que toda
+        descripción que cumpla el criterio debe contener. '' si no hay literal.
+    """
+    raw = (criterio or '').strip()
+    if raw.startswith('='):
+        return True, raw[1:].strip()
+    return False, max(raw.split('*'), key=len)
+
+
+class _AhoCorasick:
+    """Autómata Aho–Corasick para encontrar en una sola pasada todos los literales
+    contenidos en un texto. Cada literal lleva asociada una lista de valores."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._salida = [[]]
+
+    def agregar(self, literal, valor):
+        nodo = 0
+        for ch in literal:
+            siguiente = self._goto[nodo].get(ch)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[nodo][ch] = siguiente
+                self._goto.append({})
+                self._fail.append(0)
+                self._salida.append([])
+            nodo = siguiente
+        self._salida[nodo].append(valor)
+
+    def construir(self):
+        """Calcula los enlaces de falla (BFS) y propaga las salidas."""
+        cola = list(self._goto[0].values())
+        i = 0
+        while i < len(cola):
+            nodo = cola[i]
+            i += 1
+            for ch, hijo in self._goto[nodo].items():
+                cola.append(hijo)
+                falla = self._fail[nodo]
+                while falla and ch not in self._goto[falla]:
+                    falla = self._fail[falla]
+                destino = self._goto[falla].get(ch, 0)
+                self._fail[hijo] = destino if destino != hijo else 0
+                self._salida[hijo] = self._salida[hijo] + self._salida[self._fail[hijo]]
+
+    def buscar(self, texto):
+        """Devuelve el conjunto de valores de todos los literales presentes en `texto`."""
+        goto, fail, salida = self._goto, self._fail, self._salida
+        encontrados = set()
+        nodo = 0
+        for ch in texto:
+            while nodo and ch not in goto[nodo]:
+                nodo = fail[nodo]
+            nodo = goto[nodo].get(ch, 0)
+            if salida[nodo]:
+                encontrados.update(salida[nodo])
+        return encontrados
+
+
+class MotorReglas:
+    """
+    Motor de clasificación compilado a partir de `cargar_reglas()`.
+
+    En lugar de probar cada patrón de inclusión contra cada descripción, se
+    preseleccionan las reglas candidatas:
+      - Reglas exactas ('='): tabla hash por descripción normalizada.
+      - Reglas con comodines: autómata Aho–Corasick sobre el literal más largo
+        de cada criterio (si la descripción no lo contiene, la regla no aplica).
+      - Reglas sin literal (p.e. '*'): siempre candidatas.
+    Las candidatas se verifican con su patrón original en el orden de las reglas,
+    respetando la semántica de la primera inclusión que gana y las exclusiones
+    por comercio.
+    """
+
+    def __init__(self, reglas_excluir, reglas_incluir):
+        self.excl_por_comercio = {}
+        for regla, patron in reglas_excluir:
+            self.excl_por_comercio.setdefault(regla.comercio_id, []).append(patron)
+
+        self.incluir = [(regla.comercio_id, patron) for regla, patron in reglas_incluir]
+        self._exactas = {}
+        self._siempre = set()
+        self._literales = _AhoCorasick()
+
+        for idx, (regla, _patron) in enumerate(reglas_incluir):
+            es_exacta, literal = _literal_requerido(regla.criterio)
+            if es_exacta:
+                self._exactas.setdefault(_plegar(literal), []).append(idx)
+                continue
+            if literal:
+                self._literales.agregar(_plegar(literal), idx)
+            else:
+                self._siempre.add(idx)
+        self._literales.construir()
+
+    def _candidatas(self, desc):
+        desc_plegada = _plegar(desc)
+        candidatas = self._literales.buscar(desc_plegada)
+        candidatas.update(self._siempre)
+        candidatas.update(self._exactas.get(desc_plegada, ()))
+        return sorted(candidatas)
+
+    def clasificar(self, descripcion):
+        """Devuelve el comercio_id asignado a la descripción o None."""
+        desc = (descripcion or '').strip()
+        for idx in self._candidatas(desc):
+            comercio_id, patron_inc = self.incluir[idx]
+            # 1) Solo seguir si la inclusión matchea
+            if not patron_inc.search(desc):
+                continue
+            # 2) Verificar exclusiones de este comercio
+            patrones_excl = self.excl_por_comercio.get(comercio_id, [])
+            if any(p_ex.search(desc) for p_ex in patrones_excl):
+                # Está excluido de ESTE comercio → pruebo siguiente inclusión
+                continue
+            # 3) Coincidió inclusión y no hay exclusión → asignar
+            return comercio_id
+        return None
+
+
+def construir_motor_reglas():
+    """Carga las reglas desde la base de datos y compila el motor de clasificación."""
+    reglas_excluir, reglas_incluir = cargar_reglas()
+    return MotorReglas(reglas_excluir, reglas_incluir)
+
+
+class EstadoClasificacion:
+    """
+    Reglas compiladas, catálogos de países y comercios de gasto para una
+    versión de reglas, con memoización de resultados:
+      - descripción normalizada → comercio_id
+      - (descripción, moneda) → pais_id asignado si el movimiento es un gasto
+    Se invalida completo cuando cambia la versión 'reglas' (Regla,
+    Comercio.tipo_contabilizacion, CodigoPais o Pais).
+    """
+
+    def __init__(self, version, origen):
+        self.version = version
+        self.origen = origen
+        self.motor = construir_motor_reglas()
+        self._pais_por_codigo = {
+            c.codigo: c.pais_id for c in CodigoPais.query.filter(CodigoPais.activo.is_(True)).all()
+        }
+        self._pais_por_iso = {p.codigo_iso: p.id for p in Pais.query.all()}
+        self._comercios_gasto = {
+            row[0] for row in db.session.query(Comercio.id)
+            .filter(func.lower(Comercio.tipo_contabilizacion) == 'gastos').all()
+        }
+        self._comercios = LRU(_CAPACIDAD_CACHE)
+        self._paises = LRU(_CAPACIDAD_CACHE)
+
+    def comercio(self, descripcion):
+        """comercio_id asignado por las reglas a la descripción (o None)."""
+        desc = (descripcion or '').strip()
+        return self._comercios.obtener(_plegar(desc), lambda: self.motor.clasificar(desc))
+
+    def pais_gasto(self, descripcion, moneda):
+        """País de un gasto: código final de la descripción o, si no hay, la moneda."""
+        clave = (descripcion or '', (moneda or '').strip().upper())
+        return self._paises.obtener(clave, lambda: self._resolver_pais(*clave))
+
+    def pais_movimiento(self, comercio_id, descripcion, moneda):
+        """País de un movimiento clasificado: el de `pais_gasto` si su comercio es de gastos, si no None."""
+        if comercio_id not in self._comercios_gasto:
+            return None
+        return self.pais_gasto(descripcion, moneda)
+
+    def _resolver_pais(self, descripcion, moneda):
+        # Resolve a final code only when it is preceded by a space.
+        match = _CODIGO_FINAL.search(descripcion)
+        if match:
+            pais_id = self._pais_por_codigo.get(match.group(1).upper())
+            if pais_id is not None:
+                return pais_id
+        codigo_iso = _ISO_POR_MONEDA.get(moneda)
+        return self._pais_por_iso.get(codigo_iso) if codigo_iso else None
+
+
+_estado_actual = None
+
+
+def obtener_estado_clasificacion():
+    """Devuelve el estado de clasificación vigente, reconstruyéndolo si cambió la versión de reglas."""
+    global _estado_actual
+    version = version_datos(CLAVE_REGLAS)
+    origen = str(db.engine.url)
+    estado = _estado_actual
+    if estado is None or estado.version != version or estado.origen != origen:
+        estado = EstadoClasificacion(version, origen)
+        _estado_actual = estado
+    return estado
+
+
+def clasificar_movimientos(archivo_id=None, movimiento_ids=None):
     """
     Aplica las reglas de clasificación a los movimientos sin asignar.
     Para cada movimiento:
@@ -93,36 +330,39 @@ def clasificar_movimientos():
         con ninguna regla de exclusión **de ese mismo comercio**.
       - Si coincide inclusión y no hay exclusión para ese comercio,
         asigna mov.comercio_id y continúa con el siguiente movimiento.
-    """
-    reglas_excluir, reglas_incluir = cargar_reglas()
-    paises = Pais.query.all()
-    codigos = CodigoPais.query.all()
 
-    # Agrupar exclusiones por comercio_id
-    excl_por_comercio = {}
-    for regla, patron in reglas_excluir:
-        excl_por_comercio.setdefault(regla.comercio_id, []).append(patron)
+    Modo incremental: si se indica `archivo_id` y/o `movimiento_ids`, solo se
+    procesan esos movimientos (p.e. los del archivo recién importado). Sin
+    argumentos recorre toda la tabla; reservado para la acción de administración.
+    """
+    if movimiento_ids is not None and not movimiento_ids:
+        return
 
     # Excluir movimientos que el usuario marcó para no clasificar
-    movimientos = Movimiento.query.filter(Movimiento.excluir_clasificacion.is_(False)).all()
-    for mov in movimientos:
-        desc = (mov.descripcion or '').strip()
-        if mov.comercio_id is not None:
-            _actualizar_pais(mov, paises, codigos)
+    query = Movimiento.query.filter(Movimiento.excluir_clasificacion.is_(False))
+    if archivo_id is not None:
+        query = query.filter(Movimiento.archivo_id == archivo_id)
+    if movimiento_ids is None:
+        consultas = [query]
+    else:
+        # Por lotes para no exceder el límite de parámetros de SQLite
+        ids = sorted(movimiento_ids)
+        consultas = (
+            query.filter(Movimiento.id.in_(ids[inicio:inicio + _TAMANO_LOTE]))
+            for inicio in range(0, len(ids), _TAMANO_LOTE)
+        )
+
+    estado = None
+    for consulta in consultas:
+        movimientos = consulta.all()
+        if not movimientos:
             continue
-        for regla_inc, patron_inc in reglas_incluir:
-            # 1) Solo seguir si la inclusión matchea
-            if not patron_inc.search(desc):
-                continue
-            # 2) Verificar exclusiones de este comercio
-            patrones_excl = excl_por_comercio.get(regla_inc.comercio_id, [])
-            if any(p_ex.search(desc) for p_ex in patrones_excl):
-                # Está excluido de ESTE comercio → pruebo siguiente inclusión
-                continue
-            # 3) Coincidió inclusión y no hay exclusión → asignar y salir
-            mov.comercio_id = regla_inc.comercio_id
-            break
-        _actualizar_pais(mov, paises, codigos)
+        if estado is None:
+            estado = obtener_estado_clasificacion()
+        for mov in movimientos:
+            if mov.comercio_id is None:
+                mov.comercio_id = estado.comercio(mov.descripcion)
+        _actualizar_paises(movimientos, estado)
 
     db.session.commit()
 
@@ -132,43 +372,88 @@ def reclasificar_movimientos():
     Igual que clasificar_movimientos, pero se aplica a **todos** los movimientos,
     reasignando comercios según las reglas.
     """
-    reglas_excluir, reglas_incluir = cargar_reglas()
-    paises = Pais.query.all()
-    codigos = CodigoPais.query.all()
-
-    excl_por_comercio = {}
-    for regla, patron in reglas_excluir:
-        excl_por_comercio.setdefault(regla.comercio_id, []).append(patron)
+    estado = obtener_estado_clasificacion()
 
     # Durante una reclasificación respetamos movimientos marcados para excluir
     todos = Movimiento.query.filter(Movimiento.excluir_clasificacion.is_(False)).all()
     for mov in todos:
-        desc = (mov.descripcion or '').strip()
-        mov.comercio_id = None
-        for regla_inc, patron_inc in reglas_incluir:
-            if not patron_inc.search(desc):
-                continue
-            patrones_excl = excl_por_comercio.get(regla_inc.comercio_id, [])
-            if any(p_ex.search(desc) for p_ex in patrones_excl):
-                continue
-            mov.comercio_id = regla_inc.comercio_id
-            break
-        _actualizar_pais(mov, paises, codigos)
+        mov.comercio_id = estado.comercio(mov.descripcion)
+    _actualizar_paises(todos, estado)
 
     db.session.commit()
 
 
+def reclasificar_comercio(comercio_id, movimiento_ids=None):
+    """
+    Reclasificación dirigida tras modificar las reglas de un comercio.
+
+    Solo reevalúa los movimientos que el cambio puede afectar:
+      - los asignados actualmente al comercio (o los `movimiento_ids` indicados,
+        p.e. los que quedaron sin comercio al eliminarlo), y
+      - los movimientos sin clasificar cuya descripción contiene el literal
+        requerido por alguna regla de inclusión del comercio, obtenidos del
+        índice de texto sobre `Movimiento.descripcion`.
+    Si el índice no está disponible o alguna regla no tiene un literal
+    indexable, se reevalúan todos los movimientos sin clasificar.
+    """
+    from .text_index import ids_por_subcadenas
+
+    candidatos = set(movimiento_ids or ())
+    candidatos.update(
+        row[0] for row in db.session.query(Movimiento.id).filter(
+            Movimiento.comercio_id == comercio_id,
+            Movimiento.excluir_clasificacion.is_(False),
+        ).all()
+    )
+
+    literales = set()
+    reglas_incluir = Regla.query.filter(
+        Regla.comercio_id == comercio_id,
+        db.func.lower(Regla.tipo) != 'excluir',
+    ).all()
+    for regla in reglas_incluir:
+        if not (regla.criterio or '').strip():
+            continue
+        literales.add(_literal_requerido(regla.criterio)[1])
+
+    ids_sin_clasificar = ids_por_subcadenas(literales, solo_sin_clasificar=True)
+    if ids_sin_clasificar is None:
+        ids_sin_clasificar = {
+            row[0] for row in db.session.query(Movimiento.id).filter(
+                Movimiento.comercio_id.is_(None),
+                Movimiento.excluir_clasificacion.is_(False),
+            ).all()
+        }
+    candidatos.update(ids_sin_clasificar)
+    if not candidatos:
+        return 0
+
+    estado = obtener_estado_clasificacion()
+
+    candidatos = sorted(candidatos)
+    total = 0
+    # Por lotes para no exceder el límite de parámetros de SQLite
+    for inicio in range(0, len(candidatos), _TAMANO_LOTE):
+        lote = candidatos[inicio:inicio + _TAMANO_LOTE]
+        movimientos = Movimiento.query.filter(
+            Movimiento.id.in_(lote),
+            Movimiento.excluir_clasificacion.is_(False),
+        ).all()
+        for mov in movimientos:
+            mov.comercio_id = estado.comercio(mov.descripcion)
+        _actualizar_paises(movimientos, estado)
+        total += len(movimientos)
+
+    db.session.commit()
+    return total
+
+
 def previsualizar_clasificacion(movimientos):
     """
     Dada una lista de objetos Movimiento (no persistidos),
     devuelve una lista de tuplas (movimiento, comercio_id_asignado o None).
     """
-    reglas_excluir, reglas_incluir = cargar_reglas()
-    paises = Pais.query.all()
-    codigos = CodigoPais.query.all()
-    excl_por_comercio = {}
-    for regla, patron in reglas_excluir:
-        excl_por_comercio.setdefault(regla.comercio_id, []).append(patron)
+    estado = obtener_estado_clasificacion()
 
     resultados = []
     for mov in movimientos:
@@ -176,17 +461,6 @@ def previsualizar_clasificacion(movimientos):
         if getattr(mov, 'excluir_clasificacion', False):
             resultados.append((mov, None))
             continue
-        desc = (mov.descripcion or '').strip()
-        pais = _pais_por_descripcion(desc, codigos)
-        comercio_asignado = None
-        for regla_inc, patron_inc in reglas_incluir:
-            if not patron_inc.search(desc):
-                continue
-            patrones_excl = excl_por_comercio.get(regla_inc.comercio_id, [])
-            if any(p_ex.search(desc) for p_ex in patrones_excl):
-                continue
-            comercio_asignado = regla_inc.comercio_id
-            break
-        resultados.append((mov, comercio_asignado))
+        resultados.append((mov, estado.comercio(mov.descripcion)))
 
     return resultados
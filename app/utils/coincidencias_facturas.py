@@ -0,0 +1,240 @@
+"""Recomendación de facturas para movimientos por monto y fecha similares.
+
+Una factura es candidata para un movimiento si es del mismo usuario, su fecha
+de emisión está a lo sumo a `dias` días de la del movimiento y su total difiere
+del monto como mucho en `pct` (fracción del monto) o en `abs` quetzales. Se
+ordenan por diferencia porcentual, luego diferencia de monto y luego días.
+
+`IndiceFacturas` ordena las facturas de cada usuario por monto: la tolerancia
+de monto define un intervalo que se ubica con búsqueda binaria, y solo las
+facturas dentro de él se comparan por fecha. Así el costo por movimiento
+depende de las facturas de monto parecido y no del total de facturas.
+
+Con las tolerancias guardadas en `tolerancias_coincidencia`, los pares ya están
+en `coincidencias_facturas`: la mantienen triggers sobre `movimientos` y
+`facturas` creados en la migración, así que las importaciones (o cualquier
+alta, edición o borrado) la actualizan solo para las filas afectadas, y un
+cambio de tolerancias quita los pares que dejan de cumplirlas y agrega los
+nuevos. Si la petición usa esas tolerancias, las recomendaciones se leen de la
+tabla en una consulta; si usa otras, se calculan con `IndiceFacturas`.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import timedelta
+
+from sqlalchemy import func, select, text
+
+from .. import db
+from ..models import CoincidenciaFactura, Factura, Movimiento, ToleranciaCoincidencia
+
+# Defaults: +-7 días, 0.01% y Q0.01 de tolerancia
+ParametrosCoincidencia = namedtuple('ParametrosCoincidencia', 'dias pct abs')
+PARAMETROS_DEFECTO = ParametrosCoincidencia(dias=7, pct=0.0001, abs=0.01)
+
+MAX_RECOMENDACIONES = 3
+
+# Facturas cargadas por consulta al materializar las recomendadas
+_TAMANO_LOTE = 500
+
+TRIGGER_COINCIDENCIAS = 'coincidencias_movimientos_ai'
+
+
+def tolerancias_guardadas():
+    """
+    Tolerancias con las que se mantiene `coincidencias_facturas`, o None si la
+    base no tiene los triggers (p.e. creada con `db.create_all()`).
+    """
+    fila = db.session.execute(
+        text(
+            "SELECT dias, porcentaje, absoluto FROM tolerancias_coincidencia WHERE id = 1 "
+            "AND EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name)"
+        ),
+        {'name': TRIGGER_COINCIDENCIAS},
+    ).first()
+    if fila is None:
+        return None
+    return ParametrosCoincidencia(fila.dias, fila.porcentaje / 100.0, fila.absoluto)
+
+
+def guardar_tolerancias(parametros):
+    """Cambia las tolerancias guardadas; los triggers actualizan los pares afectados."""
+    tolerancia = db.session.get(ToleranciaCoincidencia, 1)
+    if tolerancia is None:
+        tolerancia = ToleranciaCoincidencia(id=1)
+        db.session.add(tolerancia)
+    tolerancia.dias = parametros.dias
+    tolerancia.porcentaje = parametros.pct * 100.0
+    tolerancia.absoluto = parametros.abs
+    db.session.commit()
+
+
+def leer_parametros(args, defecto=None):
+    """
+    Parámetros desde la query string (`fact_days`, `fact_pct` en porcentaje y
+    `fact_abs`). Los ausentes o inválidos toman los de `defecto` (por omisión,
+    las tolerancias guardadas o `PARAMETROS_DEFECTO`).
+    """
+    if defecto is None:
+        defecto = tolerancias_guardadas() or PARAMETROS_DEFECTO
+    try:
+        dias = max(0, int(args['fact_days'])) if 'fact_days' in args else defecto.dias
+    except ValueError:
+        dias = defecto.dias
+    try:
+        pct = max(0.0, float(args['fact_pct'])) / 100.0 if 'fact_pct' in args else defecto.pct
+    except ValueError:
+        pct = defecto.pct
+    try:
+        abs_ = max(0.0, float(args['fact_abs'])) if 'fact_abs' in args else defecto.abs
+    except ValueError:
+        abs_ = defecto.abs
+    return ParametrosCoincidencia(dias, pct, abs_)
+
+
+class IndiceFacturas:
+    """
+    Facturas por usuario ordenadas por monto absoluto. Se construye con filas
+    (id, user_id, fecha_emision, gran_total); las que no tienen fecha o total
+    se ignoran.
+    """
+
+    def __init__(self, filas):
+        por_usuario = {}
+        for factura_id, user_id, fecha_emision, gran_total in filas:
+            if fecha_emision is None or gran_total is None:
+                continue
+            por_usuario.setdefault(user_id, []).append(
+                (abs(float(gran_total)), fecha_emision.date(), factura_id)
+            )
+        self._facturas = {}
+        self._montos = {}
+        for user_id, facturas in por_usuario.items():
+            facturas.sort()
+            self._facturas[user_id] = facturas
+            self._montos[user_id] = [monto for monto, _, _ in facturas]
+
+    def coincidencias(self, user_id, fecha, monto, parametros):
+        """
+        [(pct_diff, diff_monto, diff_dias, factura_id)] de las facturas
+        candidatas para un movimiento, de la mejor a la peor.
+        """
+        montos = self._montos.get(user_id)
+        if not montos or fecha is None or monto is None:
+            return []
+        monto_mov = abs(float(monto))
+        if monto_mov == 0:
+            return []
+
+        # Intervalo de montos aceptable, un poco más amplio por redondeo; la
+        # condición exacta se verifica abajo
+        margen = max(parametros.pct * monto_mov, parametros.abs) * (1 + 1e-9) + 1e-9
+        inicio = bisect_left(montos, monto_mov - margen)
+        fin = bisect_right(montos, monto_mov + margen)
+
+        resultado = []
+        for monto_factura, fecha_factura, factura_id in self._facturas[user_id][inicio:fin]:
+            diff_dias = abs((fecha_factura - fecha).days)
+            if diff_dias > parametros.dias:
+                continue
+            diff_monto = abs(monto_mov - monto_factura)
+            pct_diff = diff_monto / monto_mov
+            # Acepta si difiere <= pct o <= abs
+            if pct_diff > parametros.pct and diff_monto > parametros.abs:
+                continue
+            resultado.append((pct_diff, diff_monto, diff_dias, factura_id))
+        resultado.sort()
+        return resultado
+
+
+def _recomendacion(factura, pct_diff, diff_monto, diff_dias):
+    return {
+        'factura': factura,
+        'diff_monto': diff_monto,
+        'pct_diff': pct_diff,
+        'diff_dias': diff_dias,
+        'score': (pct_diff, diff_monto, diff_dias),
+    }
+
+
+def _leer_guardadas(movimiento_ids):
+    """Mejores coincidencias guardadas de `movimiento_ids` (lista o subconsulta de ids)."""
+    c = CoincidenciaFactura
+    orden = func.row_number().over(
+        partition_by=c.movimiento_id,
+        order_by=(c.score, c.diff_monto, c.diff_dias, c.factura_id),
+    ).label('orden')
+    mejores = (
+        select(c.movimiento_id, c.factura_id, c.score, c.diff_monto, c.diff_dias, orden)
+        .where(c.movimiento_id.in_(movimiento_ids))
+        .subquery()
+    )
+    filas = db.session.execute(
+        select(mejores.c.movimiento_id, mejores.c.score, mejores.c.diff_monto, mejores.c.diff_dias, Factura)
+        .join(Factura, Factura.id == mejores.c.factura_id)
+        .where(mejores.c.orden <= MAX_RECOMENDACIONES)
+        .order_by(mejores.c.movimiento_id, mejores.c.orden)
+    ).all()
+
+    recomendaciones = {}
+    for mov_id, score, diff_monto, diff_dias, factura in filas:
+        recomendaciones.setdefault(mov_id, []).append(_recomendacion(factura, score, diff_monto, diff_dias))
+    return recomendaciones
+
+
+def recomendar_facturas(movimientos, parametros, user_id=None, consulta=None):
+    """
+    {movimiento_id: [recomendación]} con hasta `MAX_RECOMENDACIONES` facturas
+    por movimiento. Cada recomendación es un dict con 'factura', 'diff_monto',
+    'pct_diff', 'diff_dias' y 'score'. `user_id` limita las facturas a ese
+    usuario (None = las de todos).
+
+    Con las tolerancias guardadas se leen de `coincidencias_facturas`
+    (`consulta`, la consulta de la que salen `movimientos`, evita pasar la
+    lista de ids). Si no, se leen en una consulta solo las columnas necesarias
+    de las facturas en la ventana de fechas de los movimientos y luego se
+    cargan las recomendadas.
+    """
+    if parametros == tolerancias_guardadas():
+        if consulta is not None:
+            return _leer_guardadas(consulta.order_by(None).with_entities(Movimiento.id))
+        return _leer_guardadas([m.id for m in movimientos])
+
+    fechas = [m.fecha for m in movimientos if m.fecha is not None]
+    if not fechas:
+        return {}
+
+    ventana = timedelta(days=parametros.dias)
+    query = Factura.query.with_entities(
+        Factura.id, Factura.user_id, Factura.fecha_emision, Factura.gran_total,
+    ).filter(
+        Factura.fecha_emision >= (min(fechas) - ventana),
+        # Hasta el final del último día (fecha_emision incluye la hora)
+        Factura.fecha_emision < (max(fechas) + ventana + timedelta(days=1)),
+        Factura.gran_total.isnot(None),
+    )
+    if user_id is not None:
+        query = query.filter(Factura.user_id == user_id)
+    indice = IndiceFacturas(query.all())
+
+    coincidencias = {}
+    for m in movimientos:
+        encontradas = indice.coincidencias(m.user_id, m.fecha, m.monto, parametros)
+        if encontradas:
+            coincidencias[m.id] = encontradas[:MAX_RECOMENDACIONES]
+    if not coincidencias:
+        return {}
+
+    ids = sorted({factura_id for lista in coincidencias.values() for *_, factura_id in lista})
+    facturas = {}
+    for i in range(0, len(ids), _TAMANO_LOTE):
+        for factura in Factura.query.filter(Factura.id.in_(ids[i:i + _TAMANO_LOTE])).all():
+            facturas[factura.id] = factura
+
+    return {
+        mov_id: [
+            _recomendacion(facturas[factura_id], pct_diff, diff_monto, diff_dias)
+            for pct_diff, diff_monto, diff_dias, factura_id in lista
+        ]
+        for mov_id, lista in coincidencias.items()
+    }
@@ -0,0 +1,444 @@
+"""Agregados del dashboard calculados en memoria.
+
+En lugar de una consulta por gráfica, el dashboard hace tres lecturas:
+
+- `leer_resumen`: el resumen mensual del rango (ver `resumen_mensual`), una
+  fila por mes/comercio/país/cuenta/moneda con sus totales en GTQ y los datos
+  del comercio, categoría, subcategoría, país y cuenta;
+- lo mismo para el mes anterior;
+- `leer_gastos`: los gastos individuales clasificados, necesarios para el top
+  de gastos, días de la semana, rangos, heatmap y recurrentes.
+
+`AgregadosDashboard` recorre esas filas y arma cada gráfica con los mismos
+filtros que aplicaba su consulta original, así que el costo de la página ya no
+crece con el número de gráficas.
+
+El resultado se guarda en `cache_dashboard` con los filtros y
+`version_dashboard(user_id)` como parte de la clave: mientras no se importen ni
+editen movimientos, reglas, catálogos o tipos de cambio, volver al dashboard con
+los mismos filtros no recalcula nada.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import and_, func, or_
+
+from .. import db
+from ..models import Categoria, Comercio, Cuenta, Movimiento, Pais, Subcategoria, TipoCambio
+from .data_version import (
+    CLAVE_CATALOGOS, CLAVE_MOVIMIENTOS, CLAVE_MOVIMIENTOS_TODOS, CLAVE_REGLAS,
+    clave_movimientos_usuario, versiones_datos,
+)
+from .lru import LRU
+from .tipos_cambio import expresion_monto_gtq
+
+NO_CLASIFICADO = 'No clasificado'
+SIN_SUBCATEGORIA = 'Sin subcategoría'
+SIN_PAIS = 'Sin país'
+
+DIAS_SEMANA = ['Domingo', 'Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado']
+
+RANGOS_GASTOS = [
+    ("Q0-100", 0, 100),
+    ("Q100-500", 100, 500),
+    ("Q500-1000", 500, 1000),
+    ("Q1000-2000", 1000, 2000),
+    ("Q2000+", 2000, float('inf')),
+]
+
+# Combinaciones de filtros cuyo resultado se conserva en memoria
+_CAPACIDAD_CACHE = 64
+
+cache_dashboard = LRU(_CAPACIDAD_CACHE)
+
+
+def version_dashboard(user_id):
+    """
+    Versiones de los datos que muestra el dashboard de `user_id` (None = todos
+    los usuarios). Cambia con cualquier alta, edición o borrado de sus
+    movimientos, de reglas, catálogos o tipos de cambio.
+    """
+    if user_id is None:
+        return versiones_datos(CLAVE_MOVIMIENTOS, CLAVE_CATALOGOS, CLAVE_REGLAS)
+    return versiones_datos(
+        clave_movimientos_usuario(user_id), CLAVE_MOVIMIENTOS_TODOS, CLAVE_CATALOGOS, CLAVE_REGLAS,
+    )
+
+
+def leer_resumen(fuente):
+    """
+    Filas de `fuente` (ver `fuente_resumen`) con montos en GTQ y nombres
+    resueltos. `con_tasa` indica si la moneda tiene tipo de cambio configurado:
+    los montos solo valen para esas filas, los conteos para todas.
+    """
+    f = fuente
+    clave = (f.c.mes, f.c.comercio_id, f.c.pais_id, f.c.cuenta_id, f.c.moneda)
+    return (
+        db.session.query(
+            f.c.mes,
+            f.c.comercio_id,
+            Comercio.nombre.label('comercio'),
+            Comercio.tipo_contabilizacion,
+            Comercio.categoria_id,
+            Categoria.nombre.label('categoria'),
+            Comercio.subcategoria_id,
+            Subcategoria.nombre.label('subcategoria'),
+            f.c.pais_id,
+            Pais.nombre.label('pais'),
+            f.c.cuenta_id,
+            Cuenta.alias.label('cuenta_alias'),
+            Cuenta.banco.label('cuenta_banco'),
+            Cuenta.tipo_cuenta.label('cuenta_tipo'),
+            f.c.moneda,
+            func.sum(f.c.debitos_gtq).label('debitos'),
+            func.sum(f.c.creditos_gtq).label('creditos'),
+            func.sum(f.c.n_debitos).label('n_debitos'),
+            func.sum(f.c.n_creditos).label('n_creditos'),
+            (func.count(TipoCambio.id) > 0).label('con_tasa'),
+        )
+        .select_from(f)
+        .outerjoin(TipoCambio, TipoCambio.moneda == f.c.moneda)
+        .outerjoin(Comercio, Comercio.id == f.c.comercio_id)
+        .outerjoin(Categoria, Categoria.id == Comercio.categoria_id)
+        .outerjoin(Subcategoria, Subcategoria.id == Comercio.subcategoria_id)
+        .outerjoin(Pais, Pais.id == f.c.pais_id)
+        .outerjoin(Cuenta, Cuenta.id == f.c.cuenta_id)
+        .group_by(*clave)
+        .order_by(*clave)
+        .all()
+    )
+
+
+def leer_gastos(user_id, rangos, cat_id=None, subcat_id=None):
+    """
+    Gastos individuales (comercio de tipo 'gastos' y monto negativo) visibles en
+    el dashboard cuya fecha cae en alguno de los `rangos` [(desde, hasta), ...]
+    (None = sin límite). Cada fila trae fecha, descripción, monto en GTQ y comercio.
+    """
+    condiciones = []
+    for desde, hasta in rangos:
+        limites = []
+        if desde is not None:
+            limites.append(Movimiento.fecha >= desde)
+        if hasta is not None:
+            limites.append(Movimiento.fecha <= hasta)
+        if not limites:
+            # Un rango abierto incluye todas las fechas
+            condiciones = []
+            break
+        condiciones.append(and_(*limites))
+
+    q = (
+        db.session.query(
+            Movimiento.fecha,
+            Movimiento.descripcion,
+            expresion_monto_gtq().label('monto_gtq'),
+            Comercio.nombre.label('comercio'),
+        )
+        .join(TipoCambio, TipoCambio.moneda == Movimiento.moneda)
+        .join(Comercio, Movimiento.comercio_id == Comercio.id)
+        .filter(Comercio.tipo_contabilizacion == 'gastos')
+        .filter(Movimiento.monto < 0)
+        .filter(Movimiento.excluir_dashboard.is_(False))
+    )
+    if condiciones:
+        q = q.filter(or_(*condiciones))
+    if user_id is not None:
+        q = q.filter(Movimiento.user_id == user_id)
+    if cat_id is not None:
+        q = q.filter(Comercio.categoria_id == cat_id)
+    if subcat_id is not None:
+        q = q.filter(Comercio.subcategoria_id == subcat_id)
+    return q.order_by(Movimiento.id).all()
+
+
+def _agrupar(filas, clave, valor, condicion=None):
+    """Suma `valor(fila)` por `clave(fila)` para las filas que cumplen `condicion`."""
+    totales = {}
+    for fila in filas:
+        if condicion is not None and not condicion(fila):
+            continue
+        k = clave(fila)
+        totales[k] = totales.get(k, 0) + valor(fila)
+    return totales
+
+
+def _total(fila):
+    return fila.debitos + fila.creditos
+
+
+def _debitos(fila):
+    return fila.debitos
+
+
+def _creditos(fila):
+    return fila.creditos
+
+
+def _nombre_cuenta(fila):
+    return f"{fila.cuenta_banco} - {fila.cuenta_tipo}"
+
+
+def _pares_gasto(totales):
+    """(etiqueta, gasto positivo) ordenados de mayor a menor, sin ceros."""
+    pares = [(lbl, max(0, -(total or 0))) for lbl, total in totales]
+    pares = [par for par in pares if par[1] > 0]
+    pares.sort(key=lambda x: x[1], reverse=True)
+    return pares
+
+
+class AgregadosDashboard:
+    """Calcula las gráficas del dashboard a partir de filas ya leídas."""
+
+    def __init__(self, resumen, resumen_mes_anterior, gastos, cat_id=None, subcat_id=None):
+        # Los montos solo se suman en monedas con tipo de cambio; los conteos
+        # (comercios recurrentes) usan todas las filas
+        self.resumen = [fila for fila in resumen if fila.con_tasa]
+        self.resumen_conteos = resumen
+        self.resumen_mes_anterior = [fila for fila in resumen_mes_anterior if fila.con_tasa]
+        self.gastos = gastos
+        self.cat_id = cat_id
+        self.subcat_id = subcat_id
+
+    # --- Condiciones equivalentes a los filtros de cada consulta ---
+
+    def _de_tipo(self, tipo, categoria=True, subcategoria=True):
+        def condicion(fila):
+            if fila.tipo_contabilizacion != tipo:
+                return False
+            if categoria and self.cat_id is not None and fila.categoria_id != self.cat_id:
+                return False
+            if subcategoria and self.subcat_id is not None and fila.subcategoria_id != self.subcat_id:
+                return False
+            return True
+        return condicion
+
+    @staticmethod
+    def _sin_clasificar_debito(fila):
+        return fila.comercio_id == 0 and fila.n_debitos > 0
+
+    @staticmethod
+    def _sin_clasificar_credito(fila):
+        return fila.comercio_id == 0 and fila.creditos > 0
+
+    def _sin_clasificar(self, filas, valor, condicion):
+        totales = _agrupar(filas, lambda fila: NO_CLASIFICADO, valor, condicion)
+        return list(totales.items())
+
+    # --- Gráficas ---
+
+    def paises(self):
+        """Gastos por país (incluye movimientos sin clasificar)."""
+        def condicion(fila):
+            if fila.n_debitos <= 0:
+                return False
+            if self.cat_id is not None or self.subcat_id is not None:
+                if fila.comercio is None:
+                    return False
+                if self.cat_id is not None and fila.categoria_id != self.cat_id:
+                    return False
+                if self.subcat_id is not None and fila.subcategoria_id != self.subcat_id:
+                    return False
+            return True
+
+        totales = _agrupar(
+            self.resumen,
+            lambda fila: fila.pais if fila.pais is not None else SIN_PAIS,
+            lambda fila: -fila.debitos,
+            condicion,
+        )
+        pares = [(nombre, float(total)) for nombre, total in totales.items() if total and total > 0]
+        pares.sort(key=lambda x: x[1], reverse=True)
+        return pares
+
+    def mes_anterior(self):
+        """Gastos del mes anterior por comercio, categoría, subcategoría y cuenta."""
+        filas = self.resumen_mes_anterior
+        gastos = self._de_tipo('gastos')
+        comercios = list(_agrupar(filas, lambda fila: fila.comercio, _total, gastos).items())
+        categorias = list(_agrupar(
+            filas, lambda fila: fila.categoria, _total,
+            lambda fila: gastos(fila) and fila.categoria is not None,
+        ).items())
+        if self.cat_id is None and self.subcat_id is None:
+            sin_clasificar = self._sin_clasificar(filas, _debitos, self._sin_clasificar_debito)
+            comercios.extend(sin_clasificar)
+            categorias.extend(sin_clasificar)
+
+        subcategorias = _agrupar(
+            filas,
+            lambda fila: f"{fila.categoria} - {fila.subcategoria or SIN_SUBCATEGORIA}",
+            _total,
+            lambda fila: gastos(fila) and fila.categoria is not None,
+        )
+
+        cuentas = {}
+        for cuenta, total in _agrupar(
+            filas,
+            lambda fila: fila.cuenta_alias if fila.cuenta_alias else (_nombre_cuenta(fila) or 'Sin cuenta'),
+            _debitos,
+            lambda fila: gastos(fila) and fila.n_debitos > 0 and fila.cuenta_banco is not None,
+        ).items():
+            monto_abs = max(0, -(total or 0))
+            if monto_abs > 0:
+                cuentas[cuenta] = monto_abs
+
+        return {
+            'comercios': _pares_gasto(comercios),
+            'categorias': _pares_gasto(categorias),
+            'subcategorias': _pares_gasto(subcategorias.items()),
+            'cuentas': sorted(cuentas.items(), key=lambda x: x[1], reverse=True),
+        }
+
+    def comercios_gastos(self):
+        """Gastos por comercio, de menor a mayor (negativos primero) + no clasificados."""
+        totales = _agrupar(
+            self.resumen, lambda fila: fila.comercio, _total,
+            self._de_tipo('gastos', subcategoria=False),
+        )
+        datos = sorted(totales.items(), key=lambda x: x[1])
+        if self.cat_id is None:
+            datos.extend(self._sin_clasificar(self.resumen, _debitos, self._sin_clasificar_debito))
+        return datos
+
+    def categorias_gastos(self):
+        """Gastos por categoría, de menor a mayor + no clasificados."""
+        gastos = self._de_tipo('gastos', subcategoria=False)
+        totales = _agrupar(
+            self.resumen, lambda fila: fila.categoria, _total,
+            lambda fila: gastos(fila) and fila.categoria is not None,
+        )
+        datos = sorted(totales.items(), key=lambda x: x[1])
+        if self.cat_id is None:
+            datos.extend(self._sin_clasificar(self.resumen, _debitos, self._sin_clasificar_debito))
+        return datos
+
+    def subcategorias_gastos(self):
+        """Gastos por 'Categoría - Subcategoría' (positivos, de mayor a menor)."""
+        gastos = self._de_tipo('gastos', subcategoria=False)
+        totales = _agrupar(
+            self.resumen,
+            lambda fila: f"{fila.categoria} - {fila.subcategoria or SIN_SUBCATEGORIA}",
+            _total,
+            lambda fila: gastos(fila) and fila.categoria is not None,
+        )
+        return _pares_gasto(totales.items())
+
+    def por_mes(self, tipo, valor_sin_clasificar, condicion_sin_clasificar):
+        """Totales por mes de un tipo de contabilización (+ no clasificados)."""
+        totales = _agrupar(self.resumen, lambda fila: fila.mes, _total, self._de_tipo(tipo))
+        if self.cat_id is None and self.subcat_id is None:
+            for mes, total in _agrupar(
+                self.resumen, lambda fila: fila.mes, valor_sin_clasificar, condicion_sin_clasificar
+            ).items():
+                totales[mes] = totales.get(mes, 0) + total
+        return sorted(totales.items())
+
+    def meses(self):
+        """(etiquetas, gastos, ingresos) por mes, alineados en el mismo eje."""
+        gastos = {m: abs(v) for m, v in self.por_mes('gastos', _debitos, self._sin_clasificar_debito)}
+        ingresos = {m: abs(v) for m, v in self.por_mes('ingresos', _creditos, self._sin_clasificar_credito)}
+        etiquetas = list(gastos)
+        etiquetas.extend(sorted(m for m in ingresos if m not in gastos))
+        return (
+            etiquetas,
+            [gastos.get(m, 0) for m in etiquetas],
+            [ingresos.get(m, 0) for m in etiquetas],
+        )
+
+    def comercios_ingresos(self):
+        """Ingresos por comercio + no clasificados (solo filtra por subcategoría)."""
+        totales = _agrupar(
+            self.resumen, lambda fila: (fila.comercio_id, fila.comercio), _total,
+            self._de_tipo('ingresos', categoria=False),
+        )
+        datos = [(nombre, total) for (_, nombre), total in sorted(totales.items())]
+        if self.subcat_id is None:
+            datos.extend(self._sin_clasificar(self.resumen, _creditos, self._sin_clasificar_credito))
+        return datos
+
+    def cuentas_y_monedas(self):
+        """Gastos por cuenta (alias o 'banco - tipo') y por moneda."""
+        gastos = self._de_tipo('gastos')
+        totales = _agrupar(
+            self.resumen,
+            lambda fila: (fila.cuenta_alias, _nombre_cuenta(fila), fila.moneda),
+            _debitos,
+            lambda fila: gastos(fila) and fila.n_debitos > 0 and fila.cuenta_banco is not None,
+        )
+        cuentas = {}
+        monedas = {}
+        # Mismo orden que un GROUP BY alias, cuenta, moneda (alias NULL primero)
+        for (alias, nombre, moneda), total in sorted(
+            totales.items(), key=lambda x: (x[0][0] is not None, x[0][0] or '', x[0][1], x[0][2])
+        ):
+            monto_abs = abs(total) if total else 0
+            cuenta = alias if alias else (nombre or 'Sin cuenta')
+            cuentas[cuenta] = cuentas.get(cuenta, 0) + monto_abs
+            monedas[moneda] = monedas.get(moneda, 0) + monto_abs
+        return cuentas, monedas
+
+    def comercios_recurrentes(self, limite=10):
+        """Comercios de gasto con más movimientos."""
+        gastos = self._de_tipo('gastos')
+        conteos = _agrupar(
+            self.resumen_conteos, lambda fila: fila.comercio,
+            lambda fila: fila.n_debitos + fila.n_creditos,
+            lambda fila: gastos(fila) and fila.categoria is not None,
+        )
+        return sorted(conteos.items(), key=lambda x: x[1], reverse=True)[:limite]
+
+    # --- Gráficas sobre gastos individuales ---
+
+    def _gastos_en_rango(self, desde, hasta):
+        return [
+            fila for fila in self.gastos
+            if (desde is None or (fila.fecha is not None and fila.fecha >= desde))
+            and (hasta is None or (fila.fecha is not None and fila.fecha <= hasta))
+        ]
+
+    def gastos_individuales(self, desde, hasta, limite=10):
+        """Top de gastos, por día de la semana, por rango de monto y recurrentes."""
+        filas = self._gastos_en_rango(desde, hasta)
+
+        top = sorted(filas, key=lambda fila: fila.monto_gtq)[:limite]
+
+        por_dia = [0] * 7
+        rangos = [0] * len(RANGOS_GASTOS)
+        por_descripcion = {}
+        for fila in filas:
+            monto_abs = abs(fila.monto_gtq) if fila.monto_gtq else 0
+            if fila.fecha is not None:
+                # strftime('%w'): 0 = domingo
+                por_dia[(fila.fecha.weekday() + 1) % 7] += monto_abs
+            for i, (_, minimo, maximo) in enumerate(RANGOS_GASTOS):
+                if minimo <= monto_abs < maximo:
+                    rangos[i] += 1
+                    break
+            frecuencia, total = por_descripcion.get(fila.descripcion, (0, 0))
+            por_descripcion[fila.descripcion] = (frecuencia + 1, total + monto_abs)
+
+        recurrentes = sum(total for frecuencia, total in por_descripcion.values() if frecuencia >= 2)
+        unicos = sum(total for frecuencia, total in por_descripcion.values() if frecuencia < 2)
+
+        return {
+            'top': [(fila.descripcion, abs(fila.monto_gtq)) for fila in top],
+            'dias': por_dia,
+            'rangos': rangos,
+            'recurrentes': [recurrentes, unicos],
+        }
+
+    def heatmap(self, desde, hasta):
+        """Gasto de cada día entre `desde` y `hasta` (fechas 'YYYY-MM-DD')."""
+        por_dia = {}
+        for fila in self._gastos_en_rango(desde, hasta):
+            por_dia[fila.fecha] = por_dia.get(fila.fecha, 0) + fila.monto_gtq
+        fechas = []
+        montos = []
+        dia = desde
+        while dia <= hasta:
+            fechas.append(dia.strftime('%Y-%m-%d'))
+            total = por_dia.get(dia)
+            montos.append(abs(total) if total else 0)
+            dia += timedelta(days=1)
+        return fechas, montos
@@ -0,0 +1,163 @@
+"""Contadores de versión de datos para invalidar cachés en proceso.
+
+Cada clave de `versiones_datos` se incrementa automáticamente (eventos de la
+sesión) cuando cambian los modelos que la afectan, incluidos los
+`query.delete()`/`query.update()` masivos. Los consumidores comparan la versión
+guardada junto a su caché con `version_datos(clave)` antes de reutilizarla.
+"""
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.orm import Session
+
+from .. import db
+from ..models import (
+    Categoria, CodigoPais, Comercio, Cuenta, Movimiento, Pais, Regla, Subcategoria, TipoCambio,
+    TipoCambioHistorico, User,
+)
+
+
+CLAVE_REGLAS = 'reglas'
+# Comercios, categorías, subcategorías, países, cuentas y tipos de cambio
+CLAVE_CATALOGOS = 'catalogos'
+# Usuarios (listas de selección de dueño)
+CLAVE_USUARIOS = 'usuarios'
+# Cualquier cambio en movimientos; además cada usuario tiene su propia clave
+CLAVE_MOVIMIENTOS = 'movimientos'
+# Cambios masivos de movimientos sin usuario conocido (afectan a todos)
+CLAVE_MOVIMIENTOS_TODOS = 'movimientos:*'
+
+# Modelos cuyo cambio (alta, baja o modificación) invalida cada clave
+_CLAVES_POR_MODELO = {
+    Regla: (CLAVE_REGLAS,),
+    CodigoPais: (CLAVE_REGLAS,),
+    Pais: (CLAVE_REGLAS, CLAVE_CATALOGOS),
+    Comercio: (CLAVE_CATALOGOS,),
+    Categoria: (CLAVE_CATALOGOS,),
+    Subcategoria: (CLAVE_CATALOGOS,),
+    Cuenta: (CLAVE_CATALOGOS,),
+    TipoCambio: (CLAVE_CATALOGOS,),
+    TipoCambioHistorico: (CLAVE_CATALOGOS,),
+    User: (CLAVE_USUARIOS,),
+}
+
+# Modelos de los que solo importan algunas columnas
+_COLUMNAS_VIGILADAS = {
+    Comercio: {'tipo_contabilizacion': (CLAVE_REGLAS,)},
+}
+
+_SQL_INCREMENTAR = text(
+    'INSERT INTO versiones_datos (clave, valor) VALUES (:clave, 1) '
+    'ON CONFLICT(clave) DO UPDATE SET valor = valor + 1'
+)
+
+
+def clave_movimientos_usuario(user_id):
+    return f'{CLAVE_MOVIMIENTOS}:{user_id}'
+
+
+def version_datos(clave):
+    """Versión actual de `clave` (0 si nunca se ha incrementado)."""
+    valor = db.session.execute(
+        text('SELECT valor FROM versiones_datos WHERE clave = :clave'),
+        {'clave': clave},
+    ).scalar()
+    return valor or 0
+
+
+def versiones_datos(*claves):
+    """Versiones de varias claves en una sola consulta, en el mismo orden."""
+    filas = db.session.execute(
+        text('SELECT clave, valor FROM versiones_datos WHERE clave IN :claves')
+        .bindparams(bindparam('claves', expanding=True)),
+        {'claves': list(claves)},
+    ).all()
+    valores = dict(filas)
+    return tuple(valores.get(clave, 0) for clave in claves)
+
+
+def incrementar_version(*claves, connection=None):
+    """Incrementa explícitamente las claves indicadas (p.e. tras SQL crudo)."""
+    conn = connection if connection is not None else db.session.connection()
+    for clave in sorted(set(claves)):
+        conn.execute(_SQL_INCREMENTAR, {'clave': clave})
+
+
+def _claves_movimientos(*user_ids):
+    claves = {CLAVE_MOVIMIENTOS}
+    claves.update(clave_movimientos_usuario(user_id) for user_id in user_ids)
+    return claves
+
+
+def _claves_por_instancia(obj, modificado):
+    claves = set()
+    if isinstance(obj, Movimiento):
+        user_ids = {obj.user_id}
+        if modificado:
+            # Si cambió de usuario, también cambian los datos del anterior
+            user_ids.update(db.inspect(obj).attrs.user_id.history.deleted)
+        return _claves_movimientos(*user_ids)
+    for modelo, afectadas in _CLAVES_POR_MODELO.items():
+        if isinstance(obj, modelo):
+            claves.update(afectadas)
+    for modelo, columnas in _COLUMNAS_VIGILADAS.items():
+        if not isinstance(obj, modelo):
+            continue
+        if not modificado:
+            for afectadas in columnas.values():
+                claves.update(afectadas)
+            continue
+        estado = db.inspect(obj)
+        for columna, afectadas in columnas.items():
+            if estado.attrs[columna].history.has_changes():
+                claves.update(afectadas)
+    return claves
+
+
+@event.listens_for(Session, 'after_flush')
+def _incrementar_en_flush(session, flush_context):
+    claves = set()
+    for obj in session.new:
+        claves.update(_claves_por_instancia(obj, modificado=False))
+    for obj in session.deleted:
+        claves.update(_claves_por_instancia(obj, modificado=False))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            claves.update(_claves_por_instancia(obj, modificado=True))
+    if claves:
+        incrementar_version(*claves, connection=session.connection())
+
+
+def _claves_insercion_movimientos(parametros):
+    if isinstance(parametros, dict):
+        parametros = [parametros]
+    if not parametros:
+        return {CLAVE_MOVIMIENTOS, CLAVE_MOVIMIENTOS_TODOS}
+    return _claves_movimientos(*{fila.get('user_id') for fila in parametros})
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _incrementar_en_masivo(orm_execute_state):
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    modelo = mapper.class_
+    if orm_execute_state.is_insert:
+        # Inserciones masivas (p.e. `guardar_movimientos`)
+        if modelo is Movimiento:
+            incrementar_version(
+                *_claves_insercion_movimientos(orm_execute_state.parameters),
+                connection=orm_execute_state.session.connection(),
+            )
+        return
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    claves = set(_CLAVES_POR_MODELO.get(modelo, ()))
+    if modelo is Movimiento:
+        # No sabemos a qué usuarios pertenecen las filas afectadas
+        claves.update((CLAVE_MOVIMIENTOS, CLAVE_MOVIMIENTOS_TODOS))
+    if modelo in _COLUMNAS_VIGILADAS:
+        # En un UPDATE/DELETE masivo no conocemos las columnas afectadas con certeza
+        for afectadas in _COLUMNAS_VIGILADAS[modelo].values():
+            claves.update(afectadas)
+    if claves:
+        incrementar_version(*claves, connection=orm_execute_state.session.connection())
@@ -1,44 +1,50 @@
 import os
 import hashlib
+import multiprocessing
+import uuid
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, select
 from .. import db
 from ..models import Archivo, Factura, FacturaDetalle, Cuenta, Movimiento
-from .parser.monet_aho_gyt_xlsx import load_movements_monet_aho_gyt_xlsx
-from .parser.monet_aho_gyt_pdf import load_movements_monet_aho_gyt_pdf
-from .parser.tc_gyt_xlsx import load_movements_tc_gyt_xlsx
-from .parser.tc_gyt_pdf import load_movements_tc_gyt_pdf
-from .parser.monet_bi_pdf import load_movements_bi_monet_pdf
-from .parser.monet_bi_email_pdf import load_movements_bi_monet_email_pdf
-from .parser.monet_bi_legacy_pdf import parse_monet_bi_legacy_pdf_file
-from .parser.monet_bi_ec_integrado_pdf import load_movements_monet_bi_ec_integrado_pdf
-from .parser.tc_bi_xls import load_movements_bi_tc_xls
-from .parser.tc_bi_email_pdf import load_movements_bi_tc_email_pdf
-from .parser.tc_promerica_xls import load_movements_promerica_tc_xls
-from .parser.tc_bac_csv import load_movements_bac_tc_csv
-from .parser.ahorro_bac_csv import load_movements_ahorro_bac_csv
-from .parser.tc_bi_virtual_xls import load_movements_bi_tc_virtual_xls
-from .parser.generic_movimientos import load_movements_generic
-from .parser.ahorro_interbanco_pdf import parse_ahorro_interbanco_pdf_file
-from .parser.monet_nexa_pdf import load_movements_monet_nexa_pdf
+from .parser import lectura
+from .parser.registro import obtener_parser
 from .classifier import clasificar_movimientos
 from .parser.facturas_fel_xml import parse_factura_fel_xml
 
 
+# Bloque de lectura/escritura al calcular hashes (1 MiB)
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Valores por consulta `IN` al buscar hashes o UUID ya cargados (límite de variables de SQLite)
+_TAMANO_LOTE_IN = 5000
+
+# Los pools de lectura se crean desde el hilo de importación: con `fork` el
+# hijo heredaría locks tomados por otros hilos del servidor. `spawn` arranca
+# procesos limpios (y es el único disponible en Windows).
+_CONTEXTO_POOL = multiprocessing.get_context('spawn')
+
+
 def compute_file_hash(filepath):
     """Calcula el hash SHA256 de un archivo para evitar duplicados."""
     hash_sha = hashlib.sha256()
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
             hash_sha.update(chunk)
     return hash_sha.hexdigest()
 
 
-def register_file(filepath, tipo_archivo, user_id=None):
+def register_file(filepath, tipo_archivo, user_id=None, file_hash=None):
     """
     Registra un archivo en la DB si no existe duplicado y devuelve (ruta, Archivo).
     Si ya existe, devuelve (None, Archivo existente).
+    `file_hash` evita volver a leer el archivo cuando el hash ya se conoce.
     """
-    file_hash = compute_file_hash(filepath)
+    if file_hash is None:
+        file_hash = compute_file_hash(filepath)
     existing = Archivo.query.filter_by(file_hash=file_hash).first()
     if existing:
         return None, existing
@@ -56,6 +62,153 @@ def register_file(filepath, tipo_archivo, user_id=None):
     return filepath, nuevo
 
 
+def save_and_register(file_storage, filepath, tipo_archivo, user_id=None):
+    """
+    Guarda un archivo subido y lo registra con `register_file`, sin volver a
+    leerlo del disco.
+
+    El SHA256 se calcula sobre el stream que Werkzeug ya tiene en memoria o en
+    un temporal, antes de escribir nada: un duplicado se descarta sin tocar la
+    carpeta de cargas. Un archivo nuevo se escribe en un temporal único junto a
+    `filepath` y se mueve con `os.replace`, así dos cargas simultáneas con el
+    mismo nombre no comparten archivo parcial. Devuelve lo mismo que
+    `register_file`.
+    """
+    stream = file_storage.stream
+    hash_sha = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_BUFFER_SIZE), b""):
+        hash_sha.update(chunk)
+    file_hash = hash_sha.hexdigest()
+
+    existing = Archivo.query.filter_by(file_hash=file_hash).first()
+    if existing:
+        return None, existing
+
+    stream.seek(0)
+    parcial = f"{filepath}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(parcial, 'xb') as destino:
+            for chunk in iter(lambda: stream.read(HASH_BUFFER_SIZE), b""):
+                destino.write(chunk)
+        os.replace(parcial, filepath)
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    return register_file(filepath, tipo_archivo, user_id=user_id, file_hash=file_hash)
+
+
+def es_zip(filename):
+    return os.path.splitext(filename)[1].lower() == '.zip'
+
+
+def _miembro_ignorado(nombre):
+    # Metadatos que agregan los compresores de macOS y archivos ocultos
+    partes = nombre.split('/')
+    return partes[0] == '__MACOSX' or partes[-1].startswith('.')
+
+
+def miembros_zip(zip_path, max_miembro=None, max_total=None):
+    """
+    Nombres de los archivos dentro de un ZIP, en el orden del archivo, sin
+    carpetas ni metadatos. Solo lee el directorio central, no el contenido.
+    Lanza `zipfile.BadZipFile` si no es un ZIP válido y ValueError si algún
+    archivo declara más de `max_miembro` bytes descomprimido o el total pasa
+    de `max_total` (None: sin límite).
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = [
+            info
+            for info in zf.infolist()
+            if not info.is_dir() and not _miembro_ignorado(info.filename)
+        ]
+    total = 0
+    for info in infos:
+        if max_miembro is not None and info.file_size > max_miembro:
+            raise ValueError(f'El archivo "{info.filename}" del ZIP excede el tamaño máximo permitido.')
+        total += info.file_size
+    if max_total is not None and total > max_total:
+        raise ValueError('El contenido del ZIP excede el tamaño máximo permitido.')
+    return [info.filename for info in infos]
+
+
+class _LecturaMiembro:
+    """
+    Archivo binario de solo lectura de un miembro de ZIP que falla si se
+    descomprimen más bytes de los declarados en el directorio central (el
+    tamaño que se validó en `miembros_zip`).
+    """
+
+    def __init__(self, zf, miembro):
+        info = zf.getinfo(miembro)
+        self._origen = zf.open(info)
+        self._nombre = miembro
+        self._restantes = info.file_size
+
+    def read(self, size=-1):
+        # Nunca pedir más de un byte por encima de lo declarado
+        if size is None or size < 0 or size > self._restantes + 1:
+            size = self._restantes + 1
+        datos = self._origen.read(size)
+        self._restantes -= len(datos)
+        if self._restantes < 0:
+            raise ValueError(f'El archivo "{self._nombre}" del ZIP es mayor que su tamaño declarado.')
+        return datos
+
+    def close(self):
+        self._origen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _LecturaConHash:
+    """Archivo binario de solo lectura que calcula el SHA256 de lo leído."""
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+        self._hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        datos = self._archivo.read(size)
+        self._hash.update(datos)
+        return datos
+
+    def hexdigest(self):
+        # Lo que el lector no llegó a consumir también forma parte del hash
+        for _ in iter(lambda: self.read(HASH_BUFFER_SIZE), b""):
+            pass
+        return self._hash.hexdigest()
+
+
+def hash_miembro_zip(zip_path, miembro):
+    """SHA256 de un archivo dentro de un ZIP, descomprimido en bloques sin tocar el disco."""
+    with zipfile.ZipFile(zip_path) as zf, _LecturaMiembro(zf, miembro) as origen:
+        return _LecturaConHash(origen).hexdigest()
+
+
+def extraer_miembro_zip(zip_path, miembro, filepath):
+    """Copia en bloques un archivo de un ZIP a `filepath`."""
+    with zipfile.ZipFile(zip_path) as zf, _LecturaMiembro(zf, miembro) as origen, open(filepath, 'wb') as destino:
+        for chunk in iter(lambda: origen.read(HASH_BUFFER_SIZE), b""):
+            destino.write(chunk)
+
+
+def hashes_registrados(hashes):
+    """Subconjunto de `hashes` que ya tiene un Archivo, con una consulta `IN` por bloque."""
+    hashes = list(hashes)
+    registrados = set()
+    for i in range(0, len(hashes), _TAMANO_LOTE_IN):
+        registrados.update(
+            db.session.scalars(
+                select(Archivo.file_hash).where(Archivo.file_hash.in_(hashes[i:i + _TAMANO_LOTE_IN]))
+            )
+        )
+    return registrados
+
+
 def register_batch_folder(folderpath, tipo_archivo, user_id=None):
     """
     Registra una carpeta/lote como un único Archivo.
@@ -78,111 +231,31 @@ def register_batch_folder(folderpath, tipo_archivo, user_id=None):
     return nuevo
 
 
-def load_movements(filepath, archivo_obj, tipo_archivo):
+def load_movements(filepath, archivo_obj, tipo_archivo, clasificar=True):
     """
     Lee el archivo indicado por `tipo_archivo`, lo parsea con el parser correspondiente,
     guarda los movimientos en la BD y aplica clasificación.
+
+    Con `clasificar=False` la clasificación queda a cargo del llamador (ver
+    `clasificar_archivos`), útil al cargar varios archivos seguidos.
+
+    Retorna `MovimientosGuardados` (ver `guardar_movimientos`): los
+    movimientos insertados y los omitidos por estar ya cargados desde otro
+    archivo.
     """
 
     # 1) Verificar extensión
     extension = os.path.splitext(filepath)[1].lower()
 
-    # 2) Dispatch al parser concreto
-    if tipo_archivo == 'monet-aho-gyt':
-        archivo_obj.banco = 'GYT'
-        if extension in ('.xlsx', '.xls'):
-            count = load_movements_monet_aho_gyt_xlsx(filepath, archivo_obj)
-        elif extension in ('.pdf',):
-            count = load_movements_monet_aho_gyt_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet-aho-gyt.')
-    elif tipo_archivo == 'tc-gyt':
-        archivo_obj.banco = 'GYT'
-        if extension in ('.xlsx', '.xls'):
-            count = load_movements_tc_gyt_xlsx(filepath, archivo_obj)
-        elif extension in ('.pdf',):
-            count = load_movements_tc_gyt_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-gyt.')
-    elif tipo_archivo == 'monet-bi':
-        archivo_obj.banco = 'BI'
-        if extension in ('.pdf',):
-            count = load_movements_bi_monet_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet-bi.')
-    elif tipo_archivo == 'monet-bi-email':
-        archivo_obj.banco = 'BI'
-        if extension in ('.pdf',):
-            count = load_movements_bi_monet_email_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet-bi-email.')
-    elif tipo_archivo == 'monet-bi-legacy':
-        archivo_obj.banco = 'BI'
-        if extension in ('.pdf',):
-            count = parse_monet_bi_legacy_pdf_file(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet-bi-legacy.')
-    elif tipo_archivo in ('monet_bi_ec_integrado', 'monet-bi-ec-integrado'):
-        archivo_obj.banco = 'BI'
-        if extension in ('.pdf',):
-            count = load_movements_monet_bi_ec_integrado_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet_bi_ec_integrado.')
-    elif tipo_archivo == 'monet-nexa':
-        archivo_obj.banco = 'NEXA'
-        if extension in ('.pdf',):
-            count = load_movements_monet_nexa_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato monet-nexa.')
-    elif tipo_archivo == 'tc-bi':
-        archivo_obj.banco = 'BI'
-        if extension in ('.xls', '.xlsx'):
-            count = load_movements_bi_tc_xls(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-bi.')
-    elif tipo_archivo == 'tc-bi-email':
-        archivo_obj.banco = 'BI'
-        if extension in ('.pdf',):
-            count = load_movements_bi_tc_email_pdf(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-bi-email.')
-    elif tipo_archivo == 'tc-promerica':
-        archivo_obj.banco = 'Promerica'
-        if extension in ('.xls', '.xlsx'):
-            count = load_movements_promerica_tc_xls(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-promerica.')
-    elif tipo_archivo == 'tc-online-bi':
-        archivo_obj.banco = 'BI'
-        if extension in ('.xls', '.xlsx'):
-            count = load_movements_bi_tc_virtual_xls(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-online-bi.')
-    elif tipo_archivo == 'generic-movimientos':
-        if extension in ('.xls', '.xlsx', '.csv'):
-            count = load_movements_generic(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato generic-movimientos.')
-    elif tipo_archivo == 'tc-bac':
-        archivo_obj.banco = 'BAC'
-        if extension in ('.csv',):
-            count = load_movements_bac_tc_csv(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato tc-bac.')
-    elif tipo_archivo == 'ahorro-bac':
-        archivo_obj.banco = 'BAC'
-        if extension in ('.csv',):
-            count = load_movements_ahorro_bac_csv(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato ahorro-bac.')
-    elif tipo_archivo == 'ahorro-interbanco':
-        archivo_obj.banco = 'Interbanco'
-        if extension in ('.pdf',):
-            count = parse_ahorro_interbanco_pdf_file(filepath, archivo_obj)
-        else:
-            raise ValueError('Extensión no válida para formato ahorro-interbanco.')
-    else:
-        raise ValueError(f'Tipo de archivo "{tipo_archivo}" no soportado.')
+    # 2) Dispatch al parser registrado (se importa en el primer uso)
+    parser = obtener_parser(tipo_archivo)
+    parse = parser.funcion(extension)
+    if parser.banco is not None:
+        archivo_obj.banco = parser.banco
+    try:
+        guardados = parse(filepath, archivo_obj)
+    finally:
+        lectura.descartar(filepath)
 
     # Marcar la última carga de estado de cuenta para las cuentas afectadas por este archivo.
     cuenta_ids = [
@@ -197,18 +270,84 @@ def load_movements(filepath, archivo_obj, tipo_archivo):
         for cuenta in Cuenta.query.filter(Cuenta.id.in_(cuenta_ids)).all():
             cuenta.ultima_carga_estado_cuenta = now
 
-    # 3) Clasificar todos los movimientos nuevos
-    clasificar_movimientos()
+    # 3) Clasificar solo los movimientos de este archivo
+    if clasificar:
+        clasificar_movimientos(archivo_id=archivo_obj.id)
     db.session.commit()
 
-    return count
+    return guardados
 
 
-def load_facturas(filepath, archivo_obj, tipo_archivo):
+def clasificar_archivos(archivo_ids):
+    """Clasifica en una sola pasada los movimientos de varios archivos ya cargados."""
+    if not archivo_ids:
+        return
+    movimiento_ids = [
+        row[0]
+        for row in db.session.query(Movimiento.id)
+        .filter(Movimiento.archivo_id.in_(archivo_ids))
+        .all()
+    ]
+    clasificar_movimientos(movimiento_ids=movimiento_ids)
+
+
+def leer_en_paralelo(filepaths, tipo_archivo, max_workers=None):
     """
-    Carga facturas FEL XML en estructura separada de movimientos.
-    Retorna un dict con el resultado de la importación.
+    Ejecuta en un pool de procesos las lecturas costosas (pdfplumber, pandas)
+    de cada archivo y las precarga para su parser.
+
+    Genera cada ruta en cuanto sus lecturas están listas (orden de término), de
+    modo que el llamador, en un único hilo, parsee y persista con
+    `load_movements` mientras los demás archivos se siguen leyendo. Los
+    archivos sin lecturas declaradas, o cuya lectura falla en el pool, se
+    generan igual y el parser los lee en el proceso principal.
     """
+    trabajos = []
+    directos = []
+    for filepath in filepaths:
+        extension = os.path.splitext(filepath)[1].lower()
+        try:
+            lecturas = obtener_parser(tipo_archivo).lecturas(extension)
+        except ValueError:
+            # Tipo o extensión no soportados: `load_movements` reportará el error
+            lecturas = ()
+        if lecturas:
+            trabajos.append((filepath, lecturas))
+        else:
+            directos.append(filepath)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(trabajos))
+    if max_workers <= 1:
+        # Sin paralelismo útil: el parser lee cada archivo directamente
+        yield from directos
+        yield from (filepath for filepath, _ in trabajos)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_CONTEXTO_POOL) as pool:
+        futuros = {
+            pool.submit(lectura.extraer_lecturas, filepath, lecturas): filepath
+            for filepath, lecturas in trabajos
+        }
+        yield from directos
+        for futuro in as_completed(futuros):
+            try:
+                lectura.precargar(futuro.result())
+            except Exception as exc:
+                current_app.logger.warning(
+                    'Lectura en paralelo fallida para %s (%s); se leerá en el proceso principal',
+                    futuros[futuro], exc,
+                )
+            yield futuros[futuro]
+
+
+_COLUMNAS_DETALLE = (
+    'numero_linea', 'descripcion', 'cantidad', 'unidad_medida', 'precio_unitario', 'total_linea',
+)
+
+
+def _validar_factura(filepath, tipo_archivo):
     extension = os.path.splitext(filepath)[1].lower()
     if extension not in ('.xml',):
         raise ValueError('Extensión no válida para facturas FEL. Se espera .xml')
@@ -216,77 +355,123 @@ def load_facturas(filepath, archivo_obj, tipo_archivo):
     if tipo_archivo != 'factura-fel-xml':
         raise ValueError(f'Tipo de archivo "{tipo_archivo}" no soportado para facturas.')
 
-    parsed = parse_factura_fel_xml(filepath)
-    factura_data = parsed['factura']
-    detalles_data = parsed['detalles']
 
-    existing = Factura.query.filter_by(uuid=factura_data['uuid']).first()
-    if existing:
-        return {
-            'facturas': 0,
-            'detalles': 0,
-            'duplicates': 1,
-        }
+# Resultado de parsear una factura en el pool: `error` es el mensaje si no se
+# pudo leer y `file_hash` el SHA256 del contenido si vino de un ZIP
+LecturaFactura = namedtuple('LecturaFactura', 'datos error file_hash')
 
-    factura = Factura(
-        uuid=factura_data['uuid'],
-        serie=factura_data['serie'],
-        numero_autorizacion=factura_data['numero_autorizacion'],
-        tipo_documento=factura_data['tipo_documento'],
-        fecha_emision=factura_data['fecha_emision'],
-        fecha_certificacion=factura_data['fecha_certificacion'],
-        moneda=factura_data['moneda'],
-        emisor_nit=factura_data['emisor_nit'],
-        emisor_nombre=factura_data['emisor_nombre'],
-        emisor_nombre_comercial=factura_data.get('emisor_nombre_comercial'),
-        emisor_afiliacion_iva=factura_data.get('emisor_afiliacion_iva'),
-        emisor_codigo_establecimiento=factura_data.get('emisor_codigo_establecimiento'),
-        emisor_correo=factura_data.get('emisor_correo'),
-        emisor_direccion=factura_data.get('emisor_direccion'),
-        emisor_codigo_postal=factura_data.get('emisor_codigo_postal'),
-        emisor_municipio=factura_data.get('emisor_municipio'),
-        emisor_departamento=factura_data.get('emisor_departamento'),
-        emisor_pais=factura_data.get('emisor_pais'),
-        receptor_id=factura_data['receptor_id'],
-        receptor_nombre=factura_data['receptor_nombre'],
-        receptor_correo=factura_data.get('receptor_correo'),
-        receptor_direccion=factura_data.get('receptor_direccion'),
-        receptor_codigo_postal=factura_data.get('receptor_codigo_postal'),
-        receptor_municipio=factura_data.get('receptor_municipio'),
-        receptor_departamento=factura_data.get('receptor_departamento'),
-        receptor_pais=factura_data.get('receptor_pais'),
-        nit_certificador=factura_data.get('nit_certificador'),
-        nombre_certificador=factura_data.get('nombre_certificador'),
-        frases_resumen=factura_data.get('frases_resumen'),
-        total_impuestos_monto=factura_data.get('total_impuestos_monto'),
-        gran_total=factura_data['gran_total'],
-        total_impuesto_iva=factura_data['total_impuesto_iva'],
-        retencion_isr=factura_data['retencion_isr'],
-        retencion_iva=factura_data['retencion_iva'],
-        total_menos_retenciones=factura_data['total_menos_retenciones'],
-        archivo_id=archivo_obj.id,
-        user_id=archivo_obj.user_id,
-    )
-    db.session.add(factura)
-    db.session.flush()
-
-    detalle_count = 0
-    for d in detalles_data:
-        db.session.add(FacturaDetalle(
-            factura_id=factura.id,
-            numero_linea=d['numero_linea'],
-            descripcion=d['descripcion'],
-            cantidad=d['cantidad'],
-            unidad_medida=d['unidad_medida'],
-            precio_unitario=d['precio_unitario'],
-            total_linea=d['total_linea'],
-        ))
-        detalle_count += 1
 
-    db.session.commit()
+def _leer_factura(fuente, tipo_archivo):
+    """
+    Parsea en el pool la factura de `fuente`, una tupla (ruta, miembro) donde
+    `miembro` es None para un archivo suelto o el nombre dentro del ZIP en
+    `ruta`. Un miembro se parsea directo del ZIP y se le calcula el hash en la
+    misma lectura.
+    """
+    filepath, miembro = fuente
+    try:
+        _validar_factura(miembro or filepath, tipo_archivo)
+        if miembro is None:
+            return LecturaFactura(parse_factura_fel_xml(filepath), None, None)
+        with zipfile.ZipFile(filepath) as zf, _LecturaMiembro(zf, miembro) as origen:
+            lector = _LecturaConHash(origen)
+            datos = parse_factura_fel_xml(lector)
+            return LecturaFactura(datos, None, lector.hexdigest())
+    except Exception as exc:
+        return LecturaFactura(None, str(exc) or exc.__class__.__name__, None)
+
+
+def leer_facturas_en_paralelo(fuentes, tipo_archivo, max_workers=None):
+    """
+    Parsea facturas FEL XML en un pool de procesos y genera
+    (fuente, LecturaFactura) en el orden de `fuentes`, tuplas (ruta, miembro)
+    como las de `_leer_factura`. Con un solo worker, o una sola factura, se
+    parsean en este proceso.
+    """
+    fuentes = list(fuentes)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(fuentes))
+    if max_workers <= 1:
+        for fuente in fuentes:
+            yield fuente, _leer_factura(fuente, tipo_archivo)
+        return
+
+    # Cada factura se parsea en ~1 ms: repartirlas en bloques evita un viaje
+    # al pool por archivo
+    chunksize = max(1, len(fuentes) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_CONTEXTO_POOL) as pool:
+        resultados = pool.map(
+            _leer_factura, fuentes, [tipo_archivo] * len(fuentes), chunksize=chunksize,
+        )
+        yield from zip(fuentes, resultados)
+
+
+def _uuids_existentes(uuids):
+    existentes = set()
+    for i in range(0, len(uuids), _TAMANO_LOTE_IN):
+        existentes.update(
+            db.session.scalars(select(Factura.uuid).where(Factura.uuid.in_(uuids[i:i + _TAMANO_LOTE_IN])))
+        )
+    return existentes
+
+
+def guardar_facturas(lecturas):
+    """
+    Inserta facturas ya parseadas. `lecturas` es una lista de
+    (archivo_obj, datos) con `datos` como los devuelve `parse_factura_fel_xml`.
+
+    Las ya cargadas se buscan con una sola consulta `IN` sobre todos los UUID
+    (y las repetidas dentro del lote cuentan como duplicadas); las nuevas y sus
+    detalles se insertan con un INSERT masivo por tabla. No hace commit: el
+    llamador decide la transacción. Retorna, en el orden de `lecturas`, un
+    dict por factura con 'facturas', 'detalles' y 'duplicates'.
+    """
+    existentes = _uuids_existentes(sorted({datos['factura']['uuid'] for _, datos in lecturas}))
+
+    resultados = []
+    filas = []
+    nuevas = []
+    for archivo_obj, datos in lecturas:
+        uuid = datos['factura']['uuid']
+        if uuid in existentes:
+            resultados.append({'facturas': 0, 'detalles': 0, 'duplicates': 1})
+            continue
+        existentes.add(uuid)
+        resultado = {'facturas': 1, 'detalles': len(datos['detalles']), 'duplicates': 0}
+        resultados.append(resultado)
+        filas.append({
+            **datos['factura'],
+            'archivo_id': archivo_obj.id,
+            'user_id': archivo_obj.user_id,
+        })
+        nuevas.append(datos['detalles'])
+
+    if filas:
+        # render_nulls: todas las filas comparten la sentencia (un executemany)
+        ids = db.session.scalars(
+            insert(Factura)
+            .returning(Factura.id, sort_by_parameter_order=True)
+            .execution_options(render_nulls=True),
+            filas,
+        ).all()
+        detalles = [
+            {'factura_id': factura_id, **{columna: d.get(columna) for columna in _COLUMNAS_DETALLE}}
+            for factura_id, detalles_factura in zip(ids, nuevas)
+            for d in detalles_factura
+        ]
+        if detalles:
+            db.session.execute(insert(FacturaDetalle).execution_options(render_nulls=True), detalles)
+
+    return resultados
+
 
-    return {
-        'facturas': 1,
-        'detalles': detalle_count,
-        'duplicates': 0,
-    }
+def load_facturas(filepath, archivo_obj, tipo_archivo):
+    """
+    Carga facturas FEL XML en estructura separada de movimientos.
+    Retorna un dict con el resultado de la importación.
+    """
+    _validar_factura(filepath, tipo_archivo)
+    resultado, = guardar_facturas([(archivo_obj, parse_factura_fel_xml(filepath))])
+    db.session.commit()
+    return resultado
@@ -0,0 +1,395 @@
+"""Trabajos de importación en segundo plano.
+
+La ruta de carga solo guarda los archivos y crea un `TrabajoImportacion`; un
+hilo de trabajo (uno por proceso, como el programador de respaldos) los
+procesa en orden y actualiza el progreso de cada archivo, que el navegador
+consulta por JSON. Al arrancar se vuelven a encolar los trabajos que quedaron
+pendientes.
+"""
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from .. import db
+from ..models import Archivo, TrabajoImportacion, TrabajoImportacionArchivo
+from .file_loader import (
+    register_file, load_movements, leer_en_paralelo, clasificar_archivos,
+    guardar_facturas, leer_facturas_en_paralelo,
+    hash_miembro_zip, extraer_miembro_zip, hashes_registrados,
+)
+
+_cola = queue.Queue()
+_worker_started = False
+_worker_lock = threading.Lock()
+
+ESTADOS_FINALES = ('completado', 'duplicado', 'error')
+
+
+def crear_trabajo(tipo_archivo, archivos, user_id=None, archivo_lote=None):
+    """
+    Registra un trabajo con los archivos ya guardados en disco.
+    `archivos` es una lista de dicts con los campos de `TrabajoImportacionArchivo`
+    (al menos `nombre` original y `ruta`; `archivo_id` si ya se registró).
+    """
+    trabajo = TrabajoImportacion(
+        tipo_archivo=tipo_archivo,
+        user_id=user_id,
+        archivo_lote_id=archivo_lote.id if archivo_lote is not None else None,
+    )
+    for datos in archivos:
+        trabajo.archivos.append(TrabajoImportacionArchivo(**datos))
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo
+
+
+def ruta_pendiente(ruta):
+    """Indica si `ruta` pertenece a un archivo de un trabajo que aún no se procesa."""
+    return db.session.query(
+        TrabajoImportacionArchivo.query.filter(
+            TrabajoImportacionArchivo.ruta == ruta,
+            TrabajoImportacionArchivo.estado.in_(('pendiente', 'procesando')),
+        ).exists()
+    ).scalar()
+
+
+def encolar_trabajo(trabajo_id):
+    _cola.put(trabajo_id)
+
+
+def _eliminar(ruta):
+    if ruta and os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def _eliminar_item(item):
+    """Elimina el archivo de un item descartado; un ZIP se conserva mientras otros miembros lo usen."""
+    if item.miembro is None:
+        _eliminar(item.ruta)
+
+
+def _eliminar_zips_sin_cargas(trabajo):
+    """Elimina los ZIP del trabajo de los que no se cargó ningún miembro."""
+    cargas = {}
+    for item in trabajo.archivos:
+        if item.miembro is not None:
+            cargas[item.ruta] = cargas.get(item.ruta, False) or bool(item.insertados)
+    for ruta, cargado in cargas.items():
+        if not cargado:
+            _eliminar(ruta)
+
+
+def _marcar_error(item_id, error):
+    """Registra el error de un archivo tras revertir la sesión."""
+    db.session.rollback()
+    item = db.session.get(TrabajoImportacionArchivo, item_id)
+    item.estado = 'error'
+    item.error = str(error)
+    db.session.commit()
+    _eliminar_item(item)
+
+
+def _procesar_facturas(trabajo, items):
+    lote = db.session.get(Archivo, trabajo.archivo_lote_id) if trabajo.archivo_lote_id else None
+
+    # 1) Registrar y descartar duplicados antes de leer nada (los miembros de
+    # un ZIP siempre van en un lote)
+    por_fuente = {}
+    for item in items:
+        try:
+            if lote is not None:
+                archivo = lote
+            elif item.archivo_id is not None:
+                archivo = db.session.get(Archivo, item.archivo_id)
+            else:
+                ruta, archivo = register_file(item.ruta, trabajo.tipo_archivo, user_id=trabajo.user_id)
+                if ruta is None:
+                    item.estado = 'duplicado'
+                    item.duplicados = 1
+                    db.session.commit()
+                    _eliminar(item.ruta)
+                    continue
+            item.archivo_id = archivo.id
+            item.estado = 'procesando'
+            por_fuente[(item.ruta, item.miembro)] = item
+        except Exception as exc:
+            _marcar_error(item.id, exc)
+    # Un solo commit para todo el lote (uno por archivo domina con miles)
+    db.session.commit()
+
+    # 2) Parsear en paralelo (los miembros de un ZIP directo del archivo, con su
+    # hash); las facturas se insertan juntas en una transacción
+    lecturas = []
+    errores = []
+    hashes = {}
+    workers = current_app.config.get('UPLOAD_PARSE_WORKERS') or None
+    for fuente, lectura in leer_facturas_en_paralelo(list(por_fuente), trabajo.tipo_archivo, max_workers=workers):
+        item = por_fuente[fuente]
+        if lectura.error is not None:
+            errores.append((item, lectura.error))
+            continue
+        lecturas.append((item, lectura.datos))
+        if lectura.file_hash is not None:
+            hashes[item.id] = lectura.file_hash
+
+    # Miembros idénticos a un archivo ya registrado
+    registrados = hashes_registrados(set(hashes.values()))
+    repetidos = [item for item, _ in lecturas if hashes.get(item.id) in registrados]
+    lecturas = [(item, datos) for item, datos in lecturas if hashes.get(item.id) not in registrados]
+
+    try:
+        archivos = {}
+        for item, _ in lecturas:
+            if item.archivo_id not in archivos:
+                archivos[item.archivo_id] = db.session.get(Archivo, item.archivo_id)
+        resultados = guardar_facturas([(archivos[item.archivo_id], datos) for item, datos in lecturas])
+        for (item, _), resultado in zip(lecturas, resultados):
+            item.filas = resultado['facturas'] + resultado['duplicates']
+            item.insertados = resultado['facturas']
+            item.duplicados = resultado['duplicates']
+            item.detalles = resultado['detalles']
+            item.estado = 'completado'
+        for item in repetidos:
+            item.estado = 'duplicado'
+            item.duplicados = 1
+        for item, error in errores:
+            item.estado = 'error'
+            item.error = error
+        db.session.commit()
+    except Exception as exc:
+        # Sin facturas a medias: todo el lote queda con error
+        db.session.rollback()
+        errores = [(item, str(exc)) for item in por_fuente.values()]
+        for item, error in errores:
+            item.estado = 'error'
+            item.error = error
+        db.session.commit()
+    for item, _ in errores:
+        _eliminar_item(item)
+    _eliminar_zips_sin_cargas(trabajo)
+
+    # Si el lote no produjo facturas nuevas, quitar registro de archivo-lote para evitar ruido.
+    if lote is not None and not any(item.insertados for item in trabajo.archivos):
+        trabajo.archivo_lote_id = None
+        for item in trabajo.archivos:
+            if item.archivo_id == lote.id:
+                item.archivo_id = None
+        db.session.delete(lote)
+        db.session.commit()
+
+
+def _registrar_miembro(trabajo, item, file_hash, temporal, registrados):
+    """
+    Extrae a `temporal` el miembro de ZIP de `item` para su parser y, si aún
+    no tiene Archivo, lo registra con `file_hash` (se calcula si es None).
+    Devuelve la ruta extraída, o None si el hash está en `registrados` (que
+    se actualiza con los nuevos).
+    """
+    if item.archivo_id is None:
+        if file_hash is None:
+            file_hash = hash_miembro_zip(item.ruta, item.miembro)
+        if file_hash in registrados:
+            return None
+        registrados.add(file_hash)
+
+    # Una carpeta por item conserva el nombre original (lo usan Archivo y algunos parsers)
+    carpeta = os.path.join(temporal, str(item.id))
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, secure_filename(os.path.basename(item.miembro)) or 'archivo')
+    extraer_miembro_zip(item.ruta, item.miembro, ruta)
+    if item.archivo_id is None:
+        ruta, archivo = register_file(ruta, trabajo.tipo_archivo, user_id=trabajo.user_id, file_hash=file_hash)
+        if ruta is None:
+            return None
+        item.archivo_id = archivo.id
+    return ruta
+
+
+def _procesar_movimientos(trabajo, items):
+    # Los miembros de un ZIP se leen del archivo comprimido: solo los nuevos se
+    # extraen, a una carpeta temporal, porque los parsers trabajan con rutas
+    miembros = [item for item in items if item.miembro is not None]
+    temporal = tempfile.mkdtemp(prefix='importacion_') if miembros else None
+    try:
+        _cargar_movimientos(trabajo, items, miembros, temporal)
+    finally:
+        if temporal is not None:
+            shutil.rmtree(temporal, ignore_errors=True)
+    _eliminar_zips_sin_cargas(trabajo)
+
+
+def _cargar_movimientos(trabajo, items, miembros, temporal):
+    # 1) Registrar y descartar duplicados antes de leer nada; los hashes de
+    # los miembros de ZIP se comparan en una sola consulta
+    hashes = {}
+    for item in miembros:
+        if item.archivo_id is None:
+            try:
+                hashes[item.id] = hash_miembro_zip(item.ruta, item.miembro)
+            except Exception:
+                # `_registrar_miembro` lo vuelve a intentar y registra el error
+                continue
+    registrados = hashes_registrados(set(hashes.values()))
+
+    por_ruta = {}
+    for item in items:
+        try:
+            if item.miembro is not None:
+                ruta = _registrar_miembro(trabajo, item, hashes.get(item.id), temporal, registrados)
+                if ruta is None:
+                    item.estado = 'duplicado'
+                    item.duplicados = 1
+                    db.session.commit()
+                    continue
+                db.session.commit()
+                por_ruta[ruta] = item.id
+                continue
+            if item.archivo_id is None:
+                ruta, archivo = register_file(item.ruta, trabajo.tipo_archivo, user_id=trabajo.user_id)
+                if ruta is None:
+                    item.estado = 'duplicado'
+                    item.duplicados = 1
+                    db.session.commit()
+                    _eliminar(item.ruta)
+                    continue
+                item.archivo_id = archivo.id
+                db.session.commit()
+            por_ruta[item.ruta] = item.id
+        except Exception as exc:
+            _marcar_error(item.id, exc)
+
+    # 2) Leer en paralelo y persistir desde este hilo (único escritor)
+    cargados = []
+    workers = current_app.config.get('UPLOAD_PARSE_WORKERS') or None
+    for ruta in leer_en_paralelo(list(por_ruta), trabajo.tipo_archivo, max_workers=workers):
+        item = db.session.get(TrabajoImportacionArchivo, por_ruta[ruta])
+        item.estado = 'procesando'
+        db.session.commit()
+        try:
+            archivo = db.session.get(Archivo, item.archivo_id)
+            # Duplicados: movimientos ya cargados desde otro archivo (misma huella)
+            insertados, duplicados = load_movements(ruta, archivo, trabajo.tipo_archivo, clasificar=False)
+            item.filas = insertados + duplicados
+            item.insertados = insertados
+            item.duplicados = duplicados
+            item.estado = 'completado'
+            db.session.commit()
+            cargados.append(item.archivo_id)
+        except Exception as exc:
+            _marcar_error(item.id, exc)
+
+    # 3) Clasificar una sola vez lo cargado
+    clasificar_archivos(cargados)
+
+
+def procesar_trabajo(trabajo_id):
+    """Procesa los archivos pendientes de un trabajo (requiere app context)."""
+    trabajo = db.session.get(TrabajoImportacion, trabajo_id)
+    if trabajo is None or trabajo.estado in ESTADOS_FINALES:
+        return
+
+    trabajo.estado = 'procesando'
+    trabajo.iniciado = trabajo.iniciado or datetime.utcnow()
+    for item in trabajo.archivos:
+        # Un archivo que quedó a medias (p.e. reinicio del servidor) no se reintenta
+        if item.estado == 'procesando':
+            item.estado = 'error'
+            item.error = 'Procesamiento interrumpido.'
+    db.session.commit()
+
+    items = [item for item in trabajo.archivos if item.estado == 'pendiente']
+    try:
+        if trabajo.tipo_archivo == 'factura-fel-xml':
+            _procesar_facturas(trabajo, items)
+        else:
+            _procesar_movimientos(trabajo, items)
+    except Exception as exc:
+        db.session.rollback()
+        trabajo = db.session.get(TrabajoImportacion, trabajo_id)
+        trabajo.estado = 'error'
+        trabajo.mensaje = str(exc)
+    else:
+        trabajo.estado = 'completado'
+    trabajo.finalizado = datetime.utcnow()
+    db.session.commit()
+
+
+def progreso_trabajo(trabajo):
+    """Resumen serializable del trabajo y de cada archivo."""
+    archivos = [
+        {
+            'nombre': item.nombre,
+            'estado': item.estado,
+            'filas': item.filas,
+            'insertados': item.insertados,
+            'duplicados': item.duplicados,
+            'detalles': item.detalles,
+            'error': item.error,
+        }
+        for item in trabajo.archivos
+    ]
+    return {
+        'id': trabajo.id,
+        'tipo_archivo': trabajo.tipo_archivo,
+        'estado': trabajo.estado,
+        'mensaje': trabajo.mensaje,
+        'creado': trabajo.creado.isoformat() if trabajo.creado else None,
+        'finalizado': trabajo.finalizado.isoformat() if trabajo.finalizado else None,
+        'totales': {
+            'archivos': len(archivos),
+            'terminados': sum(1 for a in archivos if a['estado'] in ESTADOS_FINALES),
+            'filas': sum(a['filas'] for a in archivos),
+            'insertados': sum(a['insertados'] for a in archivos),
+            'duplicados': sum(a['duplicados'] for a in archivos),
+            'detalles': sum(a['detalles'] for a in archivos),
+            'errores': sum(1 for a in archivos if a['estado'] == 'error'),
+        },
+        'archivos': archivos,
+    }
+
+
+def _worker_loop(application):
+    with application.app_context():
+        # Retomar trabajos que quedaron sin terminar en una ejecución anterior
+        try:
+            pendientes = TrabajoImportacion.query.filter(
+                TrabajoImportacion.estado.in_(('pendiente', 'procesando'))
+            ).order_by(TrabajoImportacion.id).all()
+            for trabajo in pendientes:
+                encolar_trabajo(trabajo.id)
+        except Exception as exc:
+            application.logger.exception('No se pudieron retomar las importaciones pendientes: %s', exc)
+
+    while True:
+        trabajo_id = _cola.get()
+        try:
+            with application.app_context():
+                procesar_trabajo(trabajo_id)
+        except Exception as exc:
+            application.logger.exception('Falló la importación %s: %s', trabajo_id, exc)
+        finally:
+            _cola.task_done()
+
+
+def start_import_worker(app):
+    global _worker_started
+
+    with _worker_lock:
+        if _worker_started:
+            return
+        _worker_started = True
+
+    worker = threading.Thread(
+        target=_worker_loop,
+        args=(app,),
+        name='import-worker',
+        daemon=True,
+    )
+    worker.start()
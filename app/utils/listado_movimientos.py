@@ -0,0 +1,156 @@
+"""Paginación por clave y totales en caché para el listado de movimientos.
+
+El listado se ordena por (fecha, id) descendente, con los movimientos sin
+fecha al final. En lugar de OFFSET, cada página se lee a partir del último
+movimiento de la anterior (`cursor` en los enlaces Anterior/Siguiente), de modo
+que el costo de una página no crece con su número. Solo al saltar a un número
+de página sin cursor se ubica su inicio con un OFFSET sobre (fecha, id), que
+recorre el índice sin leer las filas.
+
+El número de movimientos y las sumas de débitos y créditos del filtro se
+calculan en una sola consulta y se guardan en `cache_totales` con la versión de
+los datos en la clave, así que recorrer las páginas no los recalcula.
+"""
+
+from datetime import datetime
+
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import and_, case, func, or_
+
+from ..models import Movimiento
+from .data_version import (
+    CLAVE_CATALOGOS, CLAVE_MOVIMIENTOS, CLAVE_MOVIMIENTOS_TODOS, clave_movimientos_usuario, versiones_datos,
+)
+from .lru import LRU
+
+# Combinaciones de filtros cuyos totales se conservan en memoria
+_CAPACIDAD_CACHE = 128
+
+cache_totales = LRU(_CAPACIDAD_CACHE)
+
+
+def version_listado(user_id):
+    """
+    Versiones de los datos del listado de `user_id` (None = todos los usuarios):
+    sus movimientos y los catálogos por los que se puede filtrar.
+    """
+    if user_id is None:
+        return versiones_datos(CLAVE_MOVIMIENTOS, CLAVE_CATALOGOS)
+    return versiones_datos(clave_movimientos_usuario(user_id), CLAVE_MOVIMIENTOS_TODOS, CLAVE_CATALOGOS)
+
+
+def totales_movimientos(query, clave):
+    """
+    (cantidad, suma de débitos, suma de créditos) de `query` en una consulta.
+    `clave` identifica el filtro (incluida `version_listado`) en `cache_totales`.
+    """
+    def calcular():
+        cantidad, debitos, creditos = query.order_by(None).with_entities(
+            func.count(Movimiento.id),
+            func.coalesce(func.sum(case((Movimiento.tipo == 'debito', Movimiento.monto), else_=0)), 0),
+            func.coalesce(func.sum(case((Movimiento.tipo == 'credito', Movimiento.monto), else_=0)), 0),
+        ).one()
+        return cantidad, debitos or 0, creditos or 0
+    return cache_totales.obtener(clave, calcular)
+
+
+def codificar_cursor(mov):
+    """Cursor 'AAAA-MM-DD_id' (o '_id' sin fecha) de un movimiento."""
+    return f"{mov.fecha.isoformat() if mov.fecha else ''}_{mov.id}"
+
+
+def decodificar_cursor(cursor):
+    """(fecha o None, id) de un cursor, o None si no es válido."""
+    try:
+        fecha, mov_id = (cursor or '').rsplit('_', 1)
+        return (datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None), int(mov_id)
+    except ValueError:
+        return None
+
+
+def _tramos_despues(clave):
+    """
+    Condiciones y orden para leer, en orden descendente, los movimientos
+    posteriores a `clave` (None = desde el inicio): primero los que tienen fecha
+    y luego los que no, cada tramo sobre su índice.
+    """
+    descendente = (Movimiento.fecha.desc(), Movimiento.id.desc())
+    sin_fecha = (Movimiento.id.desc(),)
+    if clave is None:
+        return [(Movimiento.fecha.isnot(None), descendente), (Movimiento.fecha.is_(None), sin_fecha)]
+    fecha, mov_id = clave
+    if fecha is None:
+        return [(and_(Movimiento.fecha.is_(None), Movimiento.id < mov_id), sin_fecha)]
+    return [
+        (and_(Movimiento.fecha <= fecha, or_(Movimiento.fecha < fecha, Movimiento.id < mov_id)), descendente),
+        (Movimiento.fecha.is_(None), sin_fecha),
+    ]
+
+
+def _tramos_antes(clave):
+    """Como `_tramos_despues`, pero hacia atrás (orden ascendente) desde `clave`."""
+    ascendente = (Movimiento.fecha.asc(), Movimiento.id.asc())
+    fecha, mov_id = clave
+    if fecha is None:
+        return [
+            (and_(Movimiento.fecha.is_(None), Movimiento.id > mov_id), (Movimiento.id.asc(),)),
+            (Movimiento.fecha.isnot(None), ascendente),
+        ]
+    return [(and_(Movimiento.fecha >= fecha, or_(Movimiento.fecha > fecha, Movimiento.id > mov_id)), ascendente)]
+
+
+def _leer(query, tramos, limite):
+    filas = []
+    for condicion, orden in tramos:
+        if len(filas) >= limite:
+            break
+        filas.extend(query.filter(condicion).order_by(*orden).limit(limite - len(filas)).all())
+    return filas
+
+
+class PaginacionMovimientos(Pagination):
+    """
+    `Pagination` de Flask-SQLAlchemy con lectura por clave. Además de lo usual
+    expone `cursor_anterior` y `cursor_siguiente` para los enlaces.
+
+    Argumentos: `query` (filtrada, sin orden), `total` ya calculado y `cursor`
+    del movimiento que precede a la página (se ignora en la página 1).
+    """
+
+    def _query_items(self):
+        query = self._query_args['query']
+        cursor = self._query_args.get('cursor')
+
+        clave = None
+        if self.page > 1:
+            clave = decodificar_cursor(cursor)
+            if clave is None:
+                # Sin cursor: ubicar el último movimiento de la página previa
+                previo = (
+                    query.with_entities(Movimiento.fecha, Movimiento.id)
+                    .order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+                    .offset((self.page - 1) * self.per_page - 1)
+                    .limit(1)
+                    .first()
+                )
+                if previo is None:
+                    self.cursor_anterior = self.cursor_siguiente = None
+                    return []
+                clave = (previo.fecha, previo.id)
+
+        items = _leer(query, _tramos_despues(clave), self.per_page)
+        self.cursor_siguiente = codificar_cursor(items[-1]) if items else None
+
+        # Cursor de la página anterior: el movimiento que precede a su inicio,
+        # `per_page` posiciones antes del que precede a esta página
+        self.cursor_anterior = None
+        if self.page > 2 and clave is not None and items:
+            previos = _leer(
+                query.with_entities(Movimiento.fecha, Movimiento.id), _tramos_antes(clave), self.per_page,
+            )
+            if len(previos) == self.per_page:
+                self.cursor_anterior = codificar_cursor(previos[-1])
+        return items
+
+    def _query_count(self):
+        return self._query_args['total']
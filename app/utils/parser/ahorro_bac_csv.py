@@ -2,8 +2,8 @@ import csv
 from datetime import datetime
 
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .movimiento_utils import guardar_movimientos
 
 
 def _parse_float(value):
@@ -148,24 +148,10 @@ def load_movements_ahorro_bac_csv(filepath, archivo_obj):
             'descripcion': descripcion,
             'numero_documento': referencia,
             'monto': monto,
+            'moneda': moneda,
             'tipo': tipo,
         })
 
-    for mov in movimientos:
-        m = Movimiento(
-            fecha=mov['fecha'],
-            cuenta_id=cuenta.id,
-            descripcion=mov['descripcion'],
-            numero_documento=mov['numero_documento'],
-            monto=mov['monto'],
-            moneda=moneda,
-            tipo=mov['tipo'],
-            archivo_id=archivo_obj.id,
-        )
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            m.user_id = archivo_obj.user_id
-        db.session.add(m)
-
     # Saldo final de cuenta por balance final o saldo en libros
     if movimientos:
         # intentamos usar último balance de detalle si existe
@@ -187,5 +173,5 @@ def load_movements_ahorro_bac_csv(filepath, archivo_obj):
             cuenta.saldo = saldo_libros
         db.session.add(cuenta)
 
-    db.session.commit()
-    return len(movimientos)
+    # Inserta los movimientos en bloque (el commit incluye el saldo de la cuenta)
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
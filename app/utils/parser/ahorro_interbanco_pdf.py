@@ -2,11 +2,14 @@
 Parser para PDFs de cuentas de ahorro de Interbanco.
 """
 
-import pdfplumber
 import re
 from datetime import datetime
-from app.models import Movimiento, Cuenta, db
-from app.utils.classifier import clasificar_movimientos
+from app.models import Cuenta, db
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
 
 
 def parse_ahorro_interbanco_pdf_file(filepath, archivo_obj):
@@ -22,12 +25,10 @@ def parse_ahorro_interbanco_pdf_file(filepath, archivo_obj):
     """
     
     # --- 1) Extraer texto del PDF ---
-    with pdfplumber.open(filepath) as pdf:
-        text_content = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_content += page_text + "\n"
+    text_content = ""
+    for page_text in texto_paginas_pdf(filepath):
+        if page_text:
+            text_content += page_text + "\n"
 
     if not text_content.strip():
         raise ValueError("No se pudo extraer texto del PDF")
@@ -96,29 +97,9 @@ def parse_ahorro_interbanco_pdf_file(filepath, archivo_obj):
     archivo_obj.titular = titular or 'TITULAR NO IDENTIFICADO'
     archivo_obj.moneda = 'GTQ'
 
-    # Buscar cuenta existente (con y sin guiones)
-    cuenta = None
-    numero_sin_guiones = numero_cuenta.replace('-', '')
-    
-    cuentas_similares = Cuenta.query.filter(
-        (Cuenta.numero_cuenta == numero_cuenta) |
-        (Cuenta.numero_cuenta == numero_sin_guiones)
-    ).all()
-    
-    if cuentas_similares:
-        # Buscar coincidencia exacta primero
-        for cuenta_existente in cuentas_similares:
-            if cuenta_existente.numero_cuenta == numero_cuenta:
-                cuenta = cuenta_existente
-                break
-        
-        # Si no hay coincidencia exacta, buscar sin guiones
-        if not cuenta:
-            for cuenta_existente in cuentas_similares:
-                if cuenta_existente.numero_cuenta.replace('-', '') == numero_sin_guiones:
-                    cuenta = cuenta_existente
-                    break
-    
+    # Buscar cuenta existente (número principal o alternativo, con o sin guiones)
+    cuenta = Cuenta.find_by_numero(numero_cuenta)
+
     if not cuenta:
         cuenta = Cuenta(
             banco=archivo_obj.banco,
@@ -134,7 +115,7 @@ def parse_ahorro_interbanco_pdf_file(filepath, archivo_obj):
         db.session.commit()
 
     # --- 4) Procesar movimientos ---
-    count = 0
+    movimientos = []
     saldo_anterior_movimiento = None
     
     for line in lines:
@@ -220,28 +201,14 @@ def parse_ahorro_interbanco_pdf_file(filepath, archivo_obj):
         saldo_anterior_movimiento = saldo_actual
         
         # Crear movimiento
-        mov = Movimiento(
-            fecha=fecha_movimiento,
-            descripcion=desc,
-            lugar=None,
-            numero_documento=numero_doc,
-            monto=monto,
-            moneda='GTQ',  # Siempre GTQ en Interbanco
-            tipo=tipo,
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-            
-        db.session.add(mov)
-        count += 1
-
-    db.session.commit()
-
-    # --- 5) Clasificar movimientos nuevos ---
-    clasificar_movimientos()
+        movimientos.append({
+            'fecha': fecha_movimiento,
+            'descripcion': desc,
+            'lugar': None,
+            'numero_documento': numero_doc,
+            'monto': monto,
+            'moneda': 'GTQ',  # Siempre GTQ en Interbanco
+            'tipo': tipo,
+        })
 
-    return count
\ No newline at end of file
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
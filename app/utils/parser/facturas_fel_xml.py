@@ -47,28 +47,67 @@ def _frases_resumen(frases):
     return ', '.join(partes) if partes else None
 
 
-def parse_factura_fel_xml(filepath):
+_NS = {
+    'dte': 'http://www.sat.gob.gt/dte/fel/0.2.0',
+    'cfe': 'http://www.sat.gob.gt/face2/ComplementoFacturaEspecial/0.1.0',
+}
+
+_DATOS_EMISION = f"{{{_NS['dte']}}}DatosEmision"
+_CERTIFICACION = f"{{{_NS['dte']}}}Certificacion"
+
+
+def _leer_nodos(fuente):
+    """
+    Recorre el XML con `iterparse` y devuelve (DatosEmision, Certificacion),
+    los primeros de cada uno en el documento (None si falta alguno).
+
+    Solo esos dos subárboles se conservan: el resto (firma, adendas) se
+    descarta al cerrarse, y la lectura termina en cuanto ambos están
+    completos, sin recorrer la firma que suele ir al final.
+    """
+    datos_emision = None
+    cert = None
+    abiertos = 0
+    for evento, nodo in ET.iterparse(fuente, events=('start', 'end')):
+        capturar = (
+            (nodo.tag == _DATOS_EMISION and datos_emision is None)
+            or (nodo.tag == _CERTIFICACION and cert is None)
+        )
+        if evento == 'start':
+            if capturar or abiertos:
+                abiertos += 1
+            continue
+        if abiertos:
+            abiertos -= 1
+            if capturar and not abiertos:
+                if nodo.tag == _DATOS_EMISION:
+                    datos_emision = nodo
+                else:
+                    cert = nodo
+                if datos_emision is not None and cert is not None:
+                    break
+        else:
+            nodo.clear()
+    return datos_emision, cert
+
+
+def parse_factura_fel_xml(fuente):
     """
     Parsea un XML FEL (GTDocumento) y retorna un dict con:
     - factura: campos generales
     - detalles: lista de items de la factura
-    """
-    tree = ET.parse(filepath)
-    root = tree.getroot()
 
-    ns = {
-        'dte': 'http://www.sat.gob.gt/dte/fel/0.2.0',
-        'cfe': 'http://www.sat.gob.gt/face2/ComplementoFacturaEspecial/0.1.0',
-    }
+    `fuente` es una ruta o un archivo abierto en modo binario.
+    """
+    ns = _NS
 
-    datos_emision = root.find('.//dte:DatosEmision', ns)
+    datos_emision, cert = _leer_nodos(fuente)
     if datos_emision is None:
         raise ValueError('No se encontró el nodo DatosEmision en el XML FEL.')
 
     datos_generales = datos_emision.find('dte:DatosGenerales', ns)
     emisor = datos_emision.find('dte:Emisor', ns)
     receptor = datos_emision.find('dte:Receptor', ns)
-    cert = root.find('.//dte:Certificacion', ns)
     numero_autorizacion = cert.find('dte:NumeroAutorizacion', ns) if cert is not None else None
 
     total_impuesto_iva = None
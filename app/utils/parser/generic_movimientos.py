@@ -1,9 +1,8 @@
 import re
 from datetime import datetime
 import pandas as pd
-from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .movimiento_utils import MovimientosGuardados, guardar_movimientos
 
 
 def load_movements_generic(filepath, archivo_obj):
@@ -13,7 +12,7 @@ def load_movements_generic(filepath, archivo_obj):
             cuenta, titular, moneda_cuenta, fecha, descripcion, monto, tipo, moneda, numero_documento (opcional)
         - tipo: debito/cargo -> monto negativo; credito/abono/pago -> monto positivo
     - moneda de movimiento opcional; si falta se usa moneda_cuenta
-    Devuelve la cantidad de movimientos cargados.
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     ext = filepath.lower().split('.')[-1]
     if ext in ('xlsx', 'xls'):
@@ -27,7 +26,7 @@ def load_movements_generic(filepath, archivo_obj):
         raise ValueError('Extensión no soportada para genérico (use .xlsx o .csv).')
 
     if df.empty:
-        return 0
+        return MovimientosGuardados(0, 0)
 
     def safe_str(val):
         return str(val).strip() if pd.notna(val) else ''
@@ -100,7 +99,7 @@ def load_movements_generic(filepath, archivo_obj):
     temp_obj.moneda = moneda
     temp_obj.user_id = getattr(archivo_obj, 'user_id', None)
 
-    count = 0
+    movimientos = []
     for _, row in df.iterrows():
         cuenta_num = safe_str(row.get('cuenta'))
         titular_row = safe_str(row.get('titular')) or titular
@@ -130,20 +129,14 @@ def load_movements_generic(filepath, archivo_obj):
         monto = abs(monto_val) if is_credit else -abs(monto_val)
         tipo_mov = 'credito' if is_credit else 'debito'
 
-        mov = Movimiento(
-            fecha=fecha,
-            descripcion=desc,
-            numero_documento=numero_doc,
-            monto=monto,
-            moneda=moneda_mov or 'GTQ',
-            tipo=tipo_mov,
-            cuenta_id=cuenta.id if cuenta else None,
-            archivo_id=archivo_obj.id
-        )
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-        count += 1
-
-    db.session.commit()
-    return count
\ No newline at end of file
+        movimientos.append({
+            'fecha': fecha,
+            'descripcion': desc,
+            'numero_documento': numero_doc,
+            'monto': monto,
+            'moneda': moneda_mov or 'GTQ',
+            'tipo': tipo_mov,
+            'cuenta_id': cuenta.id if cuenta else None,
+        })
+
+    return guardar_movimientos(movimientos, archivo_obj)
@@ -0,0 +1,123 @@
+"""Lecturas de archivos usadas por los parsers (texto/tablas de PDF, Excel, HTML).
+
+Son la parte costosa en CPU de un parser y no tocan la base de datos, así que
+pueden ejecutarse en otro proceso con `extraer_lecturas`. Su resultado se
+precarga con `precargar` y, cuando el parser pide la misma lectura del mismo
+archivo, la recibe sin volver a leer. Sin precarga, cada función lee el
+archivo directamente.
+
+Un parser declara las lecturas que hará en la constante de módulo `LECTURAS`:
+una tupla de `(nombre_lector, kwargs)`.
+"""
+
+import threading
+
+
+# Ajustes de pdfplumber para tablas delimitadas por líneas (formato GYT/Nexa)
+TABLA_POR_LINEAS = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+}
+
+# (lector, filepath, kwargs) -> resultado leído en un proceso de trabajo
+_precargado = {}
+_lock = threading.Lock()
+
+
+def _clave(lector, filepath, kwargs):
+    return (lector, filepath, repr(sorted(kwargs.items())))
+
+
+def _leer_texto_paginas_pdf(filepath):
+    import pdfplumber
+
+    with pdfplumber.open(filepath) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def _leer_tablas_paginas_pdf(filepath, ajustes=None):
+    import pdfplumber
+
+    with pdfplumber.open(filepath) as pdf:
+        return [page.extract_table(ajustes or TABLA_POR_LINEAS) for page in pdf.pages]
+
+
+def _leer_excel(filepath, **kwargs):
+    import pandas as pd
+
+    return pd.read_excel(filepath, **kwargs)
+
+
+def _leer_html(filepath, **kwargs):
+    import pandas as pd
+
+    return pd.read_html(filepath, **kwargs)
+
+
+_LECTORES = {
+    'texto_paginas_pdf': _leer_texto_paginas_pdf,
+    'tablas_paginas_pdf': _leer_tablas_paginas_pdf,
+    'leer_excel': _leer_excel,
+    'leer_html': _leer_html,
+}
+
+
+def _leer(lector, filepath, **kwargs):
+    with _lock:
+        clave = _clave(lector, filepath, kwargs)
+        if clave in _precargado:
+            # Cada lectura precargada se consume una sola vez
+            return _precargado.pop(clave)
+    return _LECTORES[lector](filepath, **kwargs)
+
+
+def texto_paginas_pdf(filepath):
+    """Texto de cada página del PDF ('' si la página no tiene texto)."""
+    return _leer('texto_paginas_pdf', filepath)
+
+
+def tablas_paginas_pdf(filepath, ajustes=None):
+    """Primera tabla de cada página del PDF (None si la página no tiene)."""
+    kwargs = {'ajustes': ajustes} if ajustes else {}
+    return _leer('tablas_paginas_pdf', filepath, **kwargs)
+
+
+def leer_excel(filepath, **kwargs):
+    """`pd.read_excel` con precarga."""
+    return _leer('leer_excel', filepath, **kwargs)
+
+
+def leer_html(filepath, **kwargs):
+    """`pd.read_html` con precarga."""
+    return _leer('leer_html', filepath, **kwargs)
+
+
+def extraer_lecturas(filepath, lecturas):
+    """
+    Ejecuta las `lecturas` declaradas por un parser y devuelve sus resultados
+    indexados por clave. Pensada para un ProcessPoolExecutor: recibe y devuelve
+    solo objetos serializables y no usa la base de datos.
+
+    Las lecturas que fallan se omiten; el parser las repetirá y reportará el
+    error en el proceso principal.
+    """
+    resultados = {}
+    for lector, kwargs in lecturas:
+        try:
+            resultados[_clave(lector, filepath, kwargs)] = _LECTORES[lector](filepath, **kwargs)
+        except Exception:
+            continue
+    return resultados
+
+
+def precargar(resultados):
+    """Deja disponibles los resultados de `extraer_lecturas` para los parsers."""
+    with _lock:
+        _precargado.update(resultados)
+
+
+def descartar(filepath):
+    """Elimina las lecturas precargadas de `filepath` que no se llegaron a usar."""
+    with _lock:
+        for clave in [c for c in _precargado if c[1] == filepath]:
+            del _precargado[clave]
@@ -1,9 +1,14 @@
 import re
-import pdfplumber
 import pandas as pd
 
 from ... import db
-from ...models import Movimiento, Cuenta
+from ...models import Cuenta
+from .lectura import tablas_paginas_pdf, texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}), ('tablas_paginas_pdf', {}))
+
 
 def load_movements_monet_aho_gyt_pdf(filepath, archivo_obj):
     """
@@ -11,14 +16,12 @@ def load_movements_monet_aho_gyt_pdf(filepath, archivo_obj):
     1) Extrae y parsea el encabezado (primeras ~8 líneas).
     2) Extrae la tabla de movimientos de cada página con pdfplumber.
     3) Concatena, renombra "Crédito/Débito" a 'monto', normaliza y guarda cada Movimiento en la BD.
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # --- 1) Extraer líneas completas para el encabezado ---
-    with pdfplumber.open(filepath) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            lines.extend(text.split('\n'))
+    lines = []
+    for text in texto_paginas_pdf(filepath):
+        lines.extend(text.split('\n'))
 
     header_info = {}
     for line in lines[:8]:
@@ -77,14 +80,9 @@ def load_movements_monet_aho_gyt_pdf(filepath, archivo_obj):
 
     # --- 5) Extraer y concatenar todas las tablas de movimientos ---
     tables = []
-    with pdfplumber.open(filepath) as pdf:
-        for page in pdf.pages:
-            tbl = page.extract_table({
-                "vertical_strategy":   "lines",
-                "horizontal_strategy": "lines"
-            })
-            if tbl and len(tbl) > 1:
-                tables.append(pd.DataFrame(tbl[1:], columns=tbl[0]))
+    for tbl in tablas_paginas_pdf(filepath):
+        if tbl and len(tbl) > 1:
+            tables.append(pd.DataFrame(tbl[1:], columns=tbl[0]))
 
     if not tables:
         raise ValueError("No se detectó la tabla de movimientos en el PDF.")
@@ -120,24 +118,8 @@ def load_movements_monet_aho_gyt_pdf(filepath, archivo_obj):
     df["descripcion"] = df["descripcion"].fillna("")
     df["lugar"]       = df["lugar"].fillna("")
     df["documento"]   = df["documento"].fillna("")
+    df["tipo"]        = tipo_por_signo(df["monto"])
+    df = df.rename(columns={"documento": "numero_documento"})
 
-    # --- 8) Insertar cada movimiento en la BD ---
-    for _, row in df.iterrows():
-        mov = Movimiento(
-            fecha=row["fecha"],
-            descripcion=row["descripcion"],
-            lugar=row["lugar"],
-            numero_documento=row["documento"],
-            monto=row["monto"],
-            moneda=row["moneda"],
-            tipo="debito" if row["monto"] < 0 else "credito",
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-    db.session.commit()
-
-    return len(df)
+    # --- 8) Insertar los movimientos en bloque ---
+    return guardar_movimientos(df, archivo_obj, cuenta)
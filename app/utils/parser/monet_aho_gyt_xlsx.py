@@ -1,14 +1,17 @@
 from datetime import datetime
 import pandas as pd
 from ... import db
-from ...models import Archivo, Movimiento
 from .cuenta_utils import get_or_create_cuenta
-from ..classifier import clasificar_movimientos
+from .lectura import leer_excel
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('leer_excel', {'sheet_name': 0, 'header': None}),)
 
 def load_movements_monet_aho_gyt_xlsx(filepath, archivo_obj):
 
     # Leer primera hoja completa sin encabezados
-    df = pd.read_excel(filepath, sheet_name=0, header=None)
+    df = leer_excel(filepath, sheet_name=0, header=None)
 
     # Extraer metadatos del encabezado (filas 0-8)
     header_info = extract_header_monet_aho_gyt_xlsx(df)
@@ -39,27 +42,10 @@ def load_movements_monet_aho_gyt_xlsx(filepath, archivo_obj):
     cuenta = get_or_create_cuenta(archivo_obj)
 
     movimientos = extract_movements_monet_aho_gyt_xlsx(df, archivo_obj)
-    for idx, mov in movimientos.iterrows():
-
-        mg = Movimiento(
-            fecha=mov['fecha'],
-            descripcion=mov['descripcion'],
-            lugar=mov['lugar'],
-            numero_documento=mov['documento'],
-            monto=mov['monto'],
-            moneda=mov['moneda'],
-            tipo='debito' if mov['monto'] < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mg.user_id = archivo_obj.user_id
-        db.session.add(mg)
-
-    db.session.commit()
+    movimientos = movimientos.rename(columns={'documento': 'numero_documento'})
+    movimientos['tipo'] = tipo_por_signo(movimientos['monto'])
 
-    return len(movimientos)
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
 
 def extract_header_monet_aho_gyt_xlsx(df):
     """
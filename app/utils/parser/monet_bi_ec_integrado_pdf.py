@@ -13,11 +13,13 @@ import calendar
 import re
 from datetime import datetime
 
-import pdfplumber
-
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
 
 
 _MESES = {
@@ -65,8 +67,7 @@ def _to_float(amount_text: str) -> float:
 
 
 def load_movements_monet_bi_ec_integrado_pdf(filepath, archivo_obj):
-    with pdfplumber.open(filepath) as pdf:
-        page_texts = [page.extract_text() or "" for page in pdf.pages]
+    page_texts = texto_paginas_pdf(filepath)
 
     if not any(page_texts):
         raise ValueError("No se pudo extraer texto del PDF")
@@ -114,7 +115,7 @@ def load_movements_monet_bi_ec_integrado_pdf(filepath, archivo_obj):
 
     cuenta = get_or_create_cuenta(archivo_obj)
 
-    count = 0
+    movimientos = []
     prev_balance = None
 
     # Parsear páginas en orden para respetar secuencia de saldos y cambios de mes.
@@ -173,24 +174,15 @@ def load_movements_monet_bi_ec_integrado_pdf(filepath, archivo_obj):
             last_day = calendar.monthrange(current_year, current_month)[1]
             fecha = datetime(current_year, current_month, min(dia, last_day)).date()
 
-            mov = Movimiento(
-                fecha=fecha,
-                descripcion=descripcion,
-                lugar=None,
-                numero_documento=numero_doc,
-                monto=monto,
-                moneda="GTQ",
-                tipo=tipo,
-                cuenta_id=cuenta.id,
-                archivo_id=archivo_obj.id,
-            )
-
-            if getattr(archivo_obj, "user_id", None) is not None:
-                mov.user_id = archivo_obj.user_id
-
-            db.session.add(mov)
-            count += 1
+            movimientos.append({
+                'fecha': fecha,
+                'descripcion': descripcion,
+                'lugar': None,
+                'numero_documento': numero_doc,
+                'monto': monto,
+                'moneda': "GTQ",
+                'tipo': tipo,
+            })
             prev_balance = saldo
 
-    db.session.commit()
-    return count
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
@@ -1,10 +1,13 @@
 import re
-import pdfplumber
 from datetime import datetime
 from ... import db
-from ...models import Archivo, Movimiento, Cuenta
 from .cuenta_utils import get_or_create_cuenta
-from ..classifier import clasificar_movimientos
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
+
 
 def load_movements_bi_monet_email_pdf(filepath, archivo_obj):
     """
@@ -15,15 +18,13 @@ def load_movements_bi_monet_email_pdf(filepath, archivo_obj):
          - Día, documento, descripción, débito, crédito, saldo.
          - Determina tipo (débito/crédito) según la columna correspondiente.
          - Moneda por defecto GTQ (Quetzales).
-      4) Persiste movimientos y clasificarlos.
-    Devuelve el número de movimientos agregados.
+      4) Persiste movimientos (la clasificación la aplica `load_movements`).
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # --- 1) Extraer texto por líneas ---
-    with pdfplumber.open(filepath) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            lines.extend(text.split('\n'))
+    lines = []
+    for text in texto_paginas_pdf(filepath):
+        lines.extend(text.split('\n'))
 
     # --- 2) Metadata de cuenta ---
     header_info = {}
@@ -88,7 +89,7 @@ def load_movements_bi_monet_email_pdf(filepath, archivo_obj):
     # Ejemplo: "01 194641 NOTA DEBITO PAGOS DE IMPUESTOS DECLARAGU 7.50 1,935.09"
     # O con crédito: "02 77250 NOTA CREDITO BANCA MOVIL 400.00 2,233.09"
     
-    count = 0
+    movimientos = []
     
     for line in lines:
         line = line.strip()
@@ -147,29 +148,15 @@ def load_movements_bi_monet_email_pdf(filepath, archivo_obj):
             fecha = datetime(año_actual, mes_actual, min(dia, last_day)).date()
 
         # Crear movimiento
-        mov = Movimiento(
-            fecha=fecha,
-            descripcion=desc,
-            lugar=None,
-            numero_documento=doc,
-            monto=monto,
-            moneda='GTQ',
-            tipo=tipo,
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-            
-        db.session.add(mov)
-        count += 1
+        movimientos.append({
+            'fecha': fecha,
+            'descripcion': desc,
+            'lugar': None,
+            'numero_documento': doc,
+            'monto': monto,
+            'moneda': 'GTQ',
+            'tipo': tipo,
+        })
         prev_balance = bal
 
-    db.session.commit()
-
-    # --- 6) Clasificar movimientos nuevos ---
-    clasificar_movimientos()
-
-    return count
\ No newline at end of file
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
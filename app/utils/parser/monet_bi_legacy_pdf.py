@@ -3,11 +3,14 @@ Parser para PDFs de cuentas monetarias del Banco Industrial
 enviados por correo electrónico ANTES de febrero 2023 (formato legacy).
 """
 
-import pdfplumber
 import re
 from datetime import datetime
-from app.models import Movimiento, Cuenta, db
-from app.utils.classifier import clasificar_movimientos
+from app.models import Cuenta, db
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
 
 
 def parse_monet_bi_legacy_pdf_file(filepath, archivo_obj):
@@ -22,12 +25,10 @@ def parse_monet_bi_legacy_pdf_file(filepath, archivo_obj):
     """
     
     # --- 1) Extraer texto del PDF ---
-    with pdfplumber.open(filepath) as pdf:
-        text_content = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_content += page_text + "\n"
+    text_content = ""
+    for page_text in texto_paginas_pdf(filepath):
+        if page_text:
+            text_content += page_text + "\n"
 
     if not text_content.strip():
         raise ValueError("No se pudo extraer texto del PDF")
@@ -93,33 +94,13 @@ def parse_monet_bi_legacy_pdf_file(filepath, archivo_obj):
     archivo_obj.titular = titular or 'TITULAR NO IDENTIFICADO'
     archivo_obj.moneda = 'GTQ'
 
-    # Buscar o crear cuenta (consultar números alternativos primero)
-    cuenta = Cuenta.find_by_numero(archivo_obj.numero_cuenta)
-    if cuenta:
-        try:
-            if cuenta.banco != archivo_obj.banco or not cuenta.tipo_cuenta.startswith(archivo_obj.tipo_cuenta):
-                cuenta = None
-        except Exception:
-            cuenta = None
-
+    # Buscar cuenta (número principal o alternativo, con o sin guiones) del mismo banco/tipo
+    cuenta = Cuenta.find_by_numero(
+        archivo_obj.numero_cuenta, banco=archivo_obj.banco, tipo=archivo_obj.tipo_cuenta,
+    )
     if not cuenta:
-        # Buscar por coincidencia directa o sin guiones como último recurso
-        numero_sin_guiones = numero_cuenta.replace('-', '')
-        cuentas_similares = Cuenta.query.filter(
-            (Cuenta.numero_cuenta == numero_cuenta) |
-            (Cuenta.numero_cuenta == numero_sin_guiones)
-        ).all()
-        
-        if cuentas_similares:
-            for cuenta_existente in cuentas_similares:
-                if cuenta_existente.numero_cuenta == numero_cuenta:
-                    cuenta = cuenta_existente
-                    break
-            if not cuenta:
-                for cuenta_existente in cuentas_similares:
-                    if cuenta_existente.numero_cuenta.replace('-', '') == numero_sin_guiones:
-                        cuenta = cuenta_existente
-                        break
+        # Como último recurso, el mismo número en cualquier banco
+        cuenta = Cuenta.find_by_numero(archivo_obj.numero_cuenta)
 
     if not cuenta:
         cuenta = Cuenta(
@@ -136,7 +117,7 @@ def parse_monet_bi_legacy_pdf_file(filepath, archivo_obj):
         db.session.commit()
 
     # --- 4) Procesar movimientos ---
-    count = 0
+    movimientos = []
     in_transactions_section = False
     saldo_anterior_movimiento = None
     
@@ -227,28 +208,14 @@ def parse_monet_bi_legacy_pdf_file(filepath, archivo_obj):
         saldo_anterior_movimiento = saldo_actual
         
         # Crear movimiento
-        mov = Movimiento(
-            fecha=fecha_movimiento,
-            descripcion=desc,
-            lugar=None,
-            numero_documento=numero_doc,
-            monto=monto,
-            moneda='GTQ',  # Siempre GTQ en este formato
-            tipo=tipo,
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-            
-        db.session.add(mov)
-        count += 1
-
-    db.session.commit()
-
-    # --- 5) Clasificar movimientos nuevos ---
-    clasificar_movimientos()
-
-    return count
\ No newline at end of file
+        movimientos.append({
+            'fecha': fecha_movimiento,
+            'descripcion': desc,
+            'lugar': None,
+            'numero_documento': numero_doc,
+            'monto': monto,
+            'moneda': 'GTQ',  # Siempre GTQ en este formato
+            'tipo': tipo,
+        })
+
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
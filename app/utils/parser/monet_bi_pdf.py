@@ -1,10 +1,13 @@
 import re
-import pdfplumber
 from datetime import datetime
 from ... import db
-from ...models import Archivo, Movimiento
 from .cuenta_utils import get_or_create_cuenta
-from ..classifier import clasificar_movimientos
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
+
 
 def load_movements_bi_monet_pdf(filepath, archivo_obj):
     """
@@ -15,15 +18,13 @@ def load_movements_bi_monet_pdf(filepath, archivo_obj):
          - Fecha, documento, descripción, monto, saldo.
          - Detecta moneda por sufijo en descripción (GT → GTQ, US → USD).
          - Determina tipo (débito/crédito) comparando saldo con el anterior.
-      4) Persiste movimientos y clasificarlos.
-    Devuelve el número de movimientos agregados.
+      4) Persiste movimientos (la clasificación la aplica `load_movements`).
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # --- 1) Extraer texto por líneas ---
-    with pdfplumber.open(filepath) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            lines.extend(text.split('\n'))
+    lines = []
+    for text in texto_paginas_pdf(filepath):
+        lines.extend(text.split('\n'))
 
     # --- 2) Metadata de cuenta ---
     header_info = {}
@@ -60,7 +61,7 @@ def load_movements_bi_monet_pdf(filepath, archivo_obj):
         r'(?P<monto>[\d,\.]+)\s*'
         r'(?P<saldo>[\d,\.]*)$'
     )
-    count = 0
+    movimientos = []
     for line in lines:
         line = line.strip()
         m = tx_pattern.match(line)
@@ -82,26 +83,14 @@ def load_movements_bi_monet_pdf(filepath, archivo_obj):
         prev_balance = bal
 
         # Crear movimiento
-        mov = Movimiento(
-            fecha=fecha,
-            descripcion=desc,
-            lugar=None,
-            numero_documento=doc,
-            monto=amt if tipo=='credito' else -amt,
-            moneda=moneda,
-            tipo=tipo,
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-        count += 1
-
-    db.session.commit()
-
-    # --- 6) Clasificar movimientos nuevos ---
-    clasificar_movimientos()
+        movimientos.append({
+            'fecha': fecha,
+            'descripcion': desc,
+            'lugar': None,
+            'numero_documento': doc,
+            'monto': amt if tipo=='credito' else -amt,
+            'moneda': moneda,
+            'tipo': tipo,
+        })
 
-    return count
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
@@ -2,14 +2,18 @@ import re
 import os
 import logging
 from datetime import datetime
-import pdfplumber
 import pandas as pd
 
 from ... import db
-from ...models import Movimiento, Cuenta
+from ...models import Cuenta
+from .lectura import tablas_paginas_pdf, texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
 
 logging.getLogger('pdfminer').setLevel(logging.WARNING)
 
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}), ('tablas_paginas_pdf', {}))
+
 
 _MESES_ES = {
     'ene': 1,
@@ -111,7 +115,7 @@ def load_movements_monet_nexa_pdf(filepath, archivo_obj):
     - Extrae número de cuenta, moneda y "Saldo Final" del encabezado.
     - Extrae la tabla de movimientos y guarda cada `Movimiento`.
     - Actualiza/crea la `Cuenta` y establece su `saldo` al "Saldo Final".
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # obtener metadata y dataframe parseado por la función dedicada
     info, df = parse_monet_nexa_metadata(filepath)
@@ -225,20 +229,16 @@ def load_movements_monet_nexa_pdf(filepath, archivo_obj):
             prev_saldo = saldo_actual
         df['monto'] = signed
 
+    movimientos = []
     for _, row in df.iterrows():
-        mov = Movimiento(
-            fecha=row.get('fecha'),
-            descripcion=(row.get('descripcion') or '').strip(),
-            numero_documento=row.get('documento') or '',
-            monto=row.get('monto') or 0.0,
-            moneda=moneda,
-            tipo='debito' if (row.get('monto') or 0) < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
+        movimientos.append({
+            'fecha': row.get('fecha'),
+            'descripcion': (row.get('descripcion') or '').strip(),
+            'numero_documento': row.get('documento') or '',
+            'monto': row.get('monto') or 0.0,
+            'moneda': moneda,
+            'tipo': 'debito' if (row.get('monto') or 0) < 0 else 'credito',
+        })
 
     # 6) Actualizar saldo final en la cuenta si fue detectado
     if info.get('saldo_final') is not None:
@@ -248,10 +248,8 @@ def load_movements_monet_nexa_pdf(filepath, archivo_obj):
         except Exception:
             pass
 
-    db.session.commit()
-
-    # contar únicamente filas que se insertaron (asumimos df length)
-    return len(df)
+    # Inserta los movimientos en bloque (el commit incluye el saldo de la cuenta)
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
 
 
 def parse_monet_nexa_metadata(filepath):
@@ -260,11 +258,9 @@ def parse_monet_nexa_metadata(filepath):
     de movimientos del PDF sin tocar la base de datos. Retorna (info, df).
     """
     # 1) Leer todo el texto para capturar encabezado (líneas iniciales)
-    with pdfplumber.open(filepath) as pdf:
-        all_lines = []
-        for page in pdf.pages:
-            txt = page.extract_text() or ""
-            all_lines.extend(txt.split('\n'))
+    all_lines = []
+    for txt in texto_paginas_pdf(filepath):
+        all_lines.extend(txt.split('\n'))
 
     clean_lines = [_undouble_text((line or '').strip()) for line in all_lines if (line or '').strip()]
 
@@ -380,22 +376,17 @@ def parse_monet_nexa_metadata(filepath):
 
     # Extraer tablas de movimientos con pdfplumber
     tables = []
-    with pdfplumber.open(filepath) as pdf:
-        for page in pdf.pages:
-            tbl = page.extract_table({
-                "vertical_strategy":   "lines",
-                "horizontal_strategy": "lines"
-            })
-            if tbl and len(tbl) > 0:
-                # Detectar si la primera fila es un header real (contiene palabras como Fecha/Descripción)
-                header_candidate = tbl[0]
-                header_text = ' '.join([str(x) for x in header_candidate]).lower()
-                if any(h in header_text for h in ('fecha', 'descripción', 'descripcion', 'saldo', 'debito', 'credito', 'no. de ref', 'no de ref')) and len(tbl) > 1:
-                    tables.append(pd.DataFrame(tbl[1:], columns=tbl[0]))
-                else:
-                    # Tratar todas las filas como una sola columna 'raw'
-                    rows = [[r[0] if len(r) > 0 else ''] for r in tbl]
-                    tables.append(pd.DataFrame(rows, columns=['raw']))
+    for tbl in tablas_paginas_pdf(filepath):
+        if tbl and len(tbl) > 0:
+            # Detectar si la primera fila es un header real (contiene palabras como Fecha/Descripción)
+            header_candidate = tbl[0]
+            header_text = ' '.join([str(x) for x in header_candidate]).lower()
+            if any(h in header_text for h in ('fecha', 'descripción', 'descripcion', 'saldo', 'debito', 'credito', 'no. de ref', 'no de ref')) and len(tbl) > 1:
+                tables.append(pd.DataFrame(tbl[1:], columns=tbl[0]))
+            else:
+                # Tratar todas las filas como una sola columna 'raw'
+                rows = [[r[0] if len(r) > 0 else ''] for r in tbl]
+                tables.append(pd.DataFrame(rows, columns=['raw']))
 
     df = None
     if tables:
@@ -0,0 +1,192 @@
+import hashlib
+import re
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.sqlite import insert
+from ... import db
+from ...models import Movimiento
+
+
+# Columnas que un parser puede entregar por movimiento
+COLUMNAS_MOVIMIENTO = (
+    'fecha', 'descripcion', 'detalle', 'lugar', 'numero_documento',
+    'monto', 'moneda', 'tipo', 'cuenta_id',
+)
+
+
+def _normalizar_texto(valor):
+    return ' '.join(str(valor or '').upper().split())
+
+
+def _normalizar_documento(valor):
+    # Sin ceros a la izquierda ni el '.0' de documentos leídos como número
+    return re.sub(r'\.0+$', '', _normalizar_texto(valor)).lstrip('0')
+
+
+def _titular(fila):
+    # Sin cuenta, el propietario evita que coincidan movimientos de otro usuario
+    if fila.get('cuenta_id') is not None:
+        return str(fila['cuenta_id'])
+    return f"u{fila.get('user_id') or ''}"
+
+
+def _contenido(fila):
+    fecha = fila.get('fecha')
+    monto = fila.get('monto')
+    return (
+        _titular(fila),
+        str(fecha) if fecha is not None else '',
+        f'{monto:.2f}' if monto is not None else '',
+        _normalizar_texto(fila.get('moneda')),
+        _normalizar_texto(fila.get('descripcion')),
+        _normalizar_documento(fila.get('numero_documento')),
+    )
+
+
+def _huella(contenido, ocurrencia):
+    return hashlib.sha256('|'.join(contenido + (str(ocurrencia),)).encode('utf-8')).hexdigest()
+
+
+def huella_movimiento(fila, ocurrencia=1):
+    """Huella del contenido de un movimiento para detectar duplicados entre archivos.
+
+    Combina cuenta (o el usuario, si no hay cuenta), fecha, monto, moneda,
+    descripción y número de documento normalizados. `ocurrencia` distingue
+    movimientos idénticos dentro de un mismo archivo (p.e. dos compras
+    iguales el mismo día): el segundo lleva 2.
+    """
+    return _huella(_contenido(fila), ocurrencia)
+
+
+def _asignar_huellas(filas):
+    ocurrencias = {}
+    for fila in filas:
+        contenido = _contenido(fila)
+        ocurrencias[contenido] = ocurrencias.get(contenido, 0) + 1
+        fila['huella'] = _huella(contenido, ocurrencias[contenido])
+
+
+def _registros_desde_dataframe(df):
+    """Convierte un DataFrame en dicts con tipos nativos (NaN/NaT → None)."""
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
+def _fila(registro, archivo_obj, cuenta_id, user_id):
+    fila = {col: registro.get(col) for col in COLUMNAS_MOVIMIENTO}
+    if fila['cuenta_id'] is None:
+        fila['cuenta_id'] = cuenta_id
+    if isinstance(fila['fecha'], datetime):
+        fila['fecha'] = fila['fecha'].date()
+    if fila['monto'] is not None:
+        fila['monto'] = float(fila['monto'])
+    fila['archivo_id'] = archivo_obj.id
+    # Propagar propietario del archivo al movimiento
+    fila['user_id'] = user_id
+    fila['excluir_clasificacion'] = bool(registro.get('excluir_clasificacion', False))
+    fila['excluir_dashboard'] = bool(registro.get('excluir_dashboard', False))
+    return fila
+
+
+# Ids por consulta `IN` (límite clásico de variables de SQLite: 999)
+_TAMANO_LOTE_IN = 900
+
+# Resultado de `guardar_movimientos`: `duplicados` son los omitidos por tener
+# una huella ya cargada
+MovimientosGuardados = namedtuple('MovimientosGuardados', 'insertados duplicados')
+
+
+def _contar(archivo_obj):
+    return db.session.query(func.count(Movimiento.id)).filter(Movimiento.archivo_id == archivo_obj.id).scalar()
+
+
+def guardar_movimientos(registros, archivo_obj, cuenta=None):
+    """Etapa de persistencia compartida por todos los parsers de movimientos.
+
+    `registros` es una lista de dicts (o un DataFrame) con las columnas de
+    `COLUMNAS_MOVIMIENTO`; las que falten quedan en NULL. Si un registro no trae
+    `cuenta_id` se usa el de `cuenta`. El archivo y su propietario se asignan
+    aquí.
+
+    Inserta todas las filas con un único INSERT masivo (executemany) y hace un
+    solo commit. Los movimientos cuya huella (`huella_movimiento`) ya existe,
+    p.e. de otro estado de cuenta que cubre el mismo período, se omiten en el
+    mismo INSERT (ON CONFLICT DO NOTHING sobre el índice único). Retorna
+    `MovimientosGuardados` con los movimientos insertados y los omitidos.
+    """
+    if hasattr(registros, 'to_dict'):
+        registros = _registros_desde_dataframe(registros)
+
+    cuenta_id = cuenta.id if cuenta is not None else None
+    user_id = getattr(archivo_obj, 'user_id', None)
+    filas = [_fila(registro, archivo_obj, cuenta_id, user_id) for registro in registros]
+    insertados = 0
+    if filas:
+        _asignar_huellas(filas)
+        antes = _contar(archivo_obj)
+        # render_nulls: los None se envían como NULL para que todas las filas
+        # compartan la misma sentencia y vayan en un único executemany
+        db.session.execute(
+            insert(Movimiento)
+            .on_conflict_do_nothing(index_elements=['huella'])
+            .execution_options(render_nulls=True),
+            filas,
+        )
+        # El executemany ORM no expone rowcount; contar por el índice de archivo_id
+        insertados = _contar(archivo_obj) - antes
+    db.session.commit()
+    return MovimientosGuardados(insertados, len(filas) - insertados)
+
+
+def mover_movimientos_cuenta(origen_id, destino_id):
+    """Pasa los movimientos de la cuenta `origen_id` a `destino_id` (al combinar cuentas).
+
+    La huella incluye la cuenta, así que se recalcula con la de destino para
+    que una carga posterior de los mismos estados los reconozca. Los que ya
+    tienen esa huella en el destino son el mismo movimiento cargado en ambas
+    cuentas y se eliminan. No hace commit; retorna cuántos se eliminaron.
+    """
+    tabla = Movimiento.__table__
+    movidos = db.session.execute(
+        select(
+            tabla.c.id, tabla.c.user_id, tabla.c.fecha, tabla.c.monto, tabla.c.moneda,
+            tabla.c.descripcion, tabla.c.numero_documento,
+        )
+        .where(tabla.c.cuenta_id == origen_id, tabla.c.huella.isnot(None))
+        .order_by(tabla.c.id)
+    ).mappings().all()
+    existentes = set(db.session.scalars(
+        select(tabla.c.huella).where(tabla.c.cuenta_id == destino_id, tabla.c.huella.isnot(None))
+    ))
+
+    # Misma numeración de ocurrencias que al importar: por contenido, en orden de carga
+    ocurrencias = {}
+    huellas = []
+    repetidos = []
+    for fila in movidos:
+        contenido = _contenido(dict(fila, cuenta_id=destino_id))
+        ocurrencias[contenido] = ocurrencias.get(contenido, 0) + 1
+        huella = _huella(contenido, ocurrencias[contenido])
+        if huella in existentes:
+            repetidos.append(fila['id'])
+        else:
+            huellas.append({'b_id': fila['id'], 'huella': huella})
+
+    # Por lotes para no exceder el límite de parámetros de SQLite
+    for inicio in range(0, len(repetidos), _TAMANO_LOTE_IN):
+        Movimiento.query.filter(
+            Movimiento.id.in_(repetidos[inicio:inicio + _TAMANO_LOTE_IN])
+        ).delete(synchronize_session=False)
+    Movimiento.query.filter_by(cuenta_id=origen_id).update({'cuenta_id': destino_id})
+    if huellas:
+        db.session.execute(
+            tabla.update().where(tabla.c.id == bindparam('b_id')).values(huella=bindparam('huella')),
+            huellas,
+        )
+    return len(repetidos)
+
+
+def tipo_por_signo(montos):
+    """Serie 'debito'/'credito' según el signo de una serie de montos."""
+    return montos.lt(0).map({True: 'debito', False: 'credito'})
@@ -0,0 +1,107 @@
+"""Registro de parsers de movimientos.
+
+Cada parser declara su `tipo_archivo`, el banco que asigna al archivo y, por
+extensión aceptada, su punto de entrada como `'modulo:funcion'`. Los módulos se
+importan la primera vez que se usan, así que arrancar la app (o un comando CLI)
+no carga pdfplumber/pandas ni los ~20 parsers.
+
+Parsers externos pueden registrarse con `registrar_parser`, pasando la ruta
+`'paquete.modulo:funcion'` o directamente la función.
+"""
+
+import importlib
+import sys
+
+
+class ParserMovimientos:
+    """Entrada del registro para un `tipo_archivo`."""
+
+    def __init__(self, tipo_archivo, banco=None):
+        self.tipo_archivo = tipo_archivo
+        self.banco = banco
+        # extensión ('.pdf') -> 'modulo:funcion' o función ya resuelta
+        self.entradas = {}
+
+    @property
+    def extensiones(self):
+        return tuple(self.entradas)
+
+    def funcion(self, extension):
+        """Devuelve la función del parser para `extension`, importándola si hace falta."""
+        entrada = self.entradas.get(extension)
+        if entrada is None:
+            raise ValueError(f'Extensión no válida para formato {self.tipo_archivo}.')
+        if isinstance(entrada, str):
+            modulo, nombre = entrada.split(':')
+            entrada = getattr(importlib.import_module(modulo, package=__package__), nombre)
+            self.entradas[extension] = entrada
+        return entrada
+
+    def lecturas(self, extension):
+        """Lecturas declaradas (`LECTURAS`) por el módulo del parser de `extension`."""
+        modulo = sys.modules.get(self.funcion(extension).__module__)
+        return getattr(modulo, 'LECTURAS', ())
+
+
+# tipo_archivo (o alias) -> ParserMovimientos
+_PARSERS = {}
+
+
+def registrar_parser(tipo_archivo, extensiones, entrada, banco=None, alias=()):
+    """
+    Registra `entrada` como parser de `tipo_archivo` para las `extensiones` dadas.
+
+    Llamar varias veces con el mismo `tipo_archivo` agrega extensiones (p.e. una
+    función para .xlsx y otra para .pdf). `alias` son nombres alternativos del
+    mismo formato.
+    """
+    parser = _PARSERS.get(tipo_archivo)
+    if parser is None:
+        parser = ParserMovimientos(tipo_archivo, banco)
+        _PARSERS[tipo_archivo] = parser
+    elif banco is not None:
+        parser.banco = banco
+    for extension in extensiones:
+        parser.entradas[extension.lower()] = entrada
+    for nombre in alias:
+        _PARSERS[nombre] = parser
+    return parser
+
+
+def obtener_parser(tipo_archivo):
+    """Devuelve la entrada registrada para `tipo_archivo` o lanza ValueError."""
+    parser = _PARSERS.get(tipo_archivo)
+    if parser is None:
+        raise ValueError(f'Tipo de archivo "{tipo_archivo}" no soportado.')
+    return parser
+
+
+def tipos_registrados():
+    """Tipos de archivo registrados (sin alias) con sus extensiones aceptadas."""
+    return {
+        tipo: parser.extensiones
+        for tipo, parser in _PARSERS.items()
+        if parser.tipo_archivo == tipo
+    }
+
+
+# --- Parsers incluidos ---
+registrar_parser('monet-aho-gyt', ('.xlsx', '.xls'), '.monet_aho_gyt_xlsx:load_movements_monet_aho_gyt_xlsx', banco='GYT')
+registrar_parser('monet-aho-gyt', ('.pdf',), '.monet_aho_gyt_pdf:load_movements_monet_aho_gyt_pdf')
+registrar_parser('tc-gyt', ('.xlsx', '.xls'), '.tc_gyt_xlsx:load_movements_tc_gyt_xlsx', banco='GYT')
+registrar_parser('tc-gyt', ('.pdf',), '.tc_gyt_pdf:load_movements_tc_gyt_pdf')
+registrar_parser('monet-bi', ('.pdf',), '.monet_bi_pdf:load_movements_bi_monet_pdf', banco='BI')
+registrar_parser('monet-bi-email', ('.pdf',), '.monet_bi_email_pdf:load_movements_bi_monet_email_pdf', banco='BI')
+registrar_parser('monet-bi-legacy', ('.pdf',), '.monet_bi_legacy_pdf:parse_monet_bi_legacy_pdf_file', banco='BI')
+registrar_parser('monet_bi_ec_integrado', ('.pdf',),
+                 '.monet_bi_ec_integrado_pdf:load_movements_monet_bi_ec_integrado_pdf',
+                 banco='BI', alias=('monet-bi-ec-integrado',))
+registrar_parser('monet-nexa', ('.pdf',), '.monet_nexa_pdf:load_movements_monet_nexa_pdf', banco='NEXA')
+registrar_parser('tc-bi', ('.xls', '.xlsx'), '.tc_bi_xls:load_movements_bi_tc_xls', banco='BI')
+registrar_parser('tc-bi-email', ('.pdf',), '.tc_bi_email_pdf:load_movements_bi_tc_email_pdf', banco='BI')
+registrar_parser('tc-promerica', ('.xls', '.xlsx'), '.tc_promerica_xls:load_movements_promerica_tc_xls', banco='Promerica')
+registrar_parser('tc-online-bi', ('.xls', '.xlsx'), '.tc_bi_virtual_xls:load_movements_bi_tc_virtual_xls', banco='BI')
+registrar_parser('generic-movimientos', ('.xls', '.xlsx', '.csv'), '.generic_movimientos:load_movements_generic')
+registrar_parser('tc-bac', ('.csv',), '.tc_bac_csv:load_movements_bac_tc_csv', banco='BAC')
+registrar_parser('ahorro-bac', ('.csv',), '.ahorro_bac_csv:load_movements_ahorro_bac_csv', banco='BAC')
+registrar_parser('ahorro-interbanco', ('.pdf',), '.ahorro_interbanco_pdf:parse_ahorro_interbanco_pdf_file', banco='Interbanco')
@@ -1,9 +1,8 @@
 import pandas as pd
 from datetime import datetime
 from ... import db
-from ...models import Archivo, Movimiento
 from .cuenta_utils import get_or_create_cuenta
-from ..classifier import clasificar_movimientos
+from .movimiento_utils import guardar_movimientos
 
 def load_movements_bac_tc_csv(filepath, archivo_obj):
     """
@@ -14,7 +13,7 @@ def load_movements_bac_tc_csv(filepath, archivo_obj):
     - Termina cuando ya no hay fecha válida
     - No tiene ID de movimiento
     
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     
     # 1) Leer el archivo CSV
@@ -118,29 +117,11 @@ def load_movements_bac_tc_csv(filepath, archivo_obj):
         movimientos_validos.append({
             'fecha': fecha,
             'descripcion': descripcion,
+            'numero_documento': '',  # BAC CSV no tiene número de documento
             'monto': monto,
             'moneda': moneda,
             'tipo': tipo
         })
     
     # 7) Persistir movimientos
-    count = 0
-    for mov in movimientos_validos:
-        movimiento = Movimiento(
-            fecha=mov['fecha'],
-            descripcion=mov['descripcion'],
-            numero_documento='',  # BAC CSV no tiene número de documento
-            monto=mov['monto'],
-            moneda=mov['moneda'],
-            tipo=mov['tipo'],
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            movimiento.user_id = archivo_obj.user_id
-        db.session.add(movimiento)
-        count += 1
-    
-    db.session.commit()
-    return count
\ No newline at end of file
+    return guardar_movimientos(movimientos_validos, archivo_obj, cuenta)
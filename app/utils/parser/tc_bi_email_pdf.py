@@ -1,9 +1,13 @@
 import re
-import pdfplumber
 from datetime import datetime
 from ... import db
-from ...models import Archivo, Movimiento, Cuenta
-from ..classifier import clasificar_movimientos
+from ...models import Cuenta
+from .lectura import texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}),)
+
 
 def load_movements_bi_tc_email_pdf(filepath, archivo_obj):
     """
@@ -13,14 +17,12 @@ def load_movements_bi_tc_email_pdf(filepath, archivo_obj):
       3) Usa la fecha de consumo en lugar de la fecha de operación.
       4) Determina débitos y créditos basándose en las columnas correspondientes.
       5) Persiste movimientos y los clasifica.
-    Devuelve el número de movimientos agregados.
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # --- 1) Extraer texto por líneas ---
-    with pdfplumber.open(filepath) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            lines.extend(text.split('\n'))
+    lines = []
+    for text in texto_paginas_pdf(filepath):
+        lines.extend(text.split('\n'))
 
     # --- 2) Metadata de cuenta ---
     titular = 'Desconocido'
@@ -78,32 +80,10 @@ def load_movements_bi_tc_email_pdf(filepath, archivo_obj):
     db.session.commit()
 
     # --- 3) Crear o recuperar cuenta ---
-    # Intentar localizar cuenta por número, incluyendo números alternativos
-    cuenta = Cuenta.find_by_numero(archivo_obj.numero_cuenta)
-
-    # Asegurar que la cuenta encontrada corresponde al mismo banco y tipo (p. ej. TC)
-    if cuenta:
-        try:
-            if cuenta.banco != archivo_obj.banco or not cuenta.tipo_cuenta.startswith(archivo_obj.tipo_cuenta):
-                # Si no coincide, descartamos esta coincidencia para buscar una que sí coincida con banco/tipo
-                cuenta = None
-        except Exception:
-            cuenta = None
+    # Localizar cuenta por número (incluye números alternativos y versión sin guiones)
+    # del mismo banco y con tipo de TC (cualquier tipo que empiece con TC)
+    cuenta = Cuenta.find_by_numero(archivo_obj.numero_cuenta, banco=archivo_obj.banco, tipo=archivo_obj.tipo_cuenta)
 
-    # Si aún no hay cuenta, buscar también sin guiones por si existe en otro formato dentro del mismo banco/tipo
-    if not cuenta:
-        numero_sin_guiones = numero_cuenta.replace('-', '')
-        # Buscar cuentas del mismo banco y con tipos de TC similares que contengan los mismos dígitos
-        cuentas_similares = Cuenta.query.filter(
-            Cuenta.banco == archivo_obj.banco,
-            Cuenta.tipo_cuenta.like('TC%')  # Cualquier tipo que empiece con TC
-        ).all()
-
-        for cuenta_existente in cuentas_similares:
-            if cuenta_existente.numero_cuenta.replace('-', '') == numero_sin_guiones:
-                cuenta = cuenta_existente
-                break
-    
     if not cuenta:
         # Si es cuenta nueva, forzar tipo_cuenta = "TC" y, si hay categoría, colocarla en el alias
         alias_sugerido = None
@@ -125,7 +105,7 @@ def load_movements_bi_tc_email_pdf(filepath, archivo_obj):
         db.session.commit()
 
     # --- 4) Procesar movimientos ---
-    count = 0
+    movimientos = []
     current_currency = None
     in_movements_section = False
     current_section_type = None  # Para distinguir entre MOVIMIENTOS, OTROS CARGOS, OTROS CREDITOS
@@ -217,28 +197,14 @@ def load_movements_bi_tc_email_pdf(filepath, archivo_obj):
                 monto = -amt  # Negativo para débitos/compras/cargos
                 
             # Crear movimiento
-            mov = Movimiento(
-                fecha=fecha_consumo,
-                descripcion=desc,
-                lugar=None,
-                numero_documento=None,  # Los PDFs de TC no tienen número de documento
-                monto=monto,
-                moneda=current_currency,
-                tipo=tipo,
-                cuenta_id=cuenta.id,
-                archivo_id=archivo_obj.id
-            )
-            
-            # Propagar propietario del archivo al movimiento
-            if getattr(archivo_obj, 'user_id', None) is not None:
-                mov.user_id = archivo_obj.user_id
-                
-            db.session.add(mov)
-            count += 1
-
-    db.session.commit()
-
-    # --- 5) Clasificar movimientos nuevos ---
-    clasificar_movimientos()
+            movimientos.append({
+                'fecha': fecha_consumo,
+                'descripcion': desc,
+                'lugar': None,
+                'numero_documento': None,  # Los PDFs de TC no tienen número de documento
+                'monto': monto,
+                'moneda': current_currency,
+                'tipo': tipo,
+            })
 
-    return count
\ No newline at end of file
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
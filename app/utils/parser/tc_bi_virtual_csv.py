@@ -3,8 +3,8 @@ from pathlib import Path
 from datetime import datetime
 import pandas as pd
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .movimiento_utils import guardar_movimientos
 
 
 def load_movements_bi_tc_virtual_csv(filepath, archivo_obj):
@@ -13,7 +13,7 @@ def load_movements_bi_tc_virtual_csv(filepath, archivo_obj):
     - Lee .xlsx/.xls/.csv con cabeceras tipo: Operación | Movimiento | tipo de | no. doc | concepto | valor | saldo
     - Usa "valor" como monto principal; si falta, recurre a "saldo".
     - CONSUMO/DEBITO -> monto negativo (debito); PAGO/ABONO/EXTORNO -> positivo (credito).
-    Devuelve la cantidad de movimientos agregados.
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     suffix = Path(filepath).suffix.lower()
     if suffix in ('.xlsx', '.xls'):
@@ -88,7 +88,7 @@ def load_movements_bi_tc_virtual_csv(filepath, archivo_obj):
 
     cuenta = get_or_create_cuenta(archivo_obj, preferred_tipo='TC')
 
-    count = 0
+    movimientos = []
     for _, row in df.iterrows():
         fecha = parse_date(row.get('fecha_movimiento')) or parse_date(row.get('fecha_operacion'))
         if not fecha:
@@ -112,20 +112,14 @@ def load_movements_bi_tc_virtual_csv(filepath, archivo_obj):
             monto = -abs(monto_base)
             tipo_mov = 'debito'
 
-        mov = Movimiento(
-            fecha=fecha,
-            descripcion=desc,
-            numero_documento=numero_doc,
-            monto=monto,
-            moneda='GTQ',
-            tipo=tipo_mov,
-            cuenta_id=cuenta.id if cuenta else None,
-            archivo_id=archivo_obj.id
-        )
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-        count += 1
-
-    db.session.commit()
-    return count
+        movimientos.append({
+            'fecha': fecha,
+            'descripcion': desc,
+            'numero_documento': numero_doc,
+            'monto': monto,
+            'moneda': 'GTQ',
+            'tipo': tipo_mov,
+            'cuenta_id': cuenta.id if cuenta else None,
+        })
+
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
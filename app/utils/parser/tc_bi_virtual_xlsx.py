@@ -2,8 +2,8 @@ import re
 from datetime import datetime
 import pandas as pd
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .movimiento_utils import guardar_movimientos
 
 
 def load_movements_bi_tc_virtual_xls(filepath, archivo_obj):
@@ -15,7 +15,7 @@ def load_movements_bi_tc_virtual_xls(filepath, archivo_obj):
       - Fila 2: Cabeceras (Operación | Movimiento | tipo de movimiento | no. doc | concepto | valor | saldo)
       - Fila 3+: Movimientos
     - Determina débito/crédito por tipo: CONSUMO/DEBITO -> débito negativo; PAGO/ABONO/EXTORNO -> crédito positivo
-    Devuelve la cantidad de movimientos agregados.
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     df = pd.read_excel(filepath, header=None)
     
@@ -59,7 +59,7 @@ def load_movements_bi_tc_virtual_xls(filepath, archivo_obj):
     cuenta = get_or_create_cuenta(archivo_obj, preferred_tipo='TC')
 
     # Procesar movimientos desde fila 3 en adelante
-    count = 0
+    movimientos = []
     for idx in range(3, len(df)):
         row = df.iloc[idx]
         
@@ -84,20 +84,14 @@ def load_movements_bi_tc_virtual_xls(filepath, archivo_obj):
             monto = -abs(monto_valor)
             tipo_mov = 'debito'
 
-        mov = Movimiento(
-            fecha=fecha,
-            descripcion=descripcion,
-            numero_documento=numero_doc,
-            monto=monto,
-            moneda='GTQ',
-            tipo=tipo_mov,
-            cuenta_id=cuenta.id if cuenta else None,
-            archivo_id=archivo_obj.id
-        )
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-        count += 1
+        movimientos.append({
+            'fecha': fecha,
+            'descripcion': descripcion,
+            'numero_documento': numero_doc,
+            'monto': monto,
+            'moneda': 'GTQ',
+            'tipo': tipo_mov,
+            'cuenta_id': cuenta.id if cuenta else None,
+        })
 
-    db.session.commit()
-    return count
+    return guardar_movimientos(movimientos, archivo_obj, cuenta)
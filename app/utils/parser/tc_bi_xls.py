@@ -3,10 +3,14 @@ from datetime import datetime
 import re
 import logging
 from ... import db
-from ...models import Archivo, Movimiento, Cuenta
-from ..classifier import clasificar_movimientos
+from ...models import Archivo, Cuenta
+from .lectura import leer_excel
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
 from sqlalchemy.exc import IntegrityError
 
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('leer_excel', {'sheet_name': 0, 'header': None, 'dtype': str}),)
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,10 +54,10 @@ def load_movements_bi_tc_xls(filepath, archivo_obj):
       4) Lee desde línea 14 hasta la primera línea vacía.
       5) Renombra, normaliza y persiste Movimientos.
       6) Reclasifica automáticamente.
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # 1) Leer toda la hoja 0 como strings
-    df0 = pd.read_excel(filepath, sheet_name=0, header=None, dtype=str)
+    df0 = leer_excel(filepath, sheet_name=0, header=None, dtype=str)
 
     # Helper para evitar NoneType.strip()
     def safe_str(val):
@@ -94,16 +98,13 @@ def load_movements_bi_tc_xls(filepath, archivo_obj):
         if cuenta:
             logger.debug("Cuenta encontrada por numero_cuenta exacto: id=%r banco=%r tipo=%r", cuenta.id, cuenta.banco, cuenta.tipo_cuenta)
 
-    # 3) Si aún no, buscar por la versión "limpia" (sin guiones/puntos/espacios)
+    # 3) Si aún no, buscar por la versión "limpia" (sin guiones/puntos/espacios) o por números alternativos
     if not cuenta and numero_clean:
         logger.debug("Buscando por numero limpio (sin caracteres especiales): %r", numero_clean)
         # algunos registros pueden haberse guardado sin guiones; buscar equivalentes
-        posibles = Cuenta.query.all()
-        for c in posibles:
-            if re.sub(r"[^A-Za-z0-9]", "", (c.numero_cuenta or '')) == numero_clean:
-                cuenta = c
-                logger.debug("Cuenta encontrada por numero limpio: id=%r numero=%r stored_clean=%r", c.id, c.numero_cuenta, re.sub(r"[^A-Za-z0-9]", "", (c.numero_cuenta or '')))
-                break
+        cuenta = Cuenta.find_by_numero(numero_raw)
+        if cuenta:
+            logger.debug("Cuenta encontrada por numero limpio: id=%r numero=%r stored_clean=%r", cuenta.id, cuenta.numero_cuenta, cuenta.numero_normalizado)
 
     # 4) Si no existe, crear y proteger con try/except IntegrityError por si hay una carrera o registro concurrente
     if not cuenta:
@@ -134,12 +135,9 @@ def load_movements_bi_tc_xls(filepath, archivo_obj):
             if not cuenta:
                 # último recurso: buscar por versión limpia
                 if numero_clean:
-                    posibles = Cuenta.query.all()
-                    for c in posibles:
-                        if re.sub(r"[^A-Za-z0-9]", "", (c.numero_cuenta or '')) == numero_clean:
-                            cuenta = c
-                            logger.debug("Recuperada cuenta después de IntegrityError por numero_clean: id=%r numero=%r", c.id, c.numero_cuenta)
-                            break
+                    cuenta = Cuenta.find_by_numero(numero_raw)
+                    if cuenta:
+                        logger.debug("Recuperada cuenta después de IntegrityError por numero_clean: id=%r numero=%r", cuenta.id, cuenta.numero_cuenta)
             if not cuenta:
                 # Si todavía no hay cuenta, re-raise para que el error sea visible
                 logger.error("No se pudo recuperar o crear la cuenta tras IntegrityError para numero=%r", numero_raw)
@@ -238,25 +236,5 @@ def load_movements_bi_tc_xls(filepath, archivo_obj):
     movs['moneda'] = archivo_obj.moneda
 
     # 9) Persistir movimientos
-    count = 0
-    for _, row in movs.iterrows():
-        if pd.isna(row['fecha']):
-            continue
-        m = Movimiento(
-            fecha=row['fecha'],
-            descripcion=row['descripcion'],
-            numero_documento=row['numero_documento'],
-            monto=row['monto'],
-            moneda=row['moneda'],
-            tipo='debito' if row['monto'] < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            m.user_id = archivo_obj.user_id
-        db.session.add(m)
-        count += 1
-    db.session.commit()
-
-    return count
+    movs['tipo'] = tipo_por_signo(movs['monto'])
+    return guardar_movimientos(movs, archivo_obj, cuenta)
@@ -1,10 +1,14 @@
 
-import pdfplumber
 import pandas as pd
 
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .lectura import tablas_paginas_pdf, texto_paginas_pdf
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('texto_paginas_pdf', {}), ('tablas_paginas_pdf', {}))
+
 
 def load_movements_tc_gyt_pdf(filepath, archivo_obj):
     """
@@ -12,14 +16,12 @@ def load_movements_tc_gyt_pdf(filepath, archivo_obj):
     1) Extrae y parsea el encabezado (primeras ~2 líneas).
     2) Extrae la tabla de movimientos de cada página con pdfplumber.
     3) Concatena, renombra "Crédito/Débito" a 'monto', normaliza y guarda cada Movimiento en la BD.
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # --- 1) Extraer líneas completas para el encabezado ---
-    with pdfplumber.open(filepath) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            lines.extend(text.split('\n'))
+    lines = []
+    for text in texto_paginas_pdf(filepath):
+        lines.extend(text.split('\n'))
 
     header_info = {}
     for line in lines[:8]:
@@ -47,28 +49,23 @@ def load_movements_tc_gyt_pdf(filepath, archivo_obj):
 
     # --- 4) Extraer y concatenar tablas de todas las páginas ---
     tablas = []
-    with pdfplumber.open(filepath) as pdf:
-        for page in pdf.pages:
-            tbl = page.extract_table({
-                "vertical_strategy":   "lines",
-                "horizontal_strategy": "lines"
-            })
-            if tbl:
-                # Eliminar filas encabezado y agregar uno personalizado
-                if page.page_number == 1:
-                    # Validar si en la segunda línea está el texto "Cuenta: TCR"
-                    if 'Cuenta:' in lines[6]:
-                        # Eliminar encabezado de página
-                        tbl = [tbl[0]] + tbl[2:]
-                    else:
-                        # Eliminar solo la primera fila
-                        tbl = [tbl[0]] + tbl[1:]
-                elif page.page_number > 1:
+    for page_number, tbl in enumerate(tablas_paginas_pdf(filepath), start=1):
+        if tbl:
+            # Eliminar filas encabezado y agregar uno personalizado
+            if page_number == 1:
+                # Validar si en la segunda línea está el texto "Cuenta: TCR"
+                if 'Cuenta:' in lines[6]:
+                    # Eliminar encabezado de página
+                    tbl = [tbl[0]] + tbl[2:]
+                else:
+                    # Eliminar solo la primera fila
                     tbl = [tbl[0]] + tbl[1:]
-                tbl[0] = ['fecha', 'documento', 'blank1', 'descripcion', 'blank2', 'blank3', 'raw_monto', 'blank4', 'blank5']
-                # Convertir a DataFrame y agregar a la lista
-                df = pd.DataFrame(tbl[1:], columns=tbl[0])
-                tablas.append(df)
+            elif page_number > 1:
+                tbl = [tbl[0]] + tbl[1:]
+            tbl[0] = ['fecha', 'documento', 'blank1', 'descripcion', 'blank2', 'blank3', 'raw_monto', 'blank4', 'blank5']
+            # Convertir a DataFrame y agregar a la lista
+            df = pd.DataFrame(tbl[1:], columns=tbl[0])
+            tablas.append(df)
 
     if not tablas:
         raise ValueError("No se detectó la tabla de movimientos en el PDF.")
@@ -109,23 +106,8 @@ def load_movements_tc_gyt_pdf(filepath, archivo_obj):
         df['documento'].astype(bool)
     ]
 
-    # --- 9) Persistir cada movimiento ---
-    for _, row in df.iterrows():
-        mov = Movimiento(
-            fecha=row['fecha'],
-            descripcion=row['descripcion'],
-            numero_documento=row['documento'],
-            monto=row['monto'],
-            moneda=row['moneda'],
-            tipo='debito' if row['monto'] < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-    db.session.commit()
-
-
-    return len(df)
+    # --- 9) Persistir movimientos en bloque ---
+    df = df.rename(columns={'documento': 'numero_documento'})
+    df['tipo'] = tipo_por_signo(df['monto'])
+    return guardar_movimientos(df[['fecha', 'descripcion', 'numero_documento', 'monto', 'moneda', 'tipo']],
+                               archivo_obj, cuenta)
@@ -1,9 +1,12 @@
 
 import pandas as pd
 from ... import db
-from ...models import Movimiento
-from ..classifier import clasificar_movimientos
 from .cuenta_utils import get_or_create_cuenta
+from .lectura import leer_excel
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('leer_excel', {'sheet_name': 0, 'header': None, 'dtype': str}),)
 
 def load_movements_tc_gyt_xlsx(filepath, archivo_obj):
     """
@@ -13,10 +16,10 @@ def load_movements_tc_gyt_xlsx(filepath, archivo_obj):
       3) Detecta la cabecera de movimientos (buscando 'Fecha' y 'Descripción'),
          luego lee desde ahí, deteniéndose en la primera fila vacía.
       4) Normaliza, persiste Movimientos y reclasifica.
-    Devuelve el número de movimientos cargados.
+    Devuelve los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # 1) Leer hoja 0 sin cabeceras, todo como string
-    df0 = pd.read_excel(filepath, sheet_name=0, header=None, dtype=str)
+    df0 = leer_excel(filepath, sheet_name=0, header=None, dtype=str)
 
     # 2) Extraer metadata de cuenta de las primeras 13 filas
     titular = numero = None
@@ -99,22 +102,7 @@ def load_movements_tc_gyt_xlsx(filepath, archivo_obj):
     df['monto']     = df['monto_gtq'].where(df['monto_gtq']!=0, df['monto_usd'])
     df['moneda']    = df['monto_gtq'].apply(lambda x: 'GTQ' if x!=0 else 'USD')
 
-    # 11) Persistir movimientos
-    for _, row in df.iterrows():
-        mov = Movimiento(
-            fecha=row['fecha'],
-            descripcion=row['descripcion'],
-            numero_documento=row['referencia'],
-            monto=row['monto'],
-            moneda=row['moneda'],
-            tipo='debito' if row['monto'] < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            mov.user_id = archivo_obj.user_id
-        db.session.add(mov)
-    db.session.commit()
-
-    return len(df)
+    # 11) Persistir movimientos en bloque
+    df = df.assign(numero_documento=df['referencia'], tipo=tipo_por_signo(df['monto']))
+    return guardar_movimientos(df[['fecha', 'descripcion', 'numero_documento', 'monto', 'moneda', 'tipo']],
+                               archivo_obj, cuenta)
@@ -1,7 +1,11 @@
 import pandas as pd
 from ... import db
-from ...models import Movimiento
 from .cuenta_utils import get_or_create_cuenta
+from .lectura import leer_html
+from .movimiento_utils import guardar_movimientos, tipo_por_signo
+
+# Lecturas del archivo que pueden precargarse en un proceso de trabajo
+LECTURAS = (('leer_html', {}),)
 
 def load_movements_promerica_tc_xls(filepath, archivo_obj):
     """
@@ -13,10 +17,10 @@ def load_movements_promerica_tc_xls(filepath, archivo_obj):
       4) Lee desde línea 23 hasta la primera línea vacía.
       5) Renombra, normaliza y persiste Movimientos.
       6) Reclasifica automáticamente.
-    Retorna el número de movimientos agregados.
+    Retorna los movimientos insertados y omitidos (ver `guardar_movimientos`).
     """
     # 1) Leer toda la hoja 0 como strings
-    df0 = pd.read_html(filepath)
+    df0 = leer_html(filepath)
 
     # 2) Extraer metadata
     titular = str(df0[3].iloc[1, 1]).strip() if pd.notna(df0[3].iloc[1, 1]) else ''
@@ -70,25 +74,6 @@ def load_movements_promerica_tc_xls(filepath, archivo_obj):
     movs['moneda'] = movs['moneda'].replace({'QUETZALES': 'GTQ', 'DOLARES': 'USD'})
 
     # 9) Persistir movimientos
-    count = 0
-    for _, row in movs.iterrows():
-        if pd.isna(row['fecha']):
-            continue
-        m = Movimiento(
-            fecha=row['fecha'],
-            descripcion=row['descripcion'],
-            numero_documento=row['numero_documento'],
-            monto=row['monto'],
-            moneda=row['moneda'],
-            tipo='debito' if row['monto'] < 0 else 'credito',
-            cuenta_id=cuenta.id,
-            archivo_id=archivo_obj.id
-        )
-        # Propagar propietario del archivo al movimiento
-        if getattr(archivo_obj, 'user_id', None) is not None:
-            m.user_id = archivo_obj.user_id
-        db.session.add(m)
-        count += 1
-    db.session.commit()
-
-    return count
+    movs = movs[movs['fecha'].notna()]
+    movs['tipo'] = tipo_por_signo(movs['monto'])
+    return guardar_movimientos(movs, archivo_obj, cuenta)
@@ -0,0 +1,151 @@
+"""Resumen mensual de movimientos para el dashboard.
+
+`resumen_mensual` guarda, por (usuario, mes, comercio, país, cuenta, moneda),
+la suma de débitos y créditos en la moneda original y en GTQ (`monto_gtq`, al
+tipo de cambio vigente en la fecha de cada movimiento) y cuántos movimientos
+hay de cada signo. Lo mantienen triggers sobre `movimientos` creados en la
+migración, así que cualquier alta, edición, borrado o reclasificación (ORM,
+inserciones masivas o SQL crudo) lo actualiza en la misma transacción. Los
+movimientos con `excluir_dashboard` no se incluyen.
+
+Categoría, subcategoría y tipo de contabilización se obtienen uniendo con
+`comercios` al consultar, de modo que editar un comercio no deja el resumen
+desactualizado. Un cambio de tipo de cambio recalcula `monto_gtq` de los
+movimientos de esa moneda (ver `tipos_cambio`) y con ello el resumen.
+"""
+
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_, case, false, func, or_, select, text, union_all
+
+from .. import db
+from ..models import Movimiento, ResumenMensual
+from .tipos_cambio import expresion_monto_gtq
+
+
+TRIGGER_RESUMEN = 'movimientos_resumen_ai'
+
+# Columnas que identifican una fila del resumen (0/'' en lugar de NULL)
+CLAVE = ('user_id', 'mes', 'comercio_id', 'pais_id', 'cuenta_id', 'moneda')
+TOTALES = ('debitos', 'creditos', 'n_debitos', 'n_creditos', 'debitos_gtq', 'creditos_gtq')
+
+
+def resumen_disponible():
+    """Indica si la base tiene los triggers que mantienen el resumen."""
+    row = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+        {'name': TRIGGER_RESUMEN},
+    ).first()
+    return row is not None
+
+
+def _desde_movimientos(user_id, tramos):
+    """Select con la forma del resumen, agregado directamente de `movimientos`."""
+    monto = func.coalesce(Movimiento.monto, 0)
+    monto_gtq = func.coalesce(expresion_monto_gtq(), 0)
+    clave = (
+        func.coalesce(Movimiento.user_id, 0),
+        func.coalesce(func.strftime('%Y-%m', Movimiento.fecha), ''),
+        func.coalesce(Movimiento.comercio_id, 0),
+        func.coalesce(Movimiento.pais_id, 0),
+        func.coalesce(Movimiento.cuenta_id, 0),
+        func.coalesce(Movimiento.moneda, ''),
+    )
+    q = select(
+        *(expr.label(nombre) for expr, nombre in zip(clave, CLAVE)),
+        func.sum(case((monto < 0, monto), else_=0)).label('debitos'),
+        func.sum(case((monto > 0, monto), else_=0)).label('creditos'),
+        func.sum(case((monto < 0, 1), else_=0)).label('n_debitos'),
+        func.sum(case((monto < 0, 0), else_=1)).label('n_creditos'),
+        func.sum(case((monto < 0, monto_gtq), else_=0)).label('debitos_gtq'),
+        func.sum(case((monto > 0, monto_gtq), else_=0)).label('creditos_gtq'),
+    ).where(Movimiento.excluir_dashboard.is_(False))
+    if user_id is not None:
+        q = q.where(Movimiento.user_id == user_id)
+    if tramos is not None:
+        condiciones = []
+        for desde, hasta in tramos:
+            limites = []
+            if desde is not None:
+                limites.append(Movimiento.fecha >= desde)
+            if hasta is not None:
+                limites.append(Movimiento.fecha <= hasta)
+            condiciones.append(and_(*limites))
+        q = q.where(or_(*condiciones) if condiciones else false())
+    return q.group_by(*clave)
+
+
+def _dividir_rango(desde, hasta):
+    """
+    Divide [desde, hasta] en meses completos y días sueltos en los extremos.
+    Devuelve ((mes_desde, mes_hasta) o None, [(desde, hasta), ...]).
+    """
+    inicio = desde
+    if desde is not None and desde.day != 1:
+        inicio = desde.replace(day=1) + relativedelta(months=1)
+    fin = hasta
+    if hasta is not None and (hasta + timedelta(days=1)).day != 1:
+        fin = hasta.replace(day=1) - timedelta(days=1)
+
+    if inicio is not None and fin is not None and inicio > fin:
+        # Ningún mes completo dentro del rango
+        return None, [(desde, hasta)]
+
+    tramos = []
+    if desde is not None and desde < inicio:
+        tramos.append((desde, inicio - timedelta(days=1)))
+    if hasta is not None and fin < hasta:
+        tramos.append((fin + timedelta(days=1), hasta))
+    meses = (
+        inicio.strftime('%Y-%m') if inicio is not None else None,
+        fin.strftime('%Y-%m') if fin is not None else None,
+    )
+    return meses, tramos
+
+
+def fuente_resumen(user_id=None, desde=None, hasta=None):
+    """
+    Subconsulta con las columnas de `ResumenMensual` para los movimientos del
+    dashboard entre `desde` y `hasta` (inclusive; None = sin límite) de
+    `user_id` (None = todos los usuarios).
+
+    Los meses completos se leen de `resumen_mensual` y los días sueltos de los
+    extremos se agregan desde `movimientos`. Sin los triggers (p.e. base creada
+    con `db.create_all()`) todo se agrega desde `movimientos`.
+    """
+    if not resumen_disponible():
+        tramos = None if desde is None and hasta is None else [(desde, hasta)]
+        return _desde_movimientos(user_id, tramos).subquery('fuente')
+
+    meses, tramos = _dividir_rango(desde, hasta)
+    partes = []
+    if meses is not None:
+        mes_desde, mes_hasta = meses
+        q = select(*(getattr(ResumenMensual, col) for col in CLAVE + TOTALES))
+        if user_id is not None:
+            q = q.where(ResumenMensual.user_id == user_id)
+        if mes_desde is not None or mes_hasta is not None:
+            # Movimientos sin fecha quedan fuera de cualquier rango
+            q = q.where(ResumenMensual.mes != '')
+        if mes_desde is not None:
+            q = q.where(ResumenMensual.mes >= mes_desde)
+        if mes_hasta is not None:
+            q = q.where(ResumenMensual.mes <= mes_hasta)
+        partes.append(q)
+    if tramos:
+        partes.append(_desde_movimientos(user_id, tramos))
+
+    if len(partes) == 1:
+        return partes[0].subquery('fuente')
+    return union_all(*partes).subquery('fuente')
+
+
+def reconstruir_resumen():
+    """Recalcula `resumen_mensual` completo a partir de `movimientos`."""
+    db.session.execute(ResumenMensual.__table__.delete())
+    columnas = CLAVE + TOTALES
+    db.session.execute(
+        ResumenMensual.__table__.insert().from_select(columnas, _desde_movimientos(None, None))
+    )
+    db.session.commit()
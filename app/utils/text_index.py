@@ -0,0 +1,83 @@
+"""Índice de texto (SQLite FTS5, tokenizer trigram) sobre los textos de movimientos.
+
+La tabla virtual `movimientos_fts` indexa `descripcion`, `detalle` y `lugar`,
+usa `movimientos` como contenido externo y se mantiene sincronizada mediante
+triggers creados en la migración. Si la base no tiene el índice (p.e. creada
+con `db.create_all()`), las funciones recurren a un recorrido normal o
+devuelven None para que lo haga el llamador.
+"""
+
+from sqlalchemy import Integer, column, or_, text
+
+from .. import db
+from ..models import Movimiento
+
+
+FTS_TABLE = 'movimientos_fts'
+# El tokenizer trigram solo puede buscar subcadenas de al menos 3 caracteres.
+MIN_LITERAL = 3
+
+
+def indice_disponible():
+    """Indica si la tabla FTS existe en la base actual."""
+    row = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE},
+    ).first()
+    return row is not None
+
+
+def _frase(literal):
+    return '"' + literal.replace('"', '""') + '"'
+
+
+def ids_por_subcadenas(literales, solo_sin_clasificar=False):
+    """
+    Devuelve el conjunto de ids de movimientos cuya descripción contiene alguno de
+    los `literales` (sin distinguir mayúsculas).
+
+    Retorna None si el índice no está disponible o si algún literal es demasiado
+    corto para el tokenizer trigram; en ese caso el índice no puede acotar la
+    búsqueda.
+    """
+    literales = {lit for lit in literales if lit is not None}
+    if not literales:
+        return set()
+    if any(len(lit) < MIN_LITERAL for lit in literales) or not indice_disponible():
+        return None
+
+    sql = (
+        f'SELECT m.id FROM {FTS_TABLE} f '
+        f'JOIN movimientos m ON m.id = f.rowid '
+        f'WHERE f.descripcion MATCH :consulta'
+    )
+    if solo_sin_clasificar:
+        sql += ' AND m.comercio_id IS NULL AND m.excluir_clasificacion = 0'
+
+    consulta = ' OR '.join(_frase(lit) for lit in sorted(literales))
+    rows = db.session.execute(text(sql), {'consulta': consulta}).all()
+    return {row[0] for row in rows}
+
+
+def filtro_texto(texto):
+    """
+    Condición para `Movimiento` que se cumple si `descripcion`, `detalle` o
+    `lugar` contienen `texto` (sin distinguir mayúsculas).
+
+    Con el índice y un texto de al menos `MIN_LITERAL` caracteres se resuelve
+    con el índice; si no, con `ilike` sobre las tres columnas.
+    """
+    # El término se busca tal como se escribió (espacios incluidos); sin
+    # espacios al borde debe alcanzar el mínimo del tokenizer
+    texto = texto or ''
+    if len(texto.strip()) >= MIN_LITERAL and indice_disponible():
+        ids = text(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :consulta'
+        ).bindparams(consulta=_frase(texto)).columns(column('rowid', Integer))
+        return Movimiento.id.in_(ids)
+    patron = f'%{texto}%'
+    return or_(
+        Movimiento.descripcion.ilike(patron),
+        Movimiento.detalle.ilike(patron),
+        Movimiento.lugar.ilike(patron),
+    )
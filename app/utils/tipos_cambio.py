@@ -0,0 +1,57 @@
+"""Conversión a GTQ con tipos de cambio fechados.
+
+`tipos_cambio_historicos` guarda desde qué fecha rige cada valor de una moneda.
+El tipo de cambio de un movimiento es el último vigente a su fecha; para
+fechas anteriores al primer registro se usa el más antiguo y, sin registros,
+el valor actual de `tipos_cambio`.
+
+`movimientos.monto_gtq` guarda el monto ya convertido. Lo mantienen triggers
+creados en la migración: se calcula al insertar o cambiar monto, moneda o
+fecha, y se recalcula para una moneda cuando cambian sus tipos de cambio (un
+alta o cambio en `tipos_cambio` queda registrado como vigente desde hoy).
+"""
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import aliased
+
+from .. import db
+from ..models import Movimiento, TipoCambio, TipoCambioHistorico
+
+
+TRIGGER_MONTO_GTQ = 'movimientos_monto_gtq_ai'
+
+
+def monto_gtq_mantenido():
+    """Indica si la base tiene los triggers que mantienen `monto_gtq`."""
+    row = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+        {'name': TRIGGER_MONTO_GTQ},
+    ).first()
+    return row is not None
+
+
+def tasa_vigente(moneda, fecha):
+    """Expresión SQL con el tipo de cambio de `moneda` vigente en `fecha`."""
+    # Alias propios: la consulta externa puede unir las mismas tablas
+    h = aliased(TipoCambioHistorico)
+    tc = aliased(TipoCambio)
+    vigente = (
+        select(h.valor).where(h.moneda == moneda, h.fecha <= fecha)
+        .order_by(h.fecha.desc()).limit(1).scalar_subquery()
+    )
+    mas_antiguo = (
+        select(h.valor).where(h.moneda == moneda)
+        .order_by(h.fecha).limit(1).scalar_subquery()
+    )
+    actual = select(tc.valor).where(tc.moneda == moneda).scalar_subquery()
+    return func.coalesce(vigente, mas_antiguo, actual)
+
+
+def expresion_monto_gtq():
+    """
+    `Movimiento.monto_gtq`, o la conversión calculada al consultar si la base
+    no tiene los triggers (p.e. creada con `db.create_all()`).
+    """
+    if monto_gtq_mantenido():
+        return Movimiento.monto_gtq
+    return Movimiento.monto * tasa_vigente(Movimiento.moneda, Movimiento.fecha)
@@ -19,7 +19,10 @@ def _run_startup_backup():
         app.logger.info('Respaldo de arranque creado en %s', created_path)
 
 
-_run_startup_backup()
+# Los procesos de lectura en paralelo (contexto `spawn`) vuelven a importar
+# este módulo como `__mp_main__`: el respaldo solo corre en el proceso principal
+if __name__ != '__mp_main__':
+    _run_startup_backup()
 
 if __name__ == "__main__":
     app.run(use_debugger=True)
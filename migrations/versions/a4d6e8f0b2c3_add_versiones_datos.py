@@ -0,0 +1,28 @@
+"""add versiones_datos table for cache invalidation counters
+
+Revision ID: a4d6e8f0b2c3
+Revises: f3a8c2d9e6b1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a4d6e8f0b2c3'
+down_revision = 'f3a8c2d9e6b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'versiones_datos',
+        sa.Column('clave', sa.String(length=100), nullable=False),
+        sa.Column('valor', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('clave'),
+    )
+
+
+def downgrade():
+    op.drop_table('versiones_datos')
@@ -0,0 +1,73 @@
+"""add unique content fingerprint to movimientos
+
+Revision ID: a9d1f3b5c7e8
+Revises: f7c9e1a3b5d6
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a9d1f3b5c7e8'
+down_revision = 'f7c9e1a3b5d6'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar_texto(valor):
+    return ' '.join(str(valor or '').upper().split())
+
+
+def _normalizar_documento(valor):
+    return re.sub(r'\.0+$', '', _normalizar_texto(valor)).lstrip('0')
+
+
+def _contenido(fila):
+    # Misma regla que `app.utils.parser.movimiento_utils.huella_movimiento`
+    if fila['cuenta_id'] is not None:
+        titular = str(fila['cuenta_id'])
+    else:
+        titular = f"u{fila['user_id'] or ''}"
+    return (
+        titular,
+        str(fila['fecha'] or ''),
+        f"{fila['monto']:.2f}" if fila['monto'] is not None else '',
+        _normalizar_texto(fila['moneda']),
+        _normalizar_texto(fila['descripcion']),
+        _normalizar_documento(fila['numero_documento']),
+    )
+
+
+def _huella(contenido, ocurrencia):
+    return hashlib.sha256('|'.join(contenido + (str(ocurrencia),)).encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    # Columna agregada con ALTER TABLE: recrear `movimientos` perdería sus triggers
+    op.add_column('movimientos', sa.Column('huella', sa.String(length=64), nullable=True))
+
+    # Los duplicados ya cargados conservan huellas distintas (ocurrencia 2, 3, ...)
+    connection = op.get_bind()
+    filas = connection.execute(sa.text(
+        'SELECT id, cuenta_id, user_id, fecha, monto, moneda, descripcion, numero_documento '
+        'FROM movimientos ORDER BY id'
+    )).mappings().all()
+    ocurrencias = {}
+    huellas = []
+    for fila in filas:
+        contenido = _contenido(fila)
+        ocurrencias[contenido] = ocurrencias.get(contenido, 0) + 1
+        huellas.append({'id': fila['id'], 'huella': _huella(contenido, ocurrencias[contenido])})
+    if huellas:
+        connection.execute(sa.text('UPDATE movimientos SET huella = :huella WHERE id = :id'), huellas)
+
+    op.create_index('ix_movimientos_huella', 'movimientos', ['huella'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_movimientos_huella', table_name='movimientos')
+    op.drop_column('movimientos', 'huella')
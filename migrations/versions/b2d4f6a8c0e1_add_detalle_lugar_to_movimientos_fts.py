@@ -0,0 +1,75 @@
+"""extend the movimientos FTS5 index to detalle and lugar
+
+Revision ID: b2d4f6a8c0e1
+Revises: a9d1f3b5c7e8
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b2d4f6a8c0e1'
+down_revision = 'a9d1f3b5c7e8'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+TRIGGERS = ('movimientos_fts_ai', 'movimientos_fts_ad', 'movimientos_fts_au')
+
+
+def _crear_indice(columnas):
+    """Crea `movimientos_fts` sobre `columnas` con sus triggers y lo llena."""
+    lista = ', '.join(columnas)
+    nuevos = ', '.join(f'new.{c}' for c in columnas)
+    anteriores = ', '.join(f'old.{c}' for c in columnas)
+
+    connection = op.get_bind()
+    try:
+        connection.execute(sa.text(
+            f"CREATE VIRTUAL TABLE movimientos_fts USING fts5("
+            f"{lista}, content='movimientos', content_rowid='id', tokenize='trigram')"
+        ))
+    except sa.exc.OperationalError as exc:
+        # SQLite sin FTS5/trigram (< 3.34): la app recurre a recorridos normales.
+        logger.warning('No se creó el índice FTS de movimientos: %s', exc)
+        return
+
+    op.execute(
+        "CREATE TRIGGER movimientos_fts_ai AFTER INSERT ON movimientos BEGIN "
+        f"INSERT INTO movimientos_fts(rowid, {lista}) VALUES (new.id, {nuevos}); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_fts_ad AFTER DELETE ON movimientos BEGIN "
+        f"INSERT INTO movimientos_fts(movimientos_fts, rowid, {lista}) "
+        f"VALUES ('delete', old.id, {anteriores}); "
+        "END"
+    )
+    op.execute(
+        f"CREATE TRIGGER movimientos_fts_au AFTER UPDATE OF {lista} ON movimientos BEGIN "
+        f"INSERT INTO movimientos_fts(movimientos_fts, rowid, {lista}) "
+        f"VALUES ('delete', old.id, {anteriores}); "
+        f"INSERT INTO movimientos_fts(rowid, {lista}) VALUES (new.id, {nuevos}); "
+        "END"
+    )
+    op.execute("INSERT INTO movimientos_fts(movimientos_fts) VALUES ('rebuild')")
+
+
+def _eliminar_indice():
+    for nombre in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+    op.execute('DROP TABLE IF EXISTS movimientos_fts')
+
+
+def upgrade():
+    _eliminar_indice()
+    _crear_indice(('descripcion', 'detalle', 'lugar'))
+
+
+def downgrade():
+    _eliminar_indice()
+    _crear_indice(('descripcion',))
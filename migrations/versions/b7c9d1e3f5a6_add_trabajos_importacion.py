@@ -0,0 +1,67 @@
+"""add trabajos_importacion tables for background uploads
+
+Revision ID: b7c9d1e3f5a6
+Revises: a4d6e8f0b2c3
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b7c9d1e3f5a6'
+down_revision = 'a4d6e8f0b2c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'trabajos_importacion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo_archivo', sa.String(length=50), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False, server_default='pendiente'),
+        sa.Column('mensaje', sa.Text(), nullable=True),
+        sa.Column('archivo_lote_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('creado', sa.DateTime(), nullable=True),
+        sa.Column('iniciado', sa.DateTime(), nullable=True),
+        sa.Column('finalizado', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['archivo_lote_id'], ['archivos.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('trabajos_importacion', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_trabajos_importacion_estado'), ['estado'], unique=False)
+        batch_op.create_index(batch_op.f('ix_trabajos_importacion_user_id'), ['user_id'], unique=False)
+
+    op.create_table(
+        'trabajos_importacion_archivos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('trabajo_id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=200), nullable=False),
+        sa.Column('ruta', sa.String(length=500), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False, server_default='pendiente'),
+        sa.Column('filas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('insertados', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('duplicados', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('detalles', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('archivo_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['archivo_id'], ['archivos.id']),
+        sa.ForeignKeyConstraint(['trabajo_id'], ['trabajos_importacion.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('trabajos_importacion_archivos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_trabajos_importacion_archivos_trabajo_id'), ['trabajo_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trabajos_importacion_archivos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_trabajos_importacion_archivos_trabajo_id'))
+    op.drop_table('trabajos_importacion_archivos')
+
+    with op.batch_alter_table('trabajos_importacion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_trabajos_importacion_user_id'))
+        batch_op.drop_index(batch_op.f('ix_trabajos_importacion_estado'))
+    op.drop_table('trabajos_importacion')
@@ -0,0 +1,118 @@
+"""add resumen_mensual rollup maintained by triggers on movimientos
+
+Revision ID: c2e4a6b8d0f1
+Revises: b7c9d1e3f5a6
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c2e4a6b8d0f1'
+down_revision = 'b7c9d1e3f5a6'
+branch_labels = None
+depends_on = None
+
+
+CLAVE = 'user_id, mes, comercio_id, pais_id, cuenta_id, moneda'
+
+
+def _clave(fila):
+    return (
+        f"coalesce({fila}.user_id, 0), "
+        f"coalesce(strftime('%Y-%m', {fila}.fecha), ''), "
+        f"coalesce({fila}.comercio_id, 0), "
+        f"coalesce({fila}.pais_id, 0), "
+        f"coalesce({fila}.cuenta_id, 0), "
+        f"coalesce({fila}.moneda, '')"
+    )
+
+
+def _aplicar(fila, signo):
+    """Suma (signo '+') o resta (signo '-') el movimiento `fila` de su grupo."""
+    monto = f'coalesce({fila}.monto, 0)'
+    return (
+        f"INSERT INTO resumen_mensual ({CLAVE}, debitos, creditos, n_debitos, n_creditos) "
+        f"SELECT {_clave(fila)}, "
+        f"{signo}(CASE WHEN {monto} < 0 THEN {monto} ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} > 0 THEN {monto} ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} < 0 THEN 1 ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} < 0 THEN 0 ELSE 1 END) "
+        f"WHERE NOT {fila}.excluir_dashboard "
+        f"ON CONFLICT ({CLAVE}) DO UPDATE SET "
+        f"debitos = debitos + excluded.debitos, "
+        f"creditos = creditos + excluded.creditos, "
+        f"n_debitos = n_debitos + excluded.n_debitos, "
+        f"n_creditos = n_creditos + excluded.n_creditos; "
+    )
+
+
+def _limpiar(fila):
+    """Elimina el grupo de `fila` si ya no le quedan movimientos."""
+    return (
+        f"DELETE FROM resumen_mensual WHERE ({CLAVE}) = ({_clave(fila)}) "
+        f"AND n_debitos = 0 AND n_creditos = 0; "
+    )
+
+
+def upgrade():
+    op.create_table(
+        'resumen_mensual',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('mes', sa.String(length=7), nullable=False),
+        sa.Column('comercio_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pais_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cuenta_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('moneda', sa.String(length=10), nullable=False, server_default=''),
+        sa.Column('debitos', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('creditos', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('n_debitos', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('n_creditos', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'user_id', 'mes', 'comercio_id', 'pais_id', 'cuenta_id', 'moneda',
+            name='uq_resumen_mensual_clave',
+        ),
+    )
+
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_ai AFTER INSERT ON movimientos BEGIN "
+        + _aplicar('new', '+')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_ad AFTER DELETE ON movimientos BEGIN "
+        + _aplicar('old', '-')
+        + _limpiar('old')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_au AFTER UPDATE OF "
+        "fecha, monto, moneda, comercio_id, pais_id, cuenta_id, user_id, excluir_dashboard "
+        "ON movimientos BEGIN "
+        + _aplicar('old', '-')
+        + _limpiar('old')
+        + _aplicar('new', '+')
+        + "END"
+    )
+
+    # Carga inicial con los movimientos existentes
+    op.execute(
+        f"INSERT INTO resumen_mensual ({CLAVE}, debitos, creditos, n_debitos, n_creditos) "
+        f"SELECT {_clave('m')}, "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN m.monto ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) > 0 THEN m.monto ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN 1 ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN 0 ELSE 1 END) "
+        "FROM movimientos m WHERE NOT m.excluir_dashboard "
+        f"GROUP BY {_clave('m')}"
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS movimientos_resumen_au')
+    op.execute('DROP TRIGGER IF EXISTS movimientos_resumen_ad')
+    op.execute('DROP TRIGGER IF EXISTS movimientos_resumen_ai')
+    op.drop_table('resumen_mensual')
@@ -0,0 +1,148 @@
+"""add coincidencias_facturas match table maintained by triggers
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c0e1'
+branch_labels = None
+depends_on = None
+
+
+TRIGGERS = (
+    'coincidencias_movimientos_ai',
+    'coincidencias_movimientos_au',
+    'coincidencias_movimientos_ad',
+    'coincidencias_facturas_ai',
+    'coincidencias_facturas_au',
+    'coincidencias_facturas_ad',
+    'coincidencias_tolerancias_au',
+    'coincidencias_tolerancias_au_ampliar',
+)
+
+
+def _insertar_pares(condicion):
+    """
+    Agrega los pares (movimiento `m`, factura `f`) que cumplen `condicion` y
+    las tolerancias vigentes. Misma regla que `IndiceFacturas.coincidencias`:
+    mismo usuario, a lo sumo `dias` días entre fechas y diferencia de monto
+    dentro del porcentaje o del valor absoluto.
+    """
+    # La ventana se expresa sobre ambas fechas para que SQLite pueda usar el
+    # índice de cualquiera de las dos tablas según cuál esté fijada
+    return (
+        "INSERT OR IGNORE INTO coincidencias_facturas "
+        "(movimiento_id, factura_id, score, diff_monto, diff_dias) "
+        "SELECT movimiento_id, factura_id, diff_monto / monto, diff_monto, diff_dias FROM ("
+        "SELECT m.id AS movimiento_id, f.id AS factura_id, abs(m.monto) AS monto, "
+        "abs(abs(m.monto) - abs(f.gran_total)) AS diff_monto, "
+        "CAST(abs(julianday(date(f.fecha_emision)) - julianday(m.fecha)) AS INTEGER) AS diff_dias, "
+        "t.dias AS dias, t.porcentaje / 100.0 AS pct, t.absoluto AS absoluto "
+        "FROM tolerancias_coincidencia t "
+        "JOIN movimientos m "
+        "JOIN facturas f ON f.user_id = m.user_id "
+        "AND f.fecha_emision >= date(m.fecha, '-' || t.dias || ' days') "
+        "AND f.fecha_emision < date(m.fecha, '+' || (t.dias + 1) || ' days') "
+        "AND m.fecha >= date(f.fecha_emision, '-' || t.dias || ' days') "
+        "AND m.fecha <= date(f.fecha_emision, '+' || t.dias || ' days') "
+        f"WHERE t.id = 1 AND ({condicion}) "
+        "AND m.monto IS NOT NULL AND m.monto != 0 AND f.gran_total IS NOT NULL"
+        ") WHERE diff_dias <= dias AND NOT (diff_monto / monto > pct AND diff_monto > absoluto); "
+    )
+
+
+def upgrade():
+    op.create_table(
+        'tolerancias_coincidencia',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dias', sa.Integer(), nullable=False, server_default='7'),
+        sa.Column('porcentaje', sa.Float(), nullable=False, server_default='0.01'),
+        sa.Column('absoluto', sa.Float(), nullable=False, server_default='0.01'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Los mismos defaults que el formulario de /sin_clasificar
+    op.execute("INSERT INTO tolerancias_coincidencia (id, dias, porcentaje, absoluto) VALUES (1, 7, 0.01, 0.01)")
+
+    op.create_table(
+        'coincidencias_facturas',
+        sa.Column('movimiento_id', sa.Integer(), nullable=False),
+        sa.Column('factura_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('diff_monto', sa.Float(), nullable=False),
+        sa.Column('diff_dias', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['movimiento_id'], ['movimientos.id']),
+        sa.ForeignKeyConstraint(['factura_id'], ['facturas.id']),
+        sa.PrimaryKeyConstraint('movimiento_id', 'factura_id'),
+    )
+    op.create_index(
+        op.f('ix_coincidencias_facturas_factura_id'), 'coincidencias_facturas', ['factura_id'], unique=False,
+    )
+    # Facturas de un usuario en una ventana de fechas
+    op.create_index(
+        'ix_facturas_user_id_fecha_emision', 'facturas', ['user_id', 'fecha_emision'], unique=False,
+    )
+
+    op.execute(_insertar_pares('1'))
+
+    op.execute(
+        "CREATE TRIGGER coincidencias_movimientos_ai AFTER INSERT ON movimientos BEGIN "
+        + _insertar_pares('m.id = new.id')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_movimientos_au AFTER UPDATE OF fecha, monto, user_id ON movimientos BEGIN "
+        "DELETE FROM coincidencias_facturas WHERE movimiento_id = old.id; "
+        + _insertar_pares('m.id = new.id')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_movimientos_ad AFTER DELETE ON movimientos BEGIN "
+        "DELETE FROM coincidencias_facturas WHERE movimiento_id = old.id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_facturas_ai AFTER INSERT ON facturas BEGIN "
+        + _insertar_pares('f.id = new.id')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_facturas_au AFTER UPDATE OF fecha_emision, gran_total, user_id ON facturas BEGIN "
+        "DELETE FROM coincidencias_facturas WHERE factura_id = old.id; "
+        + _insertar_pares('f.id = new.id')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_facturas_ad AFTER DELETE ON facturas BEGIN "
+        "DELETE FROM coincidencias_facturas WHERE factura_id = old.id; "
+        "END"
+    )
+
+    # Cambio de tolerancias: se quitan los pares que ya no las cumplen y, si
+    # alguna se amplió, se agregan los nuevos (INSERT OR IGNORE conserva los demás)
+    op.execute(
+        "CREATE TRIGGER coincidencias_tolerancias_au AFTER UPDATE ON tolerancias_coincidencia BEGIN "
+        "DELETE FROM coincidencias_facturas WHERE diff_dias > new.dias "
+        "OR (score > new.porcentaje / 100.0 AND diff_monto > new.absoluto); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER coincidencias_tolerancias_au_ampliar AFTER UPDATE ON tolerancias_coincidencia "
+        "WHEN new.dias > old.dias OR new.porcentaje > old.porcentaje OR new.absoluto > old.absoluto BEGIN "
+        + _insertar_pares('1')
+        + "END"
+    )
+
+
+def downgrade():
+    for nombre in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+    op.drop_index('ix_facturas_user_id_fecha_emision', table_name='facturas')
+    op.drop_index(op.f('ix_coincidencias_facturas_factura_id'), table_name='coincidencias_facturas')
+    op.drop_table('coincidencias_facturas')
+    op.drop_table('tolerancias_coincidencia')
@@ -0,0 +1,24 @@
+"""add miembro to trabajos_importacion_archivos for ZIP uploads
+
+Revision ID: d4f6b8c0e2a3
+Revises: c3e5a7b9d1f2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd4f6b8c0e2a3'
+down_revision = 'c3e5a7b9d1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nombre del archivo dentro del ZIP guardado en `ruta` (NULL = archivo suelto)
+    op.add_column('trabajos_importacion_archivos', sa.Column('miembro', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    op.drop_column('trabajos_importacion_archivos', 'miembro')
@@ -0,0 +1,31 @@
+"""add composite indexes on movimientos for list, dashboard and report filters
+
+Revision ID: d5f7b9e1a3c4
+Revises: c2e4a6b8d0f1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+revision = 'd5f7b9e1a3c4'
+down_revision = 'c2e4a6b8d0f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_movimientos_user_id_fecha', 'movimientos', ['user_id', 'fecha'], unique=False)
+    op.create_index('ix_movimientos_comercio_id_fecha', 'movimientos', ['comercio_id', 'fecha'], unique=False)
+    op.create_index('ix_movimientos_cuenta_id_fecha', 'movimientos', ['cuenta_id', 'fecha'], unique=False)
+    op.create_index('ix_movimientos_fecha', 'movimientos', ['fecha'], unique=False)
+    op.create_index(op.f('ix_movimientos_archivo_id'), 'movimientos', ['archivo_id'], unique=False)
+    op.execute('ANALYZE movimientos')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_movimientos_archivo_id'), table_name='movimientos')
+    op.drop_index('ix_movimientos_fecha', table_name='movimientos')
+    op.drop_index('ix_movimientos_cuenta_id_fecha', table_name='movimientos')
+    op.drop_index('ix_movimientos_comercio_id_fecha', table_name='movimientos')
+    op.drop_index('ix_movimientos_user_id_fecha', table_name='movimientos')
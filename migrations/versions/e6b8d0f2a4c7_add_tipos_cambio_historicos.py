@@ -0,0 +1,260 @@
+"""add dated exchange rates and movimientos.monto_gtq maintained by triggers
+
+Revision ID: e6b8d0f2a4c7
+Revises: d5f7b9e1a3c4
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e6b8d0f2a4c7'
+down_revision = 'd5f7b9e1a3c4'
+branch_labels = None
+depends_on = None
+
+
+CLAVE = 'user_id, mes, comercio_id, pais_id, cuenta_id, moneda'
+
+TRIGGERS_RESUMEN = ('movimientos_resumen_ai', 'movimientos_resumen_ad', 'movimientos_resumen_au')
+TRIGGERS_MONTO_GTQ = (
+    'movimientos_monto_gtq_ai',
+    'movimientos_monto_gtq_au',
+    'tipos_cambio_historicos_ai',
+    'tipos_cambio_historicos_au',
+    'tipos_cambio_historicos_au_moneda',
+    'tipos_cambio_historicos_ad',
+    'tipos_cambio_historial_ai',
+    'tipos_cambio_historial_au',
+)
+
+
+def _tasa(fila):
+    """Tipo de cambio de `fila` a su fecha: el vigente, el más antiguo o el actual."""
+    return (
+        "coalesce("
+        "(SELECT h.valor FROM tipos_cambio_historicos h "
+        f"WHERE h.moneda = {fila}.moneda AND h.fecha <= {fila}.fecha ORDER BY h.fecha DESC LIMIT 1), "
+        "(SELECT h.valor FROM tipos_cambio_historicos h "
+        f"WHERE h.moneda = {fila}.moneda ORDER BY h.fecha LIMIT 1), "
+        f"(SELECT t.valor FROM tipos_cambio t WHERE t.moneda = {fila}.moneda))"
+    )
+
+
+def _recalcular_moneda(moneda):
+    """Recalcula `monto_gtq` y el resumen de los movimientos de `moneda`."""
+    return (
+        f"UPDATE movimientos SET monto_gtq = monto * {_tasa('movimientos')} WHERE moneda = {moneda}; "
+        f"DELETE FROM resumen_mensual WHERE moneda = coalesce({moneda}, ''); "
+        + _insertar_resumen(f"m.moneda = {moneda}")
+        + "; "
+    )
+
+
+def _insertar_resumen(condicion=None):
+    """Agrega al resumen los movimientos `m` que cumplen `condicion`."""
+    donde = 'NOT m.excluir_dashboard' if condicion is None else f'NOT m.excluir_dashboard AND {condicion}'
+    return (
+        f"INSERT INTO resumen_mensual ({CLAVE}, debitos, creditos, n_debitos, n_creditos, "
+        "debitos_gtq, creditos_gtq) "
+        f"SELECT {_clave('m')}, "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN m.monto ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) > 0 THEN m.monto ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN 1 ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN 0 ELSE 1 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) < 0 THEN coalesce(m.monto_gtq, 0) ELSE 0 END), "
+        "sum(CASE WHEN coalesce(m.monto, 0) > 0 THEN coalesce(m.monto_gtq, 0) ELSE 0 END) "
+        f"FROM movimientos m WHERE {donde} "
+        f"GROUP BY {_clave('m')}"
+    )
+
+
+def _registrar_historial(fila):
+    return (
+        "INSERT INTO tipos_cambio_historicos (moneda, fecha, valor) "
+        f"VALUES ({fila}.moneda, date('now'), {fila}.valor) "
+        "ON CONFLICT (moneda, fecha) DO UPDATE SET valor = excluded.valor; "
+    )
+
+
+def _clave(fila):
+    return (
+        f"coalesce({fila}.user_id, 0), "
+        f"coalesce(strftime('%Y-%m', {fila}.fecha), ''), "
+        f"coalesce({fila}.comercio_id, 0), "
+        f"coalesce({fila}.pais_id, 0), "
+        f"coalesce({fila}.cuenta_id, 0), "
+        f"coalesce({fila}.moneda, '')"
+    )
+
+
+def _aplicar(fila, signo, monto_gtq=None):
+    """
+    Suma (signo '+') o resta (signo '-') el movimiento `fila` de su grupo.
+    `monto_gtq` es la expresión SQL de su monto en GTQ (None = sin columnas GTQ).
+    """
+    monto = f'coalesce({fila}.monto, 0)'
+    columnas = 'debitos, creditos, n_debitos, n_creditos'
+    valores = (
+        f"{signo}(CASE WHEN {monto} < 0 THEN {monto} ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} > 0 THEN {monto} ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} < 0 THEN 1 ELSE 0 END), "
+        f"{signo}(CASE WHEN {monto} < 0 THEN 0 ELSE 1 END)"
+    )
+    actualizar = (
+        "debitos = debitos + excluded.debitos, "
+        "creditos = creditos + excluded.creditos, "
+        "n_debitos = n_debitos + excluded.n_debitos, "
+        "n_creditos = n_creditos + excluded.n_creditos"
+    )
+    if monto_gtq is not None:
+        monto_gtq = f'coalesce({monto_gtq}, 0)'
+        columnas += ', debitos_gtq, creditos_gtq'
+        valores += (
+            f", {signo}(CASE WHEN {monto} < 0 THEN {monto_gtq} ELSE 0 END), "
+            f"{signo}(CASE WHEN {monto} > 0 THEN {monto_gtq} ELSE 0 END)"
+        )
+        actualizar += (
+            ", debitos_gtq = debitos_gtq + excluded.debitos_gtq, "
+            "creditos_gtq = creditos_gtq + excluded.creditos_gtq"
+        )
+    return (
+        f"INSERT INTO resumen_mensual ({CLAVE}, {columnas}) "
+        f"SELECT {_clave(fila)}, {valores} "
+        f"WHERE NOT {fila}.excluir_dashboard "
+        f"ON CONFLICT ({CLAVE}) DO UPDATE SET {actualizar}; "
+    )
+
+
+def _limpiar(fila):
+    """Elimina el grupo de `fila` si ya no le quedan movimientos."""
+    return (
+        f"DELETE FROM resumen_mensual WHERE ({CLAVE}) = ({_clave(fila)}) "
+        f"AND n_debitos = 0 AND n_creditos = 0; "
+    )
+
+
+def _crear_triggers_resumen(gtq):
+    """
+    Triggers del resumen. Con `gtq`, el monto en GTQ de la fila nueva se calcula
+    con `_tasa` en lugar de leer `monto_gtq`: el orden en que SQLite ejecuta los
+    triggers de una misma tabla no está garantizado, así que al sumar la fila
+    su `monto_gtq` puede no estar calculado todavía. `monto_gtq` no está entre
+    las columnas vigiladas; su recálculo por tipo de cambio rehace el resumen
+    de la moneda (`_recalcular_moneda`).
+    """
+    nuevo = f"new.monto * {_tasa('new')}" if gtq else None
+    anterior = 'old.monto_gtq' if gtq else None
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_ai AFTER INSERT ON movimientos BEGIN "
+        + _aplicar('new', '+', nuevo)
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_ad AFTER DELETE ON movimientos BEGIN "
+        + _aplicar('old', '-', anterior)
+        + _limpiar('old')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_resumen_au AFTER UPDATE OF "
+        "fecha, monto, moneda, comercio_id, pais_id, cuenta_id, user_id, excluir_dashboard "
+        "ON movimientos BEGIN "
+        + _aplicar('old', '-', anterior)
+        + _limpiar('old')
+        + _aplicar('new', '+', nuevo)
+        + "END"
+    )
+
+
+def upgrade():
+    for nombre in TRIGGERS_RESUMEN:
+        op.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+
+    op.create_table(
+        'tipos_cambio_historicos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('moneda', sa.String(length=10), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('valor', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('moneda', 'fecha', name='uq_tipo_cambio_historico_moneda_fecha'),
+    )
+    # El valor actual de cada moneda queda vigente desde su última actualización
+    op.execute(
+        "INSERT INTO tipos_cambio_historicos (moneda, fecha, valor) "
+        "SELECT moneda, date(coalesce(updated_at, 'now')), valor FROM tipos_cambio"
+    )
+
+    # Columnas agregadas con ALTER TABLE: recrear `movimientos` perdería sus triggers
+    op.add_column('movimientos', sa.Column('monto_gtq', sa.Float(), nullable=True))
+    op.add_column('resumen_mensual', sa.Column('debitos_gtq', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('resumen_mensual', sa.Column('creditos_gtq', sa.Float(), nullable=False, server_default='0'))
+
+    op.execute(f"UPDATE movimientos SET monto_gtq = monto * {_tasa('movimientos')}")
+    # Resumen recalculado con las sumas en GTQ
+    op.execute('DELETE FROM resumen_mensual')
+    op.execute(_insertar_resumen())
+
+    _crear_triggers_resumen(gtq=True)
+
+    # Conversión al insertar o cambiar monto, moneda o fecha
+    op.execute(
+        "CREATE TRIGGER movimientos_monto_gtq_ai AFTER INSERT ON movimientos BEGIN "
+        f"UPDATE movimientos SET monto_gtq = new.monto * {_tasa('new')} WHERE id = new.id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_monto_gtq_au AFTER UPDATE OF monto, moneda, fecha ON movimientos BEGIN "
+        f"UPDATE movimientos SET monto_gtq = new.monto * {_tasa('new')} WHERE id = new.id; "
+        "END"
+    )
+
+    # Un cambio en los tipos de cambio fechados recalcula solo esa moneda
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historicos_ai AFTER INSERT ON tipos_cambio_historicos BEGIN "
+        + _recalcular_moneda('new.moneda')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historicos_au AFTER UPDATE ON tipos_cambio_historicos BEGIN "
+        + _recalcular_moneda('old.moneda')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historicos_au_moneda AFTER UPDATE OF moneda ON tipos_cambio_historicos "
+        "WHEN new.moneda IS NOT old.moneda BEGIN "
+        + _recalcular_moneda('new.moneda')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historicos_ad AFTER DELETE ON tipos_cambio_historicos BEGIN "
+        + _recalcular_moneda('old.moneda')
+        + "END"
+    )
+
+    # Alta o cambio del tipo de cambio actual: queda vigente desde hoy
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historial_ai AFTER INSERT ON tipos_cambio BEGIN "
+        + _registrar_historial('new')
+        + "END"
+    )
+    op.execute(
+        "CREATE TRIGGER tipos_cambio_historial_au AFTER UPDATE OF valor ON tipos_cambio "
+        "WHEN new.valor IS NOT old.valor BEGIN "
+        + _registrar_historial('new')
+        + "END"
+    )
+
+
+def downgrade():
+    for nombre in TRIGGERS_MONTO_GTQ + TRIGGERS_RESUMEN:
+        op.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+
+    op.drop_column('resumen_mensual', 'creditos_gtq')
+    op.drop_column('resumen_mensual', 'debitos_gtq')
+    op.drop_column('movimientos', 'monto_gtq')
+    op.drop_table('tipos_cambio_historicos')
+
+    _crear_triggers_resumen(gtq=False)
@@ -0,0 +1,59 @@
+"""add FTS5 trigram index over movimientos.descripcion
+
+Revision ID: f3a8c2d9e6b1
+Revises: e5f9a3b7c1d2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f3a8c2d9e6b1'
+down_revision = 'e5f9a3b7c1d2'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade():
+    connection = op.get_bind()
+    try:
+        connection.execute(sa.text(
+            "CREATE VIRTUAL TABLE movimientos_fts USING fts5("
+            "descripcion, content='movimientos', content_rowid='id', tokenize='trigram')"
+        ))
+    except sa.exc.OperationalError as exc:
+        # SQLite sin FTS5/trigram (< 3.34): la app recurre a recorridos normales.
+        logger.warning('No se creó el índice FTS de movimientos: %s', exc)
+        return
+
+    op.execute(
+        "CREATE TRIGGER movimientos_fts_ai AFTER INSERT ON movimientos BEGIN "
+        "INSERT INTO movimientos_fts(rowid, descripcion) VALUES (new.id, new.descripcion); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_fts_ad AFTER DELETE ON movimientos BEGIN "
+        "INSERT INTO movimientos_fts(movimientos_fts, rowid, descripcion) "
+        "VALUES ('delete', old.id, old.descripcion); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER movimientos_fts_au AFTER UPDATE OF descripcion ON movimientos BEGIN "
+        "INSERT INTO movimientos_fts(movimientos_fts, rowid, descripcion) "
+        "VALUES ('delete', old.id, old.descripcion); "
+        "INSERT INTO movimientos_fts(rowid, descripcion) VALUES (new.id, new.descripcion); "
+        "END"
+    )
+    op.execute("INSERT INTO movimientos_fts(movimientos_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS movimientos_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS movimientos_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS movimientos_fts_ai')
+    op.execute('DROP TABLE IF EXISTS movimientos_fts')
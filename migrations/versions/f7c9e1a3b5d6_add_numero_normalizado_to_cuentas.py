@@ -0,0 +1,52 @@
+"""add indexed normalized account numbers to cuentas and cuentas_numeros
+
+Revision ID: f7c9e1a3b5d6
+Revises: e6b8d0f2a4c7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f7c9e1a3b5d6'
+down_revision = 'e6b8d0f2a4c7'
+branch_labels = None
+depends_on = None
+
+
+def _normalizar(numero):
+    # Misma regla que `app.models.normalizar_numero_cuenta`
+    return re.sub(r"[^A-Za-z0-9]", "", (numero or '').strip())
+
+
+def _rellenar(connection, tabla, columna):
+    filas = connection.execute(sa.text(f'SELECT id, {columna} FROM {tabla}')).all()
+    if filas:
+        connection.execute(
+            sa.text(f'UPDATE {tabla} SET numero_normalizado = :normalizado WHERE id = :id'),
+            [{'id': fila[0], 'normalizado': _normalizar(fila[1])} for fila in filas],
+        )
+
+
+def upgrade():
+    op.add_column('cuentas', sa.Column('numero_normalizado', sa.String(length=100), nullable=True))
+    op.add_column('cuentas_numeros', sa.Column('numero_normalizado', sa.String(length=100), nullable=True))
+
+    connection = op.get_bind()
+    _rellenar(connection, 'cuentas', 'numero_cuenta')
+    _rellenar(connection, 'cuentas_numeros', 'numero')
+
+    op.create_index('ix_cuentas_numero_normalizado', 'cuentas', ['numero_normalizado'], unique=False)
+    op.create_index(
+        'ix_cuentas_numeros_numero_normalizado', 'cuentas_numeros', ['numero_normalizado'], unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_cuentas_numeros_numero_normalizado', table_name='cuentas_numeros')
+    op.drop_index('ix_cuentas_numero_normalizado', table_name='cuentas')
+    op.drop_column('cuentas_numeros', 'numero_normalizado')
+    op.drop_column('cuentas', 'numero_normalizado')
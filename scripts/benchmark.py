@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark on a throwaway database with synthetic data.
+
+Creates a temporary SQLite database through `create_app()` and the Alembic
+migrations, fills it with synthetic users, merchants, rules, bank statements
+and FEL invoices (see `datos_sinteticos.py`) and times:
+
+- statement import (`load_movements` over BAC savings .csv files),
+- classification of the imported movements (`clasificar_archivos`),
+- dashboard rendering, cold and from its cache,
+- the movement list: first, middle and last page,
+- invoice matching: the unclassified list and the related-invoices page.
+
+Each run appends one JSON line (commit, parameters and timings) to the output
+file, so results can be compared across commits.
+
+Run from the repository root:
+    python scripts/benchmark.py
+    python scripts/benchmark.py --movimientos 200000 --archivos 400 --facturas 20000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Allow running this file directly from the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _medir(funcion, repeticiones=1):
+    """Median, min and max seconds of `repeticiones` calls to `funcion`."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'segundos': round(statistics.median(tiempos), 4),
+        'min': round(min(tiempos), 4),
+        'max': round(max(tiempos), 4),
+        'repeticiones': repeticiones,
+    }
+
+
+def _get(cliente, url):
+    respuesta = cliente.get(url)
+    if respuesta.status_code != 200:
+        raise RuntimeError(f'{url} devolvió {respuesta.status_code}')
+    return respuesta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark with synthetic data')
+    parser.add_argument('--usuarios', type=int, default=3, help='Users, the first one is admin (default: 3)')
+    parser.add_argument('--comercios', type=int, default=200, help='Merchants, one rule or more each (default: 200)')
+    parser.add_argument('--movimientos', type=int, default=50000, help='Imported movements (default: 50000)')
+    parser.add_argument('--archivos', type=int, default=100, help='Statements to import (default: 100)')
+    parser.add_argument('--facturas', type=int, default=5000, help='FEL invoices (default: 5000)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Requests per page (default: 5)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--salida', default=os.path.join(ROOT, 'instance', 'benchmark_resultados.jsonl'),
+                        help='JSON lines file the results are appended to')
+    parser.add_argument('--conservar', action='store_true', help='Keep the temporary database and files')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='benchmark_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'benchmark.db')
+
+    from flask_migrate import upgrade
+
+    import datos_sinteticos
+    from app import create_app, db
+    from app.models import Movimiento
+    from app.utils.dashboard_datos import cache_dashboard
+    from app.utils.file_loader import clasificar_archivos, load_movements, register_file
+
+    app = create_app()
+    app.config['UPLOAD_FOLDER'] = tmpdir
+    rnd = random.Random(args.seed)
+    resultados = {}
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        catalogos = datos_sinteticos.crear_catalogos(db, rnd, args.usuarios, args.comercios)
+        usuario_id = catalogos['usuarios'][-1].id
+
+        carpeta = os.path.join(tmpdir, 'estados')
+        os.makedirs(carpeta)
+        estados = datos_sinteticos.generar_estados_cuenta(
+            rnd, catalogos, carpeta, args.movimientos, args.archivos,
+        )
+
+        # 1) Statement import (classification left for step 2)
+        archivo_ids = []
+
+        def importar():
+            for ruta, user_id in estados:
+                _, archivo = register_file(ruta, 'ahorro-bac', user_id=user_id)
+                load_movements(ruta, archivo, 'ahorro-bac', clasificar=False)
+                archivo_ids.append(archivo.id)
+
+        resultados['importacion'] = _medir(importar)
+        total = db.session.query(Movimiento).count()
+        resultados['importacion']['filas'] = total
+        resultados['importacion']['filas_por_segundo'] = round(total / resultados['importacion']['segundos'])
+
+        # 2) Classification of the imported movements
+        def clasificar():
+            clasificar_archivos(archivo_ids)
+            db.session.commit()
+
+        resultados['clasificacion'] = _medir(clasificar)
+        clasificados = db.session.query(Movimiento).filter(Movimiento.comercio_id.isnot(None)).count()
+        resultados['clasificacion']['filas'] = total
+        resultados['clasificacion']['clasificados'] = clasificados
+
+        datos_sinteticos.crear_facturas(db, rnd, args.facturas)
+        muestra = [
+            row[0] for row in db.session.query(Movimiento.id)
+            .filter(Movimiento.user_id == usuario_id, Movimiento.monto < 0)
+            .order_by(Movimiento.id).limit(1000).all()
+        ]
+        muestra = rnd.sample(muestra, min(len(muestra), args.repeticiones))
+        movimientos_usuario = db.session.query(Movimiento).filter(Movimiento.user_id == usuario_id).count()
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(usuario_id)
+
+    # 3) Dashboard, cold and from its cache
+    def dashboard_frio():
+        cache_dashboard.limpiar()
+        _get(cliente, '/dashboard')
+
+    resultados['dashboard'] = _medir(dashboard_frio, args.repeticiones)
+    resultados['dashboard_cache'] = _medir(lambda: _get(cliente, '/dashboard'), args.repeticiones)
+
+    # 4) Paginated movement list
+    per_page = 50
+    ultima = max(1, -(-movimientos_usuario // per_page))
+    for nombre, pagina in (('primera', 1), ('media', max(1, ultima // 2)), ('ultima', ultima)):
+        resultados[f'index_pagina_{nombre}'] = _medir(
+            lambda pagina=pagina: _get(cliente, f'/?page={pagina}&per_page={per_page}'), args.repeticiones,
+        )
+        resultados[f'index_pagina_{nombre}']['pagina'] = pagina
+
+    # 5) Invoice matching: unclassified list and related invoices
+    resultados['sin_clasificar'] = _medir(lambda: _get(cliente, '/sin_clasificar'), args.repeticiones)
+    pendientes = iter(muestra * args.repeticiones)
+    resultados['facturas_relacionadas'] = _medir(
+        lambda: _get(cliente, f'/movimiento/{next(pendientes)}/facturas-relacionadas'), args.repeticiones,
+    )
+
+    registro = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'parametros': {
+            'usuarios': args.usuarios,
+            'comercios': args.comercios,
+            'movimientos': args.movimientos,
+            'archivos': args.archivos,
+            'facturas': args.facturas,
+            'repeticiones': args.repeticiones,
+            'seed': args.seed,
+        },
+        'resultados': resultados,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    for nombre, medida in resultados.items():
+        extra = ', '.join(f'{k}={v}' for k, v in medida.items() if k not in ('segundos', 'min', 'max', 'repeticiones'))
+        print(f'{nombre:24} {medida["segundos"] * 1000:10.1f} ms  {extra}')
+    print(f'Resultados agregados a {args.salida}')
+
+    if args.conservar:
+        print(f'Base y archivos en {tmpdir}')
+    else:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Show the query plans and timings of the hot `movimientos` queries.
+
+Builds a throwaway SQLite database with the Alembic migrations, fills it with
+synthetic movements and requests the movement list, the unclassified list and
+the dashboard through the Flask test client. Every SELECT on `movimientos`
+issued by those pages is captured and printed with its EXPLAIN QUERY PLAN,
+first without the composite indexes and then with them.
+
+Run from the repository root:
+    python scripts/benchmark_indices.py
+    python scripts/benchmark_indices.py --movimientos 500000 --usuarios 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Allow running this file directly from the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Indexes added by migration d5f7b9e1a3c4
+INDICES = {
+    'ix_movimientos_user_id_fecha': ('user_id', 'fecha'),
+    'ix_movimientos_comercio_id_fecha': ('comercio_id', 'fecha'),
+    'ix_movimientos_cuenta_id_fecha': ('cuenta_id', 'fecha'),
+    'ix_movimientos_fecha': ('fecha',),
+    'ix_movimientos_archivo_id': ('archivo_id',),
+}
+
+
+def capturar(app, cliente, url, repeticiones):
+    """Statements on `movimientos` issued by `url` and the median response time."""
+    from sqlalchemy import event
+
+    from app import db
+    from app.utils.dashboard_datos import cache_dashboard
+
+    consultas = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'movimientos' in statement:
+            consultas.append((statement, parameters))
+
+    tiempos = []
+    with app.app_context():
+        engine = db.engine
+    for i in range(repeticiones):
+        cache_dashboard.limpiar()
+        if i == 0:
+            event.listen(engine, 'before_cursor_execute', _registrar)
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        tiempos.append(time.perf_counter() - inicio)
+        if i == 0:
+            event.remove(engine, 'before_cursor_execute', _registrar)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'{url} devolvió {respuesta.status_code}')
+    return consultas, statistics.median(tiempos)
+
+
+def planes(db, consultas):
+    conn = db.session.connection()
+    resultado = []
+    for statement, parameters in consultas:
+        filas = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        resultado.append((statement, [fila[-1] for fila in filas]))
+    db.session.rollback()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN benchmark for movimientos indexes')
+    parser.add_argument('--movimientos', type=int, default=100000, help='Synthetic movements (default: 100000)')
+    parser.add_argument('--usuarios', type=int, default=3, help='Users, the first one is admin (default: 3)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Requests per page (default: 3)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sql', action='store_true', help='Print the full SQL of each statement')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='benchmark_indices_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'benchmark.db')
+
+    from flask_migrate import upgrade
+
+    import datos_sinteticos
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        inicio = time.perf_counter()
+        rnd = random.Random(args.seed)
+        catalogos = datos_sinteticos.crear_catalogos(db, rnd, args.usuarios)
+        datos_sinteticos.insertar_movimientos(db, rnd, catalogos, args.movimientos)
+        print(f'{args.movimientos} movimientos generados en {time.perf_counter() - inicio:.1f}s ({tmpdir})')
+        usuarios = catalogos['usuarios']
+        admin_id = usuarios[0].id
+        usuario_id = usuarios[-1].id
+        comercio_id = db.session.execute(
+            db.text('SELECT comercio_id FROM movimientos WHERE comercio_id IS NOT NULL LIMIT 1')
+        ).scalar()
+
+    hoy = date.today()
+    desde = (hoy - timedelta(days=400)).isoformat()
+    paginas = [
+        ('index (usuario)', usuario_id, '/'),
+        ('index (usuario, rango de fechas)', usuario_id, f'/?start_date={desde}&end_date={hoy.isoformat()}'),
+        ('index (admin, todos)', admin_id, '/'),
+        ('index (admin, comercio)', admin_id, f'/?comercio_id={comercio_id}'),
+        ('sin_clasificar (usuario)', usuario_id, '/sin_clasificar'),
+        ('dashboard (usuario)', usuario_id, '/dashboard'),
+        ('dashboard (usuario, rango parcial)', usuario_id, f'/dashboard?start_date={desde}&end_date={hoy.isoformat()}'),
+    ]
+
+    resultados = {}
+    for con_indices in (False, True):
+        with app.app_context():
+            conn = db.session.connection()
+            for nombre, columnas in INDICES.items():
+                if con_indices:
+                    conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {nombre} ON movimientos ({", ".join(columnas)})')
+                else:
+                    conn.exec_driver_sql(f'DROP INDEX IF EXISTS {nombre}')
+            conn.exec_driver_sql('ANALYZE')
+            db.session.commit()
+
+        for titulo, user_id, url in paginas:
+            cliente = app.test_client()
+            with cliente.session_transaction() as sesion:
+                sesion['_user_id'] = str(user_id)
+            consultas, mediana = capturar(app, cliente, url, args.repeticiones)
+            with app.app_context():
+                resultados[(titulo, con_indices)] = (mediana, planes(db, consultas))
+
+    for titulo, _, url in paginas:
+        print()
+        print('=' * 78)
+        print(f'{titulo}: {url}')
+        for con_indices in (False, True):
+            mediana, detalle = resultados[(titulo, con_indices)]
+            print(f'-- {"con" if con_indices else "sin"} índices: {mediana * 1000:.1f} ms')
+            for statement, plan in detalle:
+                if args.sql:
+                    print('   ' + ' '.join(statement.split()))
+                for paso in plan:
+                    print(f'     {paso}')
+
+
+if __name__ == '__main__':
+    main()
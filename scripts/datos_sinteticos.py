@@ -0,0 +1,279 @@
+"""Synthetic data for the benchmark scripts.
+
+Everything is generated from a `random.Random` so a given seed always yields
+the same users, merchants, rules, statements and invoices. Merchant popularity
+follows a Zipf-like distribution and descriptions mimic what the bank
+statements contain (POS purchases, online payments, transfers, payroll and
+unknown noise), so classification sees a realistic mix of hits and misses.
+"""
+
+import csv
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app.models import (
+    Archivo, Categoria, Comercio, Cuenta, Factura, Movimiento, Regla, Subcategoria, TipoCambio, User,
+)
+
+CATEGORIAS = {
+    'Alimentación': ['Supermercado', 'Restaurantes', 'Cafeterías'],
+    'Transporte': ['Combustible', 'Taxis', 'Parqueos'],
+    'Hogar': ['Servicios', 'Ferretería'],
+    'Salud': ['Farmacia', 'Clínicas'],
+    'Entretenimiento': ['Streaming', 'Cine'],
+    'Ingresos': ['Salario'],
+    'Transferencias': ['Entre cuentas'],
+}
+
+PREFIJOS = ['SUPER', 'FARMACIA', 'CAFE', 'RESTAURANTE', 'GASOLINERA', 'FERRETERIA', 'TIENDA', 'CLINICA']
+NUCLEOS = ['LA TORRE', 'PAIZ', 'GALENO', 'BARISTA', 'SHELL', 'PUMA', 'CEMACO', 'POLLO REAL',
+           'SAN MARTIN', 'ECONOMICA', 'KIELSA', 'EL ARBOLITO', 'PRICESMART', 'SIMAN', 'MAX']
+LUGARES = ['GUATEMALA', 'MIXCO', 'VILLA NUEVA', 'ANTIGUA G', 'QUETZALTENANGO', 'ESCUINTLA']
+RUIDO = ['CARGO POR SERVICIO', 'COMISION MANEJO CUENTA', 'AJUSTE', 'RETIRO ATM {n}', 'DEPOSITO {n}',
+         'IVA S/COMISION', 'INTERESES', 'PAGO TARJETA {n}']
+
+
+def crear_catalogos(db, rnd, n_usuarios=3, n_comercios=200):
+    """
+    Users (the first one is admin), categories, subcategories, merchants with
+    their rules and exchange rates. Returns a dict with the created objects.
+    """
+    password = generate_password_hash('benchmark')
+    usuarios = [User(username='admin', password_hash=password, role='admin')]
+    usuarios += [
+        User(username=f'usuario{i}', password_hash=password, role='user')
+        for i in range(1, n_usuarios)
+    ]
+    db.session.add_all(usuarios)
+
+    subcategorias = []
+    for nombre, subs in CATEGORIAS.items():
+        categoria = Categoria(nombre=nombre)
+        db.session.add(categoria)
+        db.session.flush()
+        for sub in subs:
+            subcategorias.append(Subcategoria(nombre=sub, categoria_id=categoria.id))
+    db.session.add_all(subcategorias)
+    db.session.flush()
+
+    comercios = []
+    nombres = set()
+    while len(comercios) < n_comercios:
+        nombre = f'{rnd.choice(PREFIJOS)} {rnd.choice(NUCLEOS)}'
+        if nombre in nombres:
+            nombre = f'{nombre} {len(comercios)}'
+        nombres.add(nombre)
+        sub = rnd.choice(subcategorias)
+        comercios.append(Comercio(
+            nombre=nombre,
+            categoria_id=sub.categoria_id,
+            subcategoria_id=sub.id,
+            tipo_contabilizacion='gastos',
+        ))
+    ingresos = Comercio(nombre='PLANILLA', categoria_id=subcategorias[-2].categoria_id,
+                        subcategoria_id=subcategorias[-2].id, tipo_contabilizacion='ingresos')
+    transferencias = Comercio(nombre='TRANSFERENCIAS', categoria_id=subcategorias[-1].categoria_id,
+                              subcategoria_id=subcategorias[-1].id, tipo_contabilizacion='transferencias')
+    comercios += [ingresos, transferencias]
+    db.session.add_all(comercios)
+    db.session.flush()
+
+    reglas = []
+    for comercio in comercios:
+        reglas.append(Regla(comercio_id=comercio.id, descripcion=comercio.nombre,
+                            tipo='incluir', criterio=f'*{comercio.nombre}*'))
+        if rnd.random() < 0.2:
+            reglas.append(Regla(comercio_id=comercio.id, descripcion=f'{comercio.nombre} (exacta)',
+                                tipo='incluir', criterio=f'={comercio.nombre}'))
+        if rnd.random() < 0.05:
+            reglas.append(Regla(comercio_id=comercio.id, descripcion=f'{comercio.nombre} reembolso',
+                                tipo='excluir', criterio=f'*REEMBOLSO {comercio.nombre}*'))
+    reglas.append(Regla(comercio_id=ingresos.id, descripcion='Planilla', tipo='incluir', criterio='PAGO PLANILLA*'))
+    reglas.append(Regla(comercio_id=transferencias.id, descripcion='Transferencias',
+                        tipo='incluir', criterio='TRANSF*'))
+    db.session.add_all(reglas)
+
+    for moneda, valor in (('GTQ', 1.0), ('USD', 7.8)):
+        if not TipoCambio.query.filter_by(moneda=moneda).first():
+            db.session.add(TipoCambio(moneda=moneda, valor=valor))
+    db.session.commit()
+
+    # Zipf-like weights: a few merchants get most of the purchases
+    pesos = [1.0 / (i + 1) for i in range(len(comercios) - 2)]
+    return {
+        'usuarios': usuarios,
+        'comercios': comercios[:-2],
+        'pesos': pesos,
+        'reglas': reglas,
+    }
+
+
+def descripcion(rnd, catalogos):
+    """(descripcion, monto) of one movement, following the statement mix."""
+    r = rnd.random()
+    if r < 0.04:
+        return f'PAGO PLANILLA {rnd.randint(1, 12):02d}', round(rnd.uniform(4000, 15000), 2)
+    if r < 0.10:
+        return f'TRANSF A TERCEROS {rnd.randint(100000, 999999)}', -round(rnd.uniform(100, 3000), 2)
+    if r < 0.22:
+        plantilla = rnd.choice(RUIDO)
+        return plantilla.format(n=rnd.randint(1000, 9999)), -round(rnd.uniform(5, 500), 2)
+    comercio = rnd.choices(catalogos['comercios'], weights=catalogos['pesos'])[0]
+    monto = -round(rnd.lognormvariate(4.5, 0.9), 2)
+    if r < 0.75:
+        return f'POS {comercio.nombre} {rnd.choice(LUGARES)}', monto
+    if r < 0.90:
+        return f'COMPRA {comercio.nombre}*{rnd.randint(1000, 9999)}', monto
+    return f'{comercio.nombre}', monto
+
+
+def escribir_csv_bac(ruta, titular, numero_cuenta, movimientos, moneda='GTQ'):
+    """
+    Write `movimientos` [(fecha, descripcion, monto), ...] in the BAC savings
+    .csv layout read by `ahorro_bac_csv`.
+    """
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['Nombre', 'Producto', 'Moneda', 'Saldo inicial', 'Saldo en libros'])
+        w.writerow([titular, numero_cuenta, 'QTZ' if moneda == 'GTQ' else moneda, '0.00', '0.00'])
+        w.writerow([])
+        w.writerow(['Detalle de Estado Bancario'])
+        w.writerow(['Fecha', 'Referencia', 'Descripción', 'Débito', 'Crédito', 'Balance'])
+        balance = 0.0
+        for i, (fecha, texto, monto) in enumerate(movimientos):
+            balance += monto
+            w.writerow([
+                fecha.strftime('%d/%m/%Y'),
+                f'{i:08d}',
+                texto,
+                f'{-monto:.2f}' if monto < 0 else '0.00',
+                f'{monto:.2f}' if monto > 0 else '0.00',
+                f'{balance:.2f}',
+            ])
+        w.writerow([])
+        w.writerow(['Resumen de Estado Bancario'])
+
+
+def generar_estados_cuenta(rnd, catalogos, carpeta, n_movimientos, n_archivos, dias=3 * 365):
+    """
+    Spread `n_movimientos` over `n_archivos` BAC savings statements (each one
+    a month of one account of one user). Returns [(ruta, user_id), ...].
+    """
+    usuarios = catalogos['usuarios']
+    hoy = date.today()
+    archivos = []
+    por_archivo = max(1, n_movimientos // n_archivos)
+    for i in range(n_archivos):
+        usuario = usuarios[i % len(usuarios)]
+        numero = f'{usuario.id:03d}-{(i // len(usuarios)) % 3:03d}-BENCH'
+        fin = hoy - timedelta(days=rnd.randint(0, dias - 31))
+        cantidad = por_archivo if i < n_archivos - 1 else n_movimientos - por_archivo * (n_archivos - 1)
+        movimientos = []
+        for _ in range(cantidad):
+            texto, monto = descripcion(rnd, catalogos)
+            movimientos.append((fin - timedelta(days=rnd.randint(0, 30)), texto, monto))
+        movimientos.sort(key=lambda m: m[0])
+        ruta = f'{carpeta}/estado_{i:05d}.csv'
+        escribir_csv_bac(ruta, usuario.username, numero, movimientos)
+        archivos.append((ruta, usuario.id))
+    return archivos
+
+
+def insertar_movimientos(db, rnd, catalogos, n_movimientos, dias=5 * 365, clasificados=0.7):
+    """
+    Insert `n_movimientos` directly (bypassing the parsers), with a
+    `clasificados` fraction already assigned to a merchant.
+    """
+    cuentas = []
+    for usuario in catalogos['usuarios']:
+        for j in range(3):
+            cuenta = Cuenta(
+                banco='Banco', tipo_cuenta='Monetaria', numero_cuenta=f'{usuario.id}-{j}',
+                titular=usuario.username, moneda='USD' if j == 2 else 'GTQ', user_id=usuario.id,
+            )
+            archivo = Archivo(
+                tipo_archivo='bi-estado-cuenta', filename=f'{usuario.id}-{j}.xlsx',
+                file_hash=uuid.uuid4().hex, user_id=usuario.id,
+            )
+            cuentas.append((usuario, cuenta, archivo))
+    db.session.add_all([c for _, c, _ in cuentas] + [a for _, _, a in cuentas])
+    db.session.flush()
+
+    comercios = catalogos['comercios']
+    hoy = date.today()
+    filas = []
+    for _ in range(n_movimientos):
+        usuario, cuenta, archivo = rnd.choice(cuentas)
+        texto, monto = descripcion(rnd, catalogos)
+        filas.append({
+            'fecha': hoy - timedelta(days=rnd.randint(0, dias)),
+            'cuenta_id': cuenta.id,
+            'descripcion': texto,
+            'monto': monto,
+            'moneda': cuenta.moneda,
+            'tipo': 'debito' if monto < 0 else 'credito',
+            'archivo_id': archivo.id,
+            'user_id': usuario.id,
+            'comercio_id': rnd.choices(comercios, weights=catalogos['pesos'])[0].id
+            if rnd.random() < clasificados else None,
+            'excluir_dashboard': False,
+            'excluir_clasificacion': False,
+        })
+        if len(filas) == 10000:
+            db.session.execute(insert(Movimiento), filas)
+            filas = []
+    if filas:
+        db.session.execute(insert(Movimiento), filas)
+    db.session.commit()
+
+
+def crear_facturas(db, rnd, n_facturas, coincidentes=0.6):
+    """
+    Create `n_facturas` FEL invoices. A `coincidentes` fraction matches an
+    existing expense (same user, ±3 days, same amount or one cent off); the
+    rest have no movement.
+    """
+    archivo = Archivo(tipo_archivo='factura-fel-xml', filename='facturas_benchmark', file_hash=uuid.uuid4().hex)
+    db.session.add(archivo)
+    db.session.flush()
+
+    gastos = db.session.execute(
+        db.select(Movimiento.fecha, Movimiento.monto, Movimiento.user_id, Movimiento.descripcion)
+        .where(Movimiento.monto < 0, Movimiento.fecha.isnot(None))
+    ).all()
+    usuarios = sorted({g.user_id for g in gastos}) or [None]
+    filas = []
+    for i in range(n_facturas):
+        if gastos and rnd.random() < coincidentes:
+            gasto = rnd.choice(gastos)
+            fecha = gasto.fecha + timedelta(days=rnd.randint(-3, 3))
+            total = round(abs(gasto.monto) + rnd.choice((0, 0, 0, 0.01)), 2)
+            user_id = gasto.user_id
+            emisor = gasto.descripcion[:60]
+        else:
+            fecha = date.today() - timedelta(days=rnd.randint(0, 3 * 365))
+            total = round(rnd.lognormvariate(4.5, 0.9), 2)
+            user_id = rnd.choice(usuarios)
+            emisor = f'EMISOR {rnd.randint(1, 500)}'
+        filas.append({
+            'uuid': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'serie': f'S{rnd.randint(1, 99)}',
+            'numero_autorizacion': str(i),
+            'tipo_documento': 'FACT',
+            'fecha_emision': datetime.combine(fecha, datetime.min.time()) + timedelta(hours=rnd.randint(7, 21)),
+            'moneda': 'GTQ',
+            'emisor_nit': str(rnd.randint(1000000, 9999999)),
+            'emisor_nombre': emisor,
+            'gran_total': total,
+            'archivo_id': archivo.id,
+            'user_id': user_id,
+        })
+        if len(filas) == 10000:
+            db.session.execute(insert(Factura), filas)
+            filas = []
+    if filas:
+        db.session.execute(insert(Factura), filas)
+    db.session.commit()